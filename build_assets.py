@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面插件资源打包脚本
+作者：codeliu
+
+把每个插件用到的精灵图片（星星、圣诞树、灯带、人物）打包成一张图集
+res/atlas_<名称>.argb.z，并生成索引 res/atlas_<名称>.json 记录每张图片在
+图集中的位置。打包时对每张图片：
+- 按插件load_resources中的显示尺寸平滑缩放，运行时不再缩放
+- 裁掉四周的透明边，索引中记录裁剪后图片在原图中的偏移和原图大小，
+  插件按偏移绘制（灯带图片和树一样大，大部分是透明的）
+- 转换成预乘ARGB32，按天际线（skyline）算法紧凑排列后整体用zlib压缩；
+  运行时只解压一次到缓存目录，之后mmap即可使用，不需要解码PNG，
+  也不需要再转换格式
+找不到图集时插件仍然读取res下的单独图片。原始像素与CPU字节序有关，
+在与运行环境字节序相同的机器上打包。
+
+Labubu的角色图片按需在后台解码，不打进图集。
+
+图集是生成的文件，不提交到仓库；各个.spec在打包前会自动运行本脚本。
+也可以手动运行（只打包指定的图集时在后面加上名称）：
+    python build_assets.py [tree] [santa] [labubu]
+"""
+
+import json
+import os
+import sys
+import zlib
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QImage, QPainter
+
+ATLAS_INDEX_VERSION = 3  # 索引格式版本，与image_loader保持一致
+ATLAS_FORMAT = 'argb32_premultiplied'  # 图集像素格式，与image_loader保持一致
+ATLAS_COMPRESSION = 'zlib'  # 图集文件的压缩方式，与image_loader保持一致
+ATLAS_MAX_WIDTH = 1024  # 图集最大宽度(px)
+ATLAS_PADDING = 1  # 图片之间的间隔(px)
+
+STAR_FILES = ["Star6.png", "Star4.png", "Star5.png"]
+# 星星由粒子图集按中心旋转，不裁剪
+STAR_SPRITES = [(filename, (19, 20), False) for filename in STAR_FILES]
+CHARACTER_SIZE = (200, 310)  # 圣诞树和人物的显示尺寸
+
+# 图集名称 -> [(图片文件, 显示尺寸, 是否裁掉透明边)]
+# 显示尺寸与插件load_resources中load_sprite的参数一致，None表示不缩放
+ATLAS_BUNDLES = {
+    'tree': [("imgTree.png", CHARACTER_SIZE, True)] + STAR_SPRITES +
+            [(f"img_{series}_{i}.png", None, True) for series in (0, 1) for i in range(1, 5)],
+    'santa': [("man2.png", CHARACTER_SIZE, True)] + STAR_SPRITES,
+    # Labubu的角色图片（labubu00-17.png，镜像版的p_labubu.png）不在仓库中，
+    # 运行时从res读取单独的图片，图集里只有星星
+    'labubu': STAR_SPRITES,
+}
+
+
+def skyline_pack(sizes, width, padding=ATLAS_PADDING):
+    """按天际线算法把矩形放进宽度为width的图集，返回每个矩形的位置和图集大小
+
+    从高到矮依次放入，每个矩形放在能让它底边最低的位置（相同时靠左）。
+    天际线是图集上已占用部分的轮廓，用 (x, y, 宽) 的线段列表表示。
+    放不下（有矩形比width宽）时返回None。
+    """
+    skyline = [(0, 0, width + padding)]
+    order = sorted(range(len(sizes)), key=lambda i: (sizes[i][1], sizes[i][0]), reverse=True)
+    positions = [None] * len(sizes)
+    atlas_width = atlas_height = 0
+    for i in order:
+        w = sizes[i][0] + padding
+        h = sizes[i][1] + padding
+        best = None  # (y, x)
+        for start, (x, _, _) in enumerate(skyline):
+            if x + w > width + padding:
+                break
+            # 矩形跨过的线段中最高的一段决定它的y
+            y = 0
+            remaining = w
+            for _, segment_y, segment_width in skyline[start:]:
+                y = max(y, segment_y)
+                remaining -= segment_width
+                if remaining <= 0:
+                    break
+            if best is None or y < best[0]:
+                best = (y, x)
+        if best is None:
+            return None
+        y, x = best
+        positions[i] = (x, y)
+        atlas_width = max(atlas_width, x + w - padding)
+        atlas_height = max(atlas_height, y + h - padding)
+
+        # 更新天际线：被矩形盖住的线段截掉，加上矩形顶边，相邻等高的线段合并
+        updated = [(x, y + h, w)]
+        for segment_x, segment_y, segment_width in skyline:
+            segment_right = segment_x + segment_width
+            if segment_right <= x or segment_x >= x + w:
+                updated.append((segment_x, segment_y, segment_width))
+                continue
+            if segment_x < x:
+                updated.append((segment_x, segment_y, x - segment_x))
+            if segment_right > x + w:
+                updated.append((x + w, segment_y, segment_right - x - w))
+        updated.sort()
+        skyline = []
+        for segment in updated:
+            if skyline and skyline[-1][1] == segment[1]:
+                last_x, last_y, last_width = skyline[-1]
+                skyline[-1] = (last_x, last_y, last_width + segment[2])
+            else:
+                skyline.append(segment)
+    return positions, (atlas_width, atlas_height)
+
+
+def pack_rects(sizes, max_width=ATLAS_MAX_WIDTH, padding=ATLAS_PADDING):
+    """排列矩形，返回每个矩形的位置和图集大小
+
+    在最宽的矩形到max_width之间逐个宽度尝试天际线排列，取面积最小的
+    （面积相同时取更接近正方形的）。
+    """
+    best = None
+    for width in range(max(w for w, _ in sizes), max_width + 1):
+        layout = skyline_pack(sizes, width, padding)
+        if layout is None:
+            continue
+        atlas_width, atlas_height = layout[1]
+        score = (atlas_width * atlas_height, abs(atlas_width - atlas_height))
+        if best is None or score < best[0]:
+            best = (score, layout)
+    return best[1]
+
+
+def opaque_rect(image):
+    """图片中不透明像素的包围盒，全透明时返回None"""
+    alpha = image.convertToFormat(QImage.Format_Alpha8)
+    width, height = alpha.width(), alpha.height()
+    stride = alpha.bytesPerLine()
+    data = alpha.constBits().asstring(stride * height)
+    left, right, top, bottom = width, -1, None, None
+    for y in range(height):
+        row = data[y * stride:y * stride + width]
+        stripped = row.lstrip(b'\0')
+        if not stripped:
+            continue
+        if top is None:
+            top = y
+        bottom = y
+        left = min(left, width - len(stripped))
+        right = max(right, len(row.rstrip(b'\0')) - 1)
+    if top is None:
+        return None
+    return QRect(left, top, right - left + 1, bottom - top + 1)
+
+
+def prepare_sprite(image, size, trim):
+    """缩放到显示尺寸、转换成预乘格式并裁掉透明边
+
+    返回 (图片, 偏移, 原图大小)，偏移是裁剪后图片在缩放后原图中的位置。
+    缩放方式与image_loader.scale_image一致。
+    """
+    if size is not None:
+        image = image.scaled(size[0], size[1], Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    full_size = (image.width(), image.height())
+    rect = opaque_rect(image) if trim else None
+    if rect is None:
+        return image, (0, 0), full_size
+    return image.copy(rect), (rect.x(), rect.y()), full_size
+
+
+def build_atlas(res_dir, name, entries):
+    """打包一个图集，有图片不存在或无法读取时返回False（不生成残缺的图集）"""
+    images = []
+    for filename, size, trim in entries:
+        path = os.path.join(res_dir, filename)
+        image = QImage(path)
+        if image.isNull():
+            print(f"  {filename} 不存在或无法读取，图集 {name} 打包失败")
+            return False
+        sprite, offset, full_size = prepare_sprite(image, size, trim)
+        images.append((filename, size, sprite, offset, full_size))
+        if sprite.size() != image.size():
+            print(f"  {filename}: {image.width()}x{image.height()} -> "
+                  f"{sprite.width()}x{sprite.height()}")
+    if not images:
+        print(f"  图集 {name} 没有图片")
+        return False
+
+    positions, (width, height) = pack_rects([(img.width(), img.height())
+                                             for _, _, img, _, _ in images])
+    atlas = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+    atlas.fill(Qt.transparent)
+    painter = QPainter(atlas)
+    painter.setCompositionMode(QPainter.CompositionMode_Source)
+    sprites = {}
+    for (filename, size, image, offset, full_size), (x, y) in zip(images, positions):
+        painter.drawImage(x, y, image)
+        sprites[filename] = {
+            'rect': [x, y, image.width(), image.height()],
+            'offset': list(offset),
+            'size': list(full_size),
+            'target': list(size) if size is not None else None,
+        }
+    painter.end()
+
+    # 原始像素（每行正好width*4字节）整体压缩，运行时解压后按索引中的宽高直接映射
+    image_path = os.path.join(res_dir, f"atlas_{name}.argb.z")
+    pixels = atlas.constBits().asstring(atlas.bytesPerLine() * height)
+    try:
+        with open(image_path, 'wb') as f:
+            f.write(zlib.compress(pixels, 9))
+    except OSError as e:
+        print(f"  保存 {image_path} 失败: {e}")
+        return False
+    index_path = os.path.join(res_dir, f"atlas_{name}.json")
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': ATLAS_INDEX_VERSION, 'image': os.path.basename(image_path),
+                   'format': ATLAS_FORMAT, 'compression': ATLAS_COMPRESSION,
+                   'byte_order': sys.byteorder,
+                   'width': width, 'height': height, 'sprites': sprites},
+                  f, indent=4, ensure_ascii=False)
+    print(f"  {image_path}: {len(sprites)} 张图片, {width}x{height}, "
+          f"{os.path.getsize(image_path)} 字节")
+    return True
+
+
+def main(names=None):
+    """打包names中的图集，不指定时打包全部"""
+    res_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "res")
+    names = names or list(ATLAS_BUNDLES)
+    unknown = [name for name in names if name not in ATLAS_BUNDLES]
+    if unknown:
+        print(f"未知的图集: {', '.join(unknown)}（可选: {', '.join(ATLAS_BUNDLES)}）")
+        return 2
+    ok = True
+    for name in names:
+        print(f"打包图集 {name}")
+        ok = build_atlas(res_dir, name, ATLAS_BUNDLES[name]) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
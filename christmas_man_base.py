@@ -9,14 +9,25 @@ import sys
 import math
 import random
 from PyQt5.QtWidgets import (QApplication, QWidget, QMenu,
-                            QSystemTrayIcon, QMessageBox, QAction)
-from PyQt5.QtCore import Qt, QTimer, QPoint, pyqtSignal, QObject
+                            QSystemTrayIcon, QMessageBox, QAction, QFileDialog)
+from PyQt5.QtCore import Qt, QTimer, QPoint, QRect, pyqtSignal, QObject
 from PyQt5.QtGui import (QPixmap, QPainter, QColor, QPen, QBrush, QFont,
-                        QIcon, QPolygon)
+                        QIcon, QPolygon, QRegion)
 from PyQt5.QtWidgets import QStyle
 import json
 import os
 
+from particle_engine import (DEFAULT_WIND_DIRECTION, DEFAULT_WIND_STRENGTH, NUMPY_AVAILABLE,
+                             VectorParticleSystem, particle_damage_region)
+from sprite_cache import BackgroundLayer, StarSpriteAtlas
+from frame_clock import FrameClock, FrameGovernor
+from frame_stats import StatsOverlay
+from quality import QUALITY_AUTO, QUALITY_TIERS, QualityController
+from snow_overlay import DEFAULT_SNOW_COUNT, SNOW_OVERLAY_AVAILABLE, SnowOverlay
+from image_loader import PackedAtlas, Sprite, load_sprite, load_trimmed_sprite, logical_size
+from collision_field import collision_field
+from snow_cover import SnowCover
+
 try:
     from PyQt5.QtWinExtras import QtWin
     WINDOWS_EXTRAS_AVAILABLE = True
@@ -26,76 +37,104 @@ except ImportError:
 
 
 class ParticleSystem(QObject):
-    """星星粒子系统 - 直接在主线程中使用定时器更新，避免UI阻塞"""
+    """星星粒子系统 - 在主线程中由帧时钟驱动（工作线程模拟见VectorParticleSystem）"""
     position_updated = pyqtSignal(object)  # 发送粒子位置更新信号
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, sprite_count=3):
         super().__init__(parent)
         self.particles = []
+        self.generation = 0  # 每次更新加一，绘制端据此判断是否有新数据
+        self.sprite_count = sprite_count  # 星星图片数量，粒子出生时固定选一种
         self.running = False
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.update_particles)
+        # 由进程共享的帧时钟驱动
+        self.frame_clock = FrameClock.instance()
+        
+    def create_particle(self, i):
+        """创建一个粒子，i为粒子序号（决定出生区域）"""
+        # 根据粒子索引调整初始位置，让粒子从圣诞老人上方飘落
+        if i < 90:  # 前90个粒子在圣诞老人的顶部区域
+            y = random.uniform(15, 30)  # 调整为更靠近顶部的位置
+        else:  # 后30个粒子在圣诞老人的中间区域
+            y = random.uniform(30, 150)
+        
+        particle = {
+            'x': random.uniform(50, 200),
+            'y': y,
+            'vx': random.uniform(-18.75, 18.75),  # 横向速度(px/s)，范围小更柔和
+            'vy': random.uniform(12.5, 50),  # 纵向速度(px/s)，速度小飘落更慢
+            'size': random.uniform(6, 12),  # 稍微调整大小范围 4, 10
+            'alpha': random.uniform(200, 225),# 透明度范围  150, 255 这个是会比较暗淡的那种效果
+            'rotation': random.uniform(0, 360),
+            'rotation_speed': random.uniform(-60, 60),  # 增加旋转速度，更明显
+            'lifetime': random.uniform(4, 10),  # 增加生命周期，飘落更慢
+            'age': 0,
+            'wind_phase': random.uniform(0, 2 * math.pi),  # 添加风力相位，用于模拟风吹效果
+            'sprite': random.randrange(self.sprite_count)  # 使用的星星图片，整个生命周期不变
+        }
+        self.save_previous(particle)
+        self.interpolate_particle(particle, 1.0)
+        return particle
         
     def start_particles(self, particle_count=30):
         """初始化粒子系统"""
-        self.particles = []
-        for i in range(particle_count):
-            # 根据粒子索引调整初始位置，让粒子从圣诞老人上方飘落
-            if i < 90:  # 前90个粒子在圣诞老人的顶部区域
-                y = random.uniform(15, 30)  # 调整为更靠近顶部的位置
-            else:  # 后30个粒子在圣诞老人的中间区域
-                y = random.uniform(30, 150)
-            
-            particle = {
-                'x': random.uniform(50, 200),
-                'y': y,
-                'vx': random.uniform(-0.3, 0.3),  # 减小横向速度范围，更柔和
-                'vy': random.uniform(0.2, 0.8),  # 减小纵向速度范围，飘落更慢
-                'size': random.uniform(6, 12),  # 稍微调整大小范围 4, 10
-                'alpha': random.uniform(200, 225),# 透明度范围  150, 255 这个是会比较暗淡的那种效果
-                'rotation': random.uniform(0, 360),
-                'rotation_speed': random.uniform(-60, 60),  # 增加旋转速度，更明显
-                'lifetime': random.uniform(4, 10),  # 增加生命周期，飘落更慢
-                'age': 0,
-                'wind_phase': random.uniform(0, 2 * math.pi)  # 添加风力相位，用于模拟风吹效果
-            }
-            self.particles.append(particle)
+        self.particles = [self.create_particle(i) for i in range(particle_count)]
         
         self.running = True
-        self.update_timer.start(16)  # ~60 FPS
+        # 以16ms的固定步长模拟，每帧插值出绘制位置
+        self.frame_clock.register(self.update_particles, 16, self.interpolate)  # ~60 FPS
         
     def stop_particles(self):
         """停止粒子系统"""
         self.running = False
-        self.update_timer.stop()
+        self.frame_clock.unregister(self.update_particles)
         
-    def update_particles(self):
-        """更新粒子位置和属性"""
+    def set_particle_count(self, particle_count):
+        """调整粒子数量，保留现有的粒子，只删除或补充差额"""
+        if particle_count < len(self.particles):
+            del self.particles[particle_count:]
+        else:
+            self.particles.extend(self.create_particle(i)
+                                  for i in range(len(self.particles), particle_count))
+        
+    def save_previous(self, particle):
+        """记录上一步的位置和角度，用于插值"""
+        particle['prev_x'] = particle['x']
+        particle['prev_y'] = particle['y']
+        particle['prev_rotation'] = particle['rotation']
+        
+    def interpolate_particle(self, particle, alpha):
+        """在上一步和当前状态之间插值出绘制位置"""
+        particle['draw_x'] = particle['prev_x'] + (particle['x'] - particle['prev_x']) * alpha
+        particle['draw_y'] = particle['prev_y'] + (particle['y'] - particle['prev_y']) * alpha
+        particle['draw_rotation'] = (particle['prev_rotation'] +
+                                     (particle['rotation'] - particle['prev_rotation']) * alpha)
+        
+    def update_particles(self, dt):
+        """按dt秒推进粒子位置和属性（速度单位为px/s）"""
         if not self.running:
             return
             
-        updated_positions = []
-        
-        for particle in self.particles[:]:
-            # 更新位置
+        for particle in self.particles:
+            self.save_previous(particle)
+            
             # 添加风力效果，让横向速度随时间变化
             # 计算风力影响，使用正弦函数模拟风吹的周期性
-            wind_strength = 0.05  # 风力强度
+            wind_strength = 195.3125  # 风力加速度(px/s²)，即每16ms横向速度变化0.05px/步
             wind_variation = math.sin(particle['age'] * 2 + particle['wind_phase']) * wind_strength
             
             # 更新横向速度，加入风力影响
-            particle['vx'] += wind_variation
+            particle['vx'] += wind_variation * dt
             
-            # 限制横向速度范围，避免粒子飞得太快
-            particle['vx'] = max(-0.5, min(0.5, particle['vx']))
+            # 限制横向速度范围(px/s)，避免粒子飞得太快
+            particle['vx'] = max(-31.25, min(31.25, particle['vx']))
             
             # 更新位置
-            particle['x'] += particle['vx']
-            particle['y'] += particle['vy']
-            particle['rotation'] += particle['rotation_speed'] * 0.016  # 16ms = 60FPS
+            particle['x'] += particle['vx'] * dt
+            particle['y'] += particle['vy'] * dt
+            particle['rotation'] += particle['rotation_speed'] * dt
             
             # 更新年龄和透明度
-            particle['age'] += 0.016
+            particle['age'] += dt
             age_ratio = particle['age'] / particle['lifetime']
             #particle['alpha'] = max(0, 255 * (1 - age_ratio)) #粒子的透明度的变化状态 这个会变的特别暗淡的那种
             particle['alpha'] = max(150, 255 * (1 - age_ratio))
@@ -108,14 +147,16 @@ class ParticleSystem(QObject):
                     particle['y'] = random.uniform(0, 30)
                 else:  # 30%的概率重置到中间
                     particle['y'] = random.uniform(30, 150)
-                particle['vx'] = random.uniform(-0.3, 0.3)  # 减小横向速度范围
-                particle['vy'] = random.uniform(0.2, 0.8)  # 减小纵向速度范围
+                particle['vx'] = random.uniform(-18.75, 18.75)  # 横向速度(px/s)
+                particle['vy'] = random.uniform(12.5, 50)  # 纵向速度(px/s)
                 particle['age'] = 0
                 particle['alpha'] = random.uniform(200, 225)  # 重置透明度范围  150, 255 这个是比较暗淡的
                 particle['rotation'] = random.uniform(0, 360)
                 particle['rotation_speed'] = random.uniform(-60, 60)  # 增加旋转速度
                 particle['lifetime'] = random.uniform(4, 10)  # 增加生命周期
                 particle['wind_phase'] = random.uniform(0, 2 * math.pi)  # 添加风力相位
+                particle['sprite'] = random.randrange(self.sprite_count)  # 重生时重新选择星星图片
+                self.save_previous(particle)  # 重生的粒子不从旧位置插值过来
                 
             # 边界检测 - 底部超出则重置
             if particle['y'] > 400 or particle['x'] < -50 or particle['x'] > 300:
@@ -125,16 +166,23 @@ class ParticleSystem(QObject):
                     particle['y'] = random.uniform(0, 30)
                 else:  # 30%的概率重置到中间
                     particle['y'] = random.uniform(30, 150)
-                particle['vx'] = random.uniform(-0.3, 0.3)  # 减小横向速度范围
-                particle['vy'] = random.uniform(0.2, 0.8)  # 减小纵向速度范围
+                particle['vx'] = random.uniform(-18.75, 18.75)  # 横向速度(px/s)
+                particle['vy'] = random.uniform(12.5, 50)  # 纵向速度(px/s)
                 particle['rotation'] = random.uniform(0, 360)
                 particle['rotation_speed'] = random.uniform(-60, 60)  # 增加旋转速度
                 particle['wind_phase'] = random.uniform(0, 2 * math.pi)  # 添加风力相位
+                self.save_previous(particle)
                 
-            updated_positions.append(particle.copy())
+    def interpolate(self, alpha):
+        """每帧按插值系数计算绘制位置并通知绘制端"""
+        if not self.running:
+            return
+        for particle in self.particles:
+            self.interpolate_particle(particle, alpha)
             
-        # 发送位置更新信号
-        self.position_updated.emit(updated_positions)
+        # 发送位置更新信号 - 直接发送粒子列表本身，绘制端原地读取，不再逐个复制
+        self.generation += 1
+        self.position_updated.emit(self.particles)
 
 
 class TransparentWidget(QWidget):
@@ -186,13 +234,25 @@ class TransparentWidget(QWidget):
 class ChristmasTreeWidget(TransparentWidget):
     """圣诞树主窗口（PyQt5兼容版）"""
     
-    def __init__(self):
+    def __init__(self, tray=True):
         super().__init__()
         self.setFixedSize(300, 400)
         
         # 加载图片资源
         self.load_resources()
         
+        # 星星精灵图集：按尺寸档位和旋转角度预先变换好的星星
+        self.sprite_atlas = StarSpriteAtlas(self.star_pixmaps)
+        
+        # 静态背景图层：树/人物等很少变化的内容，变化时才重新生成
+        self.background_layer = BackgroundLayer(self, self.draw_background)
+        
+        # 积雪：轮廓上边缘和窗口底部按列累积，缓存成图片，变化明显时才重新生成
+        self.snow_cover = SnowCover(self)
+        
+        # 性能统计浮层，默认关闭（按住Shift打开右键菜单切换）
+        self.stats_overlay = StatsOverlay(self)
+        
         # 状态变量
         self.stars_enabled = True
         self.current_garland_frame = 0
@@ -201,14 +261,13 @@ class ChristmasTreeWidget(TransparentWidget):
         # 圣诞老人上下移动动画参数
         self.man_y_offset = 0
         self.man_move_direction = 1  # 1 向下，-1 向上
-        self.man_move_speed = 0.5
+        self.man_move_speed = 25 / 3  # 移动速度(px/s)
         self.man_min_y = 50
         self.man_max_y = 70
         
-        # 动画定时器
-        self.animation_timer = QTimer()
-        self.animation_timer.timeout.connect(self.update_animation)
-        self.animation_timer.start(60)  # ~16 FPS
+        # 动画由统一帧时钟驱动，每60ms推进一次
+        self.frame_clock = FrameClock.instance()
+        self.frame_clock.register(self.update_animation, 60)  # ~16 FPS
         
         # 星星坐标和速度数组
         self.star_coords = []
@@ -220,10 +279,27 @@ class ChristmasTreeWidget(TransparentWidget):
         # 初始化星星位置
         self.init_star_positions()
         
-        # 粒子系统
-        self.particle_system = ParticleSystem()
-        self.particle_system.position_updated.connect(self.update_particles)
+        # 粒子系统设置
+        self.particle_engine = 'numpy'  # 粒子引擎：numpy（向量化）或 python
+        self.particle_thread = False  # 是否在工作线程中模拟粒子（仅numpy引擎）
+        self.particle_collision = False  # 粒子是否落在人物轮廓上（仅numpy引擎）
+        self.snow_cover_enabled = False  # 落地的粒子是否累积成积雪（仅numpy引擎）
+        self.collider_field = None  # 当前人物图片和朝向的碰撞场
+        self.wind_strength = DEFAULT_WIND_STRENGTH  # 阵风强度，0表示没有风（仅numpy引擎）
+        self.wind_direction = DEFAULT_WIND_DIRECTION  # 阵风方向（度），0为水平，正数向下倾斜
+        self.particle_count = 120
         self.current_particles = []  # 初始化粒子列表
+        self.particle_generation = 0  # 已绘制的粒子数据代数
+        self.particle_region = QRegion()  # 上一帧粒子覆盖的区域
+        
+        # 画质档位：low/medium/high或auto（默认，按帧耗时自动调整）
+        self.quality = QualityController(self)
+        
+        # 全屏飘雪（进程内共享，所有插件都关闭后停止）
+        self.snow_overlay = SnowOverlay.instance()
+        self.snow_overlay.hold(self)
+        self.snow_overlay_enabled = False
+        self.snow_count = DEFAULT_SNOW_COUNT
         
         # 右键菜单
         self.setup_context_menu()
@@ -231,11 +307,31 @@ class ChristmasTreeWidget(TransparentWidget):
         # 加载用户配置
         self.load_config()
         
+        # 粒子系统（需要读取配置后再创建）
+        self.particle_system = self.create_particle_system()
+        self.particle_system.position_updated.connect(self.update_particles)
+        self.update_collider()
+        
         # 显示粒子效果
-        QTimer.singleShot(1000, lambda: self.particle_system.start_particles(120))
+        QTimer.singleShot(1000, lambda: self.particle_system.start_particles(
+            self.quality.particle_count(self.particle_count)))
+        
+        # 设置系统托盘（多个插件在widget_host中运行时由宿主统一显示托盘）
+        if tray:
+            self.setup_system_tray()
+        
+        # 自适应帧率：隐藏或被遮挡时暂停，空闲或电池供电时降频
+        self.frame_governor = FrameGovernor.instance()
+        self.frame_governor.state_changed.connect(self.update_tray_tooltip)
+        self.frame_governor.watch(self)
+        self.update_tray_tooltip(self.frame_governor.status_text())
+        
+        # 应用画质档位（帧率交给帧率调节器，隐藏和空闲时仍然可以暂停或降频）
+        self.apply_quality(self.quality.tier)
         
-        # 设置系统托盘
-        self.setup_system_tray()
+        # 恢复全屏飘雪
+        if self.snow_overlay_enabled:
+            self.snow_overlay.start(self.snow_count, self.particle_thread)
         
     def setup_system_tray(self):
         """设置系统托盘"""
@@ -273,15 +369,26 @@ class ChristmasTreeWidget(TransparentWidget):
             self.tray_icon.setContextMenu(tray_menu)
             self.tray_icon.show()
             
+    def update_tray_tooltip(self, status):
+        """更新托盘提示，显示当前的运行状态和帧率"""
+        if hasattr(self, 'tray_icon'):
+            self.tray_icon.setToolTip(f"圣诞老人桌面插件 - {status}")
+            
     def quit_app(self):
         """退出应用程序"""
-        # 停止动画定时器
-        if hasattr(self, 'animation_timer') and self.animation_timer.isActive():
-            self.animation_timer.stop()
+        # 停止动画
+        if hasattr(self, 'frame_clock'):
+            self.frame_clock.unregister(self.update_animation)
         
         # 停止粒子系统
         if hasattr(self, 'particle_system'):
             self.particle_system.stop_particles()
+        if hasattr(self, 'stats_overlay'):
+            self.stats_overlay.disable()
+        if hasattr(self, 'quality'):
+            self.quality.stop()
+        if hasattr(self, 'snow_overlay'):
+            self.snow_overlay.release(self)
         
         # 关闭系统托盘
         if hasattr(self, 'tray_icon'):
@@ -320,6 +427,28 @@ class ChristmasTreeWidget(TransparentWidget):
                 # 恢复特效开关状态
                 if 'stars_enabled' in config:
                     self.stars_enabled = config['stars_enabled']
+                
+                # 恢复粒子引擎设置
+                if 'particle_engine' in config:
+                    self.particle_engine = config['particle_engine']
+                if 'particle_thread' in config:
+                    self.particle_thread = config['particle_thread']
+                if 'particle_collision' in config:
+                    self.particle_collision = config['particle_collision']
+                if 'snow_cover' in config:
+                    self.snow_cover_enabled = config['snow_cover']
+                if 'wind_strength' in config:
+                    self.wind_strength = config['wind_strength']
+                if 'wind_direction' in config:
+                    self.wind_direction = config['wind_direction']
+                if 'snow_overlay' in config:
+                    self.snow_overlay_enabled = config['snow_overlay']
+                if 'snow_count' in config:
+                    self.snow_count = config['snow_count']
+                if 'particle_count' in config:
+                    self.particle_count = config['particle_count']
+                if 'quality' in config:
+                    self.quality.set_mode(config['quality'], apply=False)
                     
             except Exception as e:
                 print(f"加载配置失败: {e}")
@@ -331,9 +460,26 @@ class ChristmasTreeWidget(TransparentWidget):
             config = {
                 'global_alpha': self.global_alpha,
                 'topmost': bool(self.windowFlags() & Qt.WindowStaysOnTopHint),
-                'stars_enabled': self.stars_enabled
+                'stars_enabled': self.stars_enabled,
+                'particle_engine': self.particle_engine,
+                'particle_thread': self.particle_thread,
+                'particle_collision': self.particle_collision,
+                'snow_cover': self.snow_cover_enabled,
+                'wind_strength': self.wind_strength,
+                'wind_direction': self.wind_direction,
+                'snow_overlay': self.snow_overlay.enabled,
+                'snow_count': self.snow_count,
+                'particle_count': self.particle_count,
+                'quality': self.quality.mode
             }
             
+            # 保留文件中其他插件的设置（widget_host中多个插件共用一个配置文件）
+            try:
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    config = {**json.load(f), **config}
+            except (OSError, ValueError, TypeError):
+                pass
+            
             with open(config_path, 'w', encoding='utf-8') as f:
                 json.dump(config, f, indent=4, ensure_ascii=False)
         except Exception as e:
@@ -349,30 +495,29 @@ class ChristmasTreeWidget(TransparentWidget):
             res_dir = os.path.join(current_dir, "res")
             if not os.path.exists(res_dir):
                 os.makedirs(res_dir)
+            
+            # 打包好的图集（build_assets.py生成），没有时读取单独的图片
+            atlas = PackedAtlas.open(res_dir, 'santa')
+            # 按窗口的设备像素比缩放图片，高分屏上不模糊
+            dpr = self.devicePixelRatioF()
 
             # 加载圣诞老人图片
-            man_path = os.path.join(res_dir, "man2.png")
-            if os.path.exists(man_path):
-                self.tree_pixmap = QPixmap(man_path)
-                # 缩放圣诞老人图片到合适的大小，保持宽高比
-                self.tree_pixmap = self.tree_pixmap.scaled(200, 310, Qt.KeepAspectRatio, 
-                                                          Qt.SmoothTransformation)
-            else:
-                self.tree_pixmap = self.create_fallback_tree()
+            # 缩放圣诞老人图片到合适的大小，保持宽高比（有磁盘缓存）
+            # 图集中的图片已经缩放好并裁掉了透明边，按偏移绘制
+            self.tree_sprite = load_trimmed_sprite(atlas, res_dir, "man2.png", 200, 310, dpr)
+            if self.tree_sprite is None:
+                self.tree_sprite = Sprite(self.create_fallback_tree())
             
             # 加载星星图片
             # "Star1.png"太暗淡了 "Star3.png",还行 直接放最亮的4个  "Star2.png",
             star_filenames = [ "Star6.png","Star4.png","Star5.png"]
             self.star_pixmaps = []
             for filename in star_filenames:
-                star_path = os.path.join(res_dir, filename)
-                if os.path.exists(star_path):
-                    pixmap = QPixmap(star_path)
-                    self.star_pixmaps.append(pixmap.scaled(19, 20, Qt.KeepAspectRatio,
-                                                         Qt.SmoothTransformation))
-                else:
+                pixmap = load_sprite(atlas, res_dir, filename, 19, 20, dpr)
+                if pixmap is None:
                     # 创建备用星星
-                    self.star_pixmaps.append(self.create_fallback_star())
+                    pixmap = self.create_fallback_star()
+                self.star_pixmaps.append(pixmap)
                     
         except Exception as e:
             error_msg = f"资源加载错误: {e}\n将使用备用资源"
@@ -439,7 +584,7 @@ class ChristmasTreeWidget(TransparentWidget):
         
     def create_fallback_resources(self):
         """创建所有备用资源"""
-        self.tree_pixmap = self.create_fallback_tree()
+        self.tree_sprite = Sprite(self.create_fallback_tree())
         self.star_pixmaps = [self.create_fallback_star() for _ in range(6)]
         
     def init_star_positions(self):
@@ -452,17 +597,22 @@ class ChristmasTreeWidget(TransparentWidget):
             # self.star_speeds[i][1] = random.uniform(1, 3)  # y速度
             self.star_coords[i][0] = random.uniform(80, 220)  # 缩小x范围，更靠近树
             self.star_coords[i][1] = random.uniform(15, 40)  # 调整y范围，更靠近树尖
-            self.star_speeds[i][0] = random.uniform(-0.1, 0.1)  # 减小横向速度
-            self.star_speeds[i][1] = random.uniform(0.3, 0.8)  # 减小纵向速度，飘落更慢
+            self.star_speeds[i][0] = random.uniform(-5 / 3, 5 / 3)  # 横向速度(px/s)，速度小更柔和
+            self.star_speeds[i][1] = random.uniform(5, 40 / 3)  # 纵向速度(px/s)，飘落更慢
             
-    def update_animation(self):
-        """更新动画帧"""
-        # 更新星星位置
+    def update_animation(self, dt):
+        """按dt秒推进动画"""
+        damage = QRegion()
+        
+        # 更新星星位置，新旧位置都需要重绘
         if self.stars_enabled:
-            self.update_stars()
+            damage = damage.united(self.stars_region())
+            self.update_stars(dt)
+            damage = damage.united(self.stars_region())
             
         # 更新圣诞老人上下移动
-        self.man_y_offset += self.man_move_direction * self.man_move_speed
+        man_rect = self.man_rect()
+        self.man_y_offset += self.man_move_direction * self.man_move_speed * dt
         
         # 边界检测和方向反转
         if self.man_y_offset >= self.man_max_y - self.man_min_y:
@@ -470,15 +620,42 @@ class ChristmasTreeWidget(TransparentWidget):
         elif self.man_y_offset <= 0:
             self.man_move_direction = 1
         
-        # 重绘窗口
-        self.update()
+        # 位置移动了整像素时，背景图层只平移贴图，碰撞场和积雪跟着移动，
+        # 新旧位置的不透明区域需要重绘
+        if self.man_rect() != man_rect:
+            self.background_layer.set_offset(0, int(self.man_min_y + self.man_y_offset) - self.man_min_y)
+            self.move_collider()
+            damage = damage.united(man_rect).united(self.man_rect())
+        
+        # 累积落地的粒子并融化积雪，积雪图片重新生成时重绘它覆盖的区域
+        if hasattr(self.particle_system, 'take_landings'):
+            damage = damage.united(self.snow_cover.update(dt, self.particle_system.take_landings()))
+        
+        # 只重绘变化的区域（本帧结束时统一重绘）
+        self.frame_clock.request_update(self, damage)
         
-    def update_stars(self):
-        """更新星星位置"""
+    def stars_region(self):
+        """星星当前位置覆盖的区域"""
+        region = QRegion()
+        for i in range(len(self.star_pixmaps)):
+            pixmap = self.star_pixmaps[i]
+            region = region.united(QRect(QPoint(int(self.star_coords[i][0]) - 9,
+                                                int(self.star_coords[i][1]) - 10),
+                                         logical_size(pixmap)))
+        return region
+        
+    def man_rect(self):
+        """人物图片当前覆盖的区域"""
+        tree_x = (300 - self.tree_sprite.width()) // 2
+        tree_y = int(self.man_min_y + self.man_y_offset)
+        return self.tree_sprite.rect(tree_x, tree_y)
+        
+    def update_stars(self, dt):
+        """按dt秒更新星星位置"""
         for i in range(6):
             # 更新位置
-            self.star_coords[i][0] += self.star_speeds[i][0]
-            self.star_coords[i][1] += self.star_speeds[i][1]
+            self.star_coords[i][0] += self.star_speeds[i][0] * dt
+            self.star_coords[i][1] += self.star_speeds[i][1] * dt
             
             # 边界检测和重置
             if self.star_coords[i][1] > 400:
@@ -491,22 +668,74 @@ class ChristmasTreeWidget(TransparentWidget):
             if (self.star_coords[i][0] < 0 or self.star_coords[i][0] > 300):
                 self.star_speeds[i][0] = -self.star_speeds[i][0]
                 
+    def create_particle_system(self):
+        """创建粒子系统 - 安装了numpy时使用向量化引擎，可以在工作线程中模拟"""
+        if self.particle_engine == 'numpy' and NUMPY_AVAILABLE:
+            system = VectorParticleSystem(sprite_count=len(self.star_pixmaps),
+                                          threaded=self.particle_thread,
+                                          wind_strength=self.wind_strength,
+                                          wind_direction=self.wind_direction)
+            system.record_landings(self.snow_cover_enabled)
+            return system
+        return ParticleSystem(sprite_count=len(self.star_pixmaps))
+        
+    def update_collider(self):
+        """让粒子落在人物的轮廓上（开关碰撞或积雪时调用）"""
+        if not hasattr(self.particle_system, 'set_collider'):
+            return  # 原来的ParticleSystem不支持碰撞
+        field = collision_field(self.tree_sprite) if self.particle_collision else None
+        self.collider_field = field
+        self.move_collider()
+        
+    def move_collider(self):
+        """人物上下晃动时只移动碰撞场和积雪的位置，不重新查找碰撞场"""
+        if not hasattr(self.particle_system, 'set_collider'):
+            return
+        tree_x = (300 - self.tree_sprite.width()) // 2
+        tree_y = int(self.man_min_y + self.man_y_offset)
+        self.particle_system.set_collider(self.collider_field, tree_x, tree_y)
+        # 积雪跟着轮廓移动，换了图片时清空
+        snow_field = self.collider_field if self.snow_cover_enabled else None
+        self.frame_clock.request_update(self, self.snow_cover.set_collider(snow_field, tree_x, tree_y))
+        
+    def apply_quality(self, tier):
+        """应用画质档位：粒子数量、帧率，抗锯齿和贴图过滤在绘制时读取"""
+        if self.particle_system.running:
+            self.particle_system.set_particle_count(self.quality.particle_count(self.particle_count))
+        self.frame_governor.set_normal_interval(self, tier.frame_interval)
+        self.update()
+        
+    def set_quality(self, mode):
+        """设置画质（菜单）"""
+        self.quality.set_mode(mode)
+        self.save_config()
+        
     def update_particles(self, particles):
-        """更新粒子位置"""
+        """更新粒子位置 - 只保存粒子数据的引用，绘制时原地读取"""
         self.current_particles = particles
-        self.update()  # 触发重绘
+        if self.particle_system.generation != self.particle_generation:
+            self.particle_generation = self.particle_system.generation
+            # 只重绘粒子新旧位置覆盖的区域，本帧结束时统一重绘
+            region = particle_damage_region(particles, self.sprite_atlas.cell_size // 2)
+            self.frame_clock.request_update(self, region.united(self.particle_region))
+            self.particle_region = region
         
     def paintEvent(self, event):
         """绘制事件"""
+        if self.stats_overlay.enabled:
+            self.stats_overlay.begin_paint()
+        self.quality.begin_paint()
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+        tier = self.quality.tier
+        painter.setRenderHint(QPainter.Antialiasing, tier.antialiasing)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, tier.smooth_pixmaps)
+        
+        # 静态内容直接从背景图层贴图，只贴需要重绘的区域
+        self.background_layer.draw(painter, event.region())
+        
+        # 绘制积雪
+        self.snow_cover.draw(painter, event.rect())
         
-        # 绘制圣诞老人
-        if hasattr(self, 'tree_pixmap'):
-            tree_x = (300 - self.tree_pixmap.width()) // 2
-            tree_y = int(self.man_min_y + self.man_y_offset)
-            painter.drawPixmap(tree_x, tree_y, self.tree_pixmap)
-            
         # 绘制星星
         if self.stars_enabled:
             self.draw_stars(painter)
@@ -515,6 +744,24 @@ class ChristmasTreeWidget(TransparentWidget):
         if self.stars_enabled and hasattr(self, 'current_particles'):
             self.draw_particles(painter)
             
+        self.quality.end_paint()
+        
+        # 性能统计浮层
+        if self.stats_overlay.enabled:
+            self.stats_overlay.end_paint(painter, len(self.current_particles))
+            
+    def draw_background(self, painter):
+        """绘制静态背景图层的内容"""
+        # 绘制圣诞老人
+        if hasattr(self, 'tree_sprite'):
+            tree_x = (300 - self.tree_sprite.width()) // 2
+            tree_y = self.man_min_y  # 上下晃动由背景图层的偏移处理
+            self.tree_sprite.draw(painter, tree_x, tree_y)
+            
+    def invalidate_background(self):
+        """静态内容变化，下次绘制时重新生成背景图层"""
+        self.background_layer.invalidate()
+        
     def draw_stars(self, painter):
         """绘制飘落的星星"""
         # 只绘制实际加载的星星数量，避免绘制备用黄色圆形
@@ -526,43 +773,9 @@ class ChristmasTreeWidget(TransparentWidget):
                 painter.drawPixmap(x - 9, y - 10, self.star_pixmaps[i])
                     
     def draw_particles(self, painter):
-        """绘制粒子效果"""
-        for particle in self.current_particles:
-            x = int(particle['x'])
-            y = int(particle['y'])
-            alpha = int(particle['alpha'])
-            size = int(particle['size'])
-            rotation = particle['rotation']
-            
-            # 设置透明度
-            painter.setOpacity(alpha / 255.0)
-            
-            # 保存当前变换矩阵
-            painter.save()
-            
-            # 平移到粒子位置
-            painter.translate(x, y)
-            
-            # 旋转
-            painter.rotate(rotation)
-            
-            # 使用加载的星星图片而不是十字架
-            if hasattr(self, 'star_pixmaps') and self.star_pixmaps:
-                # 随机选择一个星星图片
-                star_index = random.randint(0, len(self.star_pixmaps) - 1)
-                star_pixmap = self.star_pixmaps[star_index]
-                
-                # 根据粒子大小缩放图片
-                scaled_pixmap = star_pixmap.scaled(size * 2, size * 2, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                
-                # 居中绘制
-                painter.drawPixmap(-scaled_pixmap.width() // 2, -scaled_pixmap.height() // 2, scaled_pixmap)
-            
-            # 恢复变换矩阵
-            painter.restore()
-        
-        # 恢复不透明度
-        painter.setOpacity(1.0)
+        """绘制粒子效果 - 同一种星星的粒子合并成一次drawPixmapFragments调用"""
+        # 透明度、尺寸和角度由每个片段自带，星星图片在粒子出生时就已固定
+        self.sprite_atlas.draw_particles(painter, self.current_particles)
         
     def setup_context_menu(self):
         """设置右键菜单"""
@@ -601,6 +814,41 @@ class ChristmasTreeWidget(TransparentWidget):
             action.triggered.connect(lambda checked, a=alpha: self.set_transparency(a))
             transparency_menu.addAction(action)
             
+        # 画质设置，自动时显示当前使用的档位
+        quality_menu = menu.addMenu("画质")
+        quality_modes = [(QUALITY_AUTO, f"自动（当前：{self.quality.tier.label}）")]
+        quality_modes += [(tier.name, tier.label) for tier in reversed(QUALITY_TIERS)]
+        for mode, text in quality_modes:
+            action = QAction(text, self)
+            action.setCheckable(True)
+            action.setChecked(mode == self.quality.mode)
+            action.triggered.connect(lambda checked, m=mode: self.set_quality(m))
+            quality_menu.addAction(action)
+            
+        # 全屏飘雪（需要numpy）
+        snow_action = QAction("全屏飘雪", self)
+        snow_action.setCheckable(True)
+        snow_action.setChecked(self.snow_overlay.enabled)
+        snow_action.setEnabled(SNOW_OVERLAY_AVAILABLE)
+        snow_action.triggered.connect(self.toggle_snow_overlay)
+        menu.addAction(snow_action)
+        
+        # 粒子碰撞（需要numpy）
+        collision_action = QAction("星星落在人物上", self)
+        collision_action.setCheckable(True)
+        collision_action.setChecked(self.particle_collision)
+        collision_action.setEnabled(hasattr(self.particle_system, 'set_collider'))
+        collision_action.triggered.connect(self.toggle_particle_collision)
+        menu.addAction(collision_action)
+        
+        # 积雪（需要numpy）
+        snow_cover_action = QAction("积雪", self)
+        snow_cover_action.setCheckable(True)
+        snow_cover_action.setChecked(self.snow_cover_enabled)
+        snow_cover_action.setEnabled(hasattr(self.particle_system, 'record_landings'))
+        snow_cover_action.triggered.connect(self.toggle_snow_cover)
+        menu.addAction(snow_cover_action)
+            
         menu.addSeparator()
         
         # 置顶开关
@@ -613,6 +861,19 @@ class ChristmasTreeWidget(TransparentWidget):
         
         menu.addSeparator()
         
+        # 隐藏的性能统计选项，按住Shift打开右键菜单时才显示
+        if QApplication.keyboardModifiers() & Qt.ShiftModifier:
+            stats_action = QAction("性能统计", self)
+            stats_action.setCheckable(True)
+            stats_action.setChecked(self.stats_overlay.enabled)
+            stats_action.triggered.connect(self.stats_overlay.toggle)
+            menu.addAction(stats_action)
+            if self.stats_overlay.enabled:
+                export_action = QAction("导出性能数据...", self)
+                export_action.triggered.connect(self.export_frame_stats)
+                menu.addAction(export_action)
+            menu.addSeparator()
+        
         # 退出
         exit_action = QAction("退出", self)
         exit_action.triggered.connect(self.close)
@@ -620,6 +881,16 @@ class ChristmasTreeWidget(TransparentWidget):
         
         menu.exec(self.mapToGlobal(position))
         
+    def export_frame_stats(self):
+        """把性能统计数据导出为JSON文件"""
+        default_path = os.path.join(os.path.dirname(self.get_config_path()), "frame_stats.json")
+        path, _ = QFileDialog.getSaveFileName(self, "导出性能数据", default_path, "JSON (*.json)")
+        if path:
+            try:
+                self.stats_overlay.export(path, len(self.current_particles))
+            except OSError as e:
+                QMessageBox.warning(self, "导出失败", f"导出性能数据失败: {e}")
+                
     def show_about(self):
         """显示关于对话框"""
         QMessageBox.about(self, "关于", 
@@ -628,6 +899,29 @@ class ChristmasTreeWidget(TransparentWidget):
                          "版本：1.0\n"
                          "更多：https://github.com/liucf1224-del?tab=repositories\n")
                          
+    def toggle_snow_overlay(self):
+        """切换全屏飘雪"""
+        if self.snow_overlay.enabled:
+            self.snow_overlay.stop()
+        else:
+            self.snow_overlay.start(self.snow_count, self.particle_thread)
+        self.save_config()
+        
+    def toggle_particle_collision(self):
+        """切换粒子碰撞"""
+        self.particle_collision = not self.particle_collision
+        self.update_collider()
+        self.save_config()
+        
+    def toggle_snow_cover(self):
+        """切换积雪，关闭时清空已有的积雪"""
+        self.snow_cover_enabled = not self.snow_cover_enabled
+        self.particle_system.record_landings(self.snow_cover_enabled)
+        if not self.snow_cover_enabled:
+            self.frame_clock.request_update(self, self.snow_cover.clear())
+        self.update_collider()
+        self.save_config()
+        
     def toggle_stars(self):
         """切换星星效果"""
         self.stars_enabled = not self.stars_enabled
@@ -636,9 +930,12 @@ class ChristmasTreeWidget(TransparentWidget):
         # 控制粒子系统的启停
         if hasattr(self, 'particle_system'):
             if self.stars_enabled:
-                self.particle_system.start_particles(120)  # 启动粒子系统
+                self.particle_system.start_particles(
+                    self.quality.particle_count(self.particle_count))  # 启动粒子系统
             else:
                 self.particle_system.stop_particles()  # 停止粒子系统
+        self.particle_region = QRegion()
+        self.update()  # 静态内容变化，重绘整个窗口
         
     def set_transparency(self, alpha):
         """设置透明度"""
@@ -660,12 +957,20 @@ class ChristmasTreeWidget(TransparentWidget):
         """关闭事件"""
         # 保存配置
         self.save_config()
-        # 停止动画定时器
-        if hasattr(self, 'animation_timer') and self.animation_timer.isActive():
-            self.animation_timer.stop()
+        # 停止动画
+        if hasattr(self, 'frame_clock'):
+            self.frame_clock.unregister(self.update_animation)
+        if hasattr(self, 'frame_governor'):
+            self.frame_governor.forget(self)
         # 停止粒子系统
         if hasattr(self, 'particle_system'):
             self.particle_system.stop_particles()
+        if hasattr(self, 'stats_overlay'):
+            self.stats_overlay.disable()
+        if hasattr(self, 'quality'):
+            self.quality.stop()
+        if hasattr(self, 'snow_overlay'):
+            self.snow_overlay.release(self)
         event.accept()
 
 
@@ -9,14 +9,25 @@ import sys
 import math
 import random
 from PyQt5.QtWidgets import (QApplication, QWidget, QMenu,
-                            QSystemTrayIcon, QMessageBox, QAction)
-from PyQt5.QtCore import Qt, QTimer, QPoint, pyqtSignal, QObject
+                            QSystemTrayIcon, QMessageBox, QAction, QFileDialog)
+from PyQt5.QtCore import Qt, QTimer, QPoint, QRect, pyqtSignal, QObject
 from PyQt5.QtGui import (QPixmap, QPainter, QColor, QPen, QBrush, QFont,
-                        QIcon)
+                        QIcon, QRegion)
 from PyQt5.QtWidgets import QStyle
 import json
 import os
 
+from particle_engine import (DEFAULT_WIND_DIRECTION, DEFAULT_WIND_STRENGTH, NUMPY_AVAILABLE,
+                             VectorParticleSystem, particle_damage_region)
+from sprite_cache import BackgroundLayer, StarSpriteAtlas
+from frame_clock import FrameClock, FrameGovernor
+from frame_stats import StatsOverlay
+from quality import QUALITY_AUTO, QUALITY_TIERS, QualityController
+from snow_overlay import DEFAULT_SNOW_COUNT, SNOW_OVERLAY_AVAILABLE, SnowOverlay
+from image_loader import PackedAtlas, Sprite, load_sprite, load_trimmed_sprite, logical_size
+from collision_field import collision_field
+from snow_cover import SnowCover
+
 try:
     from PyQt5.QtWinExtras import QtWin
     WINDOWS_EXTRAS_AVAILABLE = True
@@ -25,77 +36,117 @@ except ImportError:
     print("警告：PyQt5.WinExtras未安装，某些Windows特定功能可能不可用")
 
 
+# 灯带动画序列：每个阶段叠加显示的灯带图片 (系列, 序号)，系列0是img_0_*，系列1是img_1_*
+GARLAND_SEQUENCE = (
+    ((0, 0),),  # 第1秒：显示0_1
+    ((0, 1), (1, 0)),  # 第2秒：显示0_2和1_1
+    ((0, 2), (1, 1)),  # 第3秒：显示0_3和1_2
+    ((0, 3), (1, 2)),  # 第4秒：显示0_4和1_3
+    ((1, 3),),  # 第5秒：显示1_4
+    (),  # 第6秒：不显示任何灯带
+)
+GARLAND_PHASE_SECONDS = 0.96  # 每个阶段持续的时间(s)，即原来16 FPS下的16帧
+
+
 class ParticleSystem(QObject):
-    """星星粒子系统 - 直接在主线程中使用定时器更新，避免UI阻塞"""
+    """星星粒子系统 - 在主线程中由帧时钟驱动（工作线程模拟见VectorParticleSystem）"""
     position_updated = pyqtSignal(object)  # 发送粒子位置更新信号
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, sprite_count=3):
         super().__init__(parent)
         self.particles = []
+        self.generation = 0  # 每次更新加一，绘制端据此判断是否有新数据
+        self.sprite_count = sprite_count  # 星星图片数量，粒子出生时固定选一种
         self.running = False
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.update_particles)
+        # 由进程共享的帧时钟驱动
+        self.frame_clock = FrameClock.instance()
+        
+    def create_particle(self, i):
+        """创建一个粒子，i为粒子序号（决定出生区域）"""
+        # 根据粒子索引调整初始位置
+        if i < 90:  # 前90个粒子在树的顶部区域（更靠近树尖）
+            y = random.uniform(15, 30)  # 调整为更靠近树尖的位置
+        else:  # 后30个粒子在树的中间区域
+            y = random.uniform(30, 150)
+        
+        particle = {
+            'x': random.uniform(50, 200),
+            'y': y,
+            'vx': random.uniform(-18.75, 18.75),  # 横向速度(px/s)，范围小更柔和
+            'vy': random.uniform(12.5, 50),  # 纵向速度(px/s)，速度小飘落更慢
+            'size': random.uniform(6, 12),  # 稍微调整大小范围 4, 10
+            'alpha': random.uniform(200, 225),# 透明度范围  150, 255 这个是会比较暗淡的那种效果
+            'rotation': random.uniform(0, 360),
+            'rotation_speed': random.uniform(-60, 60),  # 增加旋转速度，更明显
+            'lifetime': random.uniform(4, 10),  # 增加生命周期，飘落更慢
+            'age': 0,
+            'wind_phase': random.uniform(0, 2 * math.pi),  # 添加风力相位，用于模拟风吹效果
+            'sprite': random.randrange(self.sprite_count)  # 使用的星星图片，整个生命周期不变
+        }
+        self.save_previous(particle)
+        self.interpolate_particle(particle, 1.0)
+        return particle
         
     def start_particles(self, particle_count=30):
         """初始化粒子系统"""
-        self.particles = []
-        for i in range(particle_count):
-            # 根据粒子索引调整初始位置
-            if i < 90:  # 前90个粒子在树的顶部区域（更靠近树尖）
-                y = random.uniform(15, 30)  # 调整为更靠近树尖的位置
-            else:  # 后30个粒子在树的中间区域
-                y = random.uniform(30, 150)
-            
-            particle = {
-                'x': random.uniform(50, 200),
-                'y': y,
-                'vx': random.uniform(-0.3, 0.3),  # 减小横向速度范围，更柔和
-                'vy': random.uniform(0.2, 0.8),  # 减小纵向速度范围，飘落更慢
-                'size': random.uniform(6, 12),  # 稍微调整大小范围 4, 10
-                'alpha': random.uniform(200, 225),# 透明度范围  150, 255 这个是会比较暗淡的那种效果
-                'rotation': random.uniform(0, 360),
-                'rotation_speed': random.uniform(-60, 60),  # 增加旋转速度，更明显
-                'lifetime': random.uniform(4, 10),  # 增加生命周期，飘落更慢
-                'age': 0,
-                'wind_phase': random.uniform(0, 2 * math.pi)  # 添加风力相位，用于模拟风吹效果
-            }
-            self.particles.append(particle)
+        self.particles = [self.create_particle(i) for i in range(particle_count)]
         
         self.running = True
-        self.update_timer.start(16)  # ~60 FPS
+        # 以16ms的固定步长模拟，每帧插值出绘制位置
+        self.frame_clock.register(self.update_particles, 16, self.interpolate)  # ~60 FPS
         
     def stop_particles(self):
         """停止粒子系统"""
         self.running = False
-        self.update_timer.stop()
+        self.frame_clock.unregister(self.update_particles)
         
-    def update_particles(self):
-        """更新粒子位置和属性"""
+    def set_particle_count(self, particle_count):
+        """调整粒子数量，保留现有的粒子，只删除或补充差额"""
+        if particle_count < len(self.particles):
+            del self.particles[particle_count:]
+        else:
+            self.particles.extend(self.create_particle(i)
+                                  for i in range(len(self.particles), particle_count))
+        
+    def save_previous(self, particle):
+        """记录上一步的位置和角度，用于插值"""
+        particle['prev_x'] = particle['x']
+        particle['prev_y'] = particle['y']
+        particle['prev_rotation'] = particle['rotation']
+        
+    def interpolate_particle(self, particle, alpha):
+        """在上一步和当前状态之间插值出绘制位置"""
+        particle['draw_x'] = particle['prev_x'] + (particle['x'] - particle['prev_x']) * alpha
+        particle['draw_y'] = particle['prev_y'] + (particle['y'] - particle['prev_y']) * alpha
+        particle['draw_rotation'] = (particle['prev_rotation'] +
+                                     (particle['rotation'] - particle['prev_rotation']) * alpha)
+        
+    def update_particles(self, dt):
+        """按dt秒推进粒子位置和属性（速度单位为px/s）"""
         if not self.running:
             return
             
-        updated_positions = []
-        
-        for particle in self.particles[:]:
-            # 更新位置
+        for particle in self.particles:
+            self.save_previous(particle)
+            
             # 添加风力效果，让横向速度随时间变化
             # 计算风力影响，使用正弦函数模拟风吹的周期性
-            wind_strength = 0.05  # 风力强度
+            wind_strength = 195.3125  # 风力加速度(px/s²)，即每16ms横向速度变化0.05px/步
             wind_variation = math.sin(particle['age'] * 2 + particle['wind_phase']) * wind_strength
             
             # 更新横向速度，加入风力影响
-            particle['vx'] += wind_variation
+            particle['vx'] += wind_variation * dt
             
-            # 限制横向速度范围，避免粒子飞得太快
-            particle['vx'] = max(-0.5, min(0.5, particle['vx']))
+            # 限制横向速度范围(px/s)，避免粒子飞得太快
+            particle['vx'] = max(-31.25, min(31.25, particle['vx']))
             
             # 更新位置
-            particle['x'] += particle['vx']
-            particle['y'] += particle['vy']
-            particle['rotation'] += particle['rotation_speed'] * 0.016  # 16ms = 60FPS
+            particle['x'] += particle['vx'] * dt
+            particle['y'] += particle['vy'] * dt
+            particle['rotation'] += particle['rotation_speed'] * dt
             
             # 更新年龄和透明度
-            particle['age'] += 0.016
+            particle['age'] += dt
             age_ratio = particle['age'] / particle['lifetime']
             #particle['alpha'] = max(0, 255 * (1 - age_ratio)) #粒子的透明度的变化状态 这个会变的特别暗淡的那种
             particle['alpha'] = max(150, 255 * (1 - age_ratio))
@@ -108,14 +159,16 @@ class ParticleSystem(QObject):
                     particle['y'] = random.uniform(0, 30)
                 else:  # 30%的概率重置到中间
                     particle['y'] = random.uniform(30, 150)
-                particle['vx'] = random.uniform(-0.3, 0.3)  # 减小横向速度范围
-                particle['vy'] = random.uniform(0.2, 0.8)  # 减小纵向速度范围
+                particle['vx'] = random.uniform(-18.75, 18.75)  # 横向速度(px/s)
+                particle['vy'] = random.uniform(12.5, 50)  # 纵向速度(px/s)
                 particle['age'] = 0
                 particle['alpha'] = random.uniform(200, 225)  # 重置透明度范围  150, 255 这个是比较暗淡的
                 particle['rotation'] = random.uniform(0, 360)
                 particle['rotation_speed'] = random.uniform(-60, 60)  # 增加旋转速度
                 particle['lifetime'] = random.uniform(4, 10)  # 增加生命周期
                 particle['wind_phase'] = random.uniform(0, 2 * math.pi)  # 添加风力相位
+                particle['sprite'] = random.randrange(self.sprite_count)  # 重生时重新选择星星图片
+                self.save_previous(particle)  # 重生的粒子不从旧位置插值过来
                 
             # 边界检测 - 底部超出则重置
             if particle['y'] > 400 or particle['x'] < -50 or particle['x'] > 300:
@@ -125,16 +178,23 @@ class ParticleSystem(QObject):
                     particle['y'] = random.uniform(0, 30)
                 else:  # 30%的概率重置到中间
                     particle['y'] = random.uniform(30, 150)
-                particle['vx'] = random.uniform(-0.3, 0.3)  # 减小横向速度范围
-                particle['vy'] = random.uniform(0.2, 0.8)  # 减小纵向速度范围
+                particle['vx'] = random.uniform(-18.75, 18.75)  # 横向速度(px/s)
+                particle['vy'] = random.uniform(12.5, 50)  # 纵向速度(px/s)
                 particle['rotation'] = random.uniform(0, 360)
                 particle['rotation_speed'] = random.uniform(-60, 60)  # 增加旋转速度
                 particle['wind_phase'] = random.uniform(0, 2 * math.pi)  # 添加风力相位
+                self.save_previous(particle)
                 
-            updated_positions.append(particle.copy())
+    def interpolate(self, alpha):
+        """每帧按插值系数计算绘制位置并通知绘制端"""
+        if not self.running:
+            return
+        for particle in self.particles:
+            self.interpolate_particle(particle, alpha)
             
-        # 发送位置更新信号
-        self.position_updated.emit(updated_positions)
+        # 发送位置更新信号 - 直接发送粒子列表本身，绘制端原地读取，不再逐个复制
+        self.generation += 1
+        self.position_updated.emit(self.particles)
 
 
 class TransparentWidget(QWidget):
@@ -186,23 +246,35 @@ class TransparentWidget(QWidget):
 class ChristmasTreeWidget(TransparentWidget):
     """圣诞树主窗口（PyQt5兼容版）"""
     
-    def __init__(self):
+    def __init__(self, tray=True):
         super().__init__()
         self.setFixedSize(300, 400)
         
         # 加载图片资源
         self.load_resources()
+        self.garland_frames = {}  # 灯带阶段 -> 合成好的树+灯带图片（Sprite）
+        
+        # 星星精灵图集：按尺寸档位和旋转角度预先变换好的星星
+        self.sprite_atlas = StarSpriteAtlas(self.star_pixmaps)
+        
+        # 静态背景图层：树/人物等很少变化的内容，变化时才重新生成
+        self.background_layer = BackgroundLayer(self, self.draw_background)
+        
+        # 积雪：轮廓上边缘和窗口底部按列累积，缓存成图片，变化明显时才重新生成
+        self.snow_cover = SnowCover(self)
+        
+        # 性能统计浮层，默认关闭（按住Shift打开右键菜单切换）
+        self.stats_overlay = StatsOverlay(self)
         
         # 状态变量
         self.stars_enabled = True
         self.garland_enabled = True
-        self.current_garland_frame = 0
+        self.garland_time = 0.0  # 灯带动画在当前周期内经过的时间(s)
         self.garland_frame_count = 4
         
-        # 动画定时器
-        self.animation_timer = QTimer()
-        self.animation_timer.timeout.connect(self.update_animation)
-        self.animation_timer.start(60)  # ~16 FPS
+        # 动画由统一帧时钟驱动，每60ms推进一次
+        self.frame_clock = FrameClock.instance()
+        self.frame_clock.register(self.update_animation, 60)  # ~16 FPS
         
         # 星星坐标和速度数组
         self.star_coords = []
@@ -214,10 +286,26 @@ class ChristmasTreeWidget(TransparentWidget):
         # 初始化星星位置
         self.init_star_positions()
         
-        # 粒子系统
-        self.particle_system = ParticleSystem()
-        self.particle_system.position_updated.connect(self.update_particles)
+        # 粒子系统设置
+        self.particle_engine = 'numpy'  # 粒子引擎：numpy（向量化）或 python
+        self.particle_thread = False  # 是否在工作线程中模拟粒子（仅numpy引擎）
+        self.particle_collision = False  # 粒子是否落在圣诞树轮廓上（仅numpy引擎）
+        self.snow_cover_enabled = False  # 落地的粒子是否累积成积雪（仅numpy引擎）
+        self.wind_strength = DEFAULT_WIND_STRENGTH  # 阵风强度，0表示没有风（仅numpy引擎）
+        self.wind_direction = DEFAULT_WIND_DIRECTION  # 阵风方向（度），0为水平，正数向下倾斜
+        self.particle_count = 120
         self.current_particles = []  # 初始化粒子列表
+        self.particle_generation = 0  # 已绘制的粒子数据代数
+        self.particle_region = QRegion()  # 上一帧粒子覆盖的区域
+        
+        # 画质档位：low/medium/high或auto（默认，按帧耗时自动调整）
+        self.quality = QualityController(self)
+        
+        # 全屏飘雪（进程内共享，所有插件都关闭后停止）
+        self.snow_overlay = SnowOverlay.instance()
+        self.snow_overlay.hold(self)
+        self.snow_overlay_enabled = False
+        self.snow_count = DEFAULT_SNOW_COUNT
         
         # 右键菜单
         self.setup_context_menu()
@@ -225,11 +313,31 @@ class ChristmasTreeWidget(TransparentWidget):
         # 加载用户配置
         self.load_config()
         
+        # 粒子系统（需要读取配置后再创建）
+        self.particle_system = self.create_particle_system()
+        self.particle_system.position_updated.connect(self.update_particles)
+        self.update_collider()
+        
         # 显示粒子效果
-        QTimer.singleShot(1000, lambda: self.particle_system.start_particles(120))
+        QTimer.singleShot(1000, lambda: self.particle_system.start_particles(
+            self.quality.particle_count(self.particle_count)))
+        
+        # 设置系统托盘（多个插件在widget_host中运行时由宿主统一显示托盘）
+        if tray:
+            self.setup_system_tray()
+        
+        # 自适应帧率：隐藏或被遮挡时暂停，空闲或电池供电时降频
+        self.frame_governor = FrameGovernor.instance()
+        self.frame_governor.state_changed.connect(self.update_tray_tooltip)
+        self.frame_governor.watch(self)
+        self.update_tray_tooltip(self.frame_governor.status_text())
         
-        # 设置系统托盘
-        self.setup_system_tray()
+        # 应用画质档位（帧率交给帧率调节器，隐藏和空闲时仍然可以暂停或降频）
+        self.apply_quality(self.quality.tier)
+        
+        # 恢复全屏飘雪
+        if self.snow_overlay_enabled:
+            self.snow_overlay.start(self.snow_count, self.particle_thread)
         
     def setup_system_tray(self):
         """设置系统托盘"""
@@ -267,15 +375,26 @@ class ChristmasTreeWidget(TransparentWidget):
             self.tray_icon.setContextMenu(tray_menu)
             self.tray_icon.show()
             
+    def update_tray_tooltip(self, status):
+        """更新托盘提示，显示当前的运行状态和帧率"""
+        if hasattr(self, 'tray_icon'):
+            self.tray_icon.setToolTip(f"圣诞树桌面插件 - {status}")
+            
     def quit_app(self):
         """退出应用程序"""
-        # 停止动画定时器
-        if hasattr(self, 'animation_timer') and self.animation_timer.isActive():
-            self.animation_timer.stop()
+        # 停止动画
+        if hasattr(self, 'frame_clock'):
+            self.frame_clock.unregister(self.update_animation)
         
         # 停止粒子系统
         if hasattr(self, 'particle_system'):
             self.particle_system.stop_particles()
+        if hasattr(self, 'stats_overlay'):
+            self.stats_overlay.disable()
+        if hasattr(self, 'quality'):
+            self.quality.stop()
+        if hasattr(self, 'snow_overlay'):
+            self.snow_overlay.release(self)
         
         # 关闭系统托盘
         if hasattr(self, 'tray_icon'):
@@ -314,6 +433,28 @@ class ChristmasTreeWidget(TransparentWidget):
                 # 恢复特效开关状态
                 if 'stars_enabled' in config:
                     self.stars_enabled = config['stars_enabled']
+                
+                # 恢复粒子引擎设置
+                if 'particle_engine' in config:
+                    self.particle_engine = config['particle_engine']
+                if 'particle_thread' in config:
+                    self.particle_thread = config['particle_thread']
+                if 'particle_collision' in config:
+                    self.particle_collision = config['particle_collision']
+                if 'snow_cover' in config:
+                    self.snow_cover_enabled = config['snow_cover']
+                if 'wind_strength' in config:
+                    self.wind_strength = config['wind_strength']
+                if 'wind_direction' in config:
+                    self.wind_direction = config['wind_direction']
+                if 'snow_overlay' in config:
+                    self.snow_overlay_enabled = config['snow_overlay']
+                if 'snow_count' in config:
+                    self.snow_count = config['snow_count']
+                if 'particle_count' in config:
+                    self.particle_count = config['particle_count']
+                if 'quality' in config:
+                    self.quality.set_mode(config['quality'], apply=False)
                 if 'garland_enabled' in config:
                     self.garland_enabled = config['garland_enabled']
                     
@@ -328,9 +469,26 @@ class ChristmasTreeWidget(TransparentWidget):
                 'global_alpha': self.global_alpha,
                 'topmost': bool(self.windowFlags() & Qt.WindowStaysOnTopHint),
                 'stars_enabled': self.stars_enabled,
+                'particle_engine': self.particle_engine,
+                'particle_thread': self.particle_thread,
+                'particle_collision': self.particle_collision,
+                'snow_cover': self.snow_cover_enabled,
+                'wind_strength': self.wind_strength,
+                'wind_direction': self.wind_direction,
+                'snow_overlay': self.snow_overlay.enabled,
+                'snow_count': self.snow_count,
+                'particle_count': self.particle_count,
+                'quality': self.quality.mode,
                 'garland_enabled': self.garland_enabled
             }
             
+            # 保留文件中其他插件的设置（widget_host中多个插件共用一个配置文件）
+            try:
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    config = {**json.load(f), **config}
+            except (OSError, ValueError, TypeError):
+                pass
+            
             with open(config_path, 'w', encoding='utf-8') as f:
                 json.dump(config, f, indent=4, ensure_ascii=False)
         except Exception as e:
@@ -346,16 +504,19 @@ class ChristmasTreeWidget(TransparentWidget):
             res_dir = os.path.join(current_dir, "res")
             if not os.path.exists(res_dir):
                 os.makedirs(res_dir)
+            
+            # 打包好的图集（build_assets.py生成），没有时读取单独的图片
+            atlas = PackedAtlas.open(res_dir, 'tree')
+            # 按窗口的设备像素比缩放图片，高分屏上不模糊
+            dpr = self.devicePixelRatioF()
 
             # 加载圣诞树图片
             # tree_path = "/workspace/user_input_files/imgTree.png"
-            tree_path = os.path.join(res_dir, "imgTree.png")
-            if os.path.exists(tree_path):
-                self.tree_pixmap = QPixmap(tree_path)
-                self.tree_pixmap = self.tree_pixmap.scaled(200, 310, Qt.KeepAspectRatio, 
-                                                          Qt.SmoothTransformation)
-            else:
-                self.tree_pixmap = self.create_fallback_tree()
+            # 图集中的树已经缩放好并裁掉了透明边，按偏移绘制；单独的图片
+            # 缩放后有磁盘缓存，之后启动时不再重新缩放
+            self.tree_sprite = load_trimmed_sprite(atlas, res_dir, "imgTree.png", 200, 310, dpr)
+            if self.tree_sprite is None:
+                self.tree_sprite = Sprite(self.create_fallback_tree())
             
             # 加载星星图片
             # star_paths = ["/workspace/user_input_files/Star1.png", "/workspace/user_input_files/Star2.png",
@@ -364,33 +525,28 @@ class ChristmasTreeWidget(TransparentWidget):
             star_filenames = [ "Star6.png","Star4.png","Star5.png"]
             self.star_pixmaps = []
             for filename in star_filenames:
-                star_path = os.path.join(res_dir, filename)
-                if os.path.exists(star_path):
-                    pixmap = QPixmap(star_path)
-                    self.star_pixmaps.append(pixmap.scaled(19, 20, Qt.KeepAspectRatio,
-                                                         Qt.SmoothTransformation))
-                else:
+                pixmap = load_sprite(atlas, res_dir, filename, 19, 20, dpr)
+                if pixmap is None:
                     # 创建备用星星
-                    self.star_pixmaps.append(self.create_fallback_star())
+                    pixmap = self.create_fallback_star()
+                self.star_pixmaps.append(pixmap)
             
-            # 加载灯带图片
-            self.garland_pixmaps = {0: [], 1: []}
+            # 加载灯带图片（和树一样大、大部分透明，图集中只保存有内容的部分）
+            self.garland_sprites = {0: [], 1: []}
             for i in range(1, 5):
                 # img_0_* 系列
                 # path0 = f"/workspace/user_input_files/img_0_{i}.png"
-                path0 = os.path.join(res_dir, f"img_0_{i}.png")
-                if os.path.exists(path0):
-                    self.garland_pixmaps[0].append(QPixmap(path0))
-                else:
-                    self.garland_pixmaps[0].append(self.create_fallback_garland(0))
+                sprite = load_trimmed_sprite(atlas, res_dir, f"img_0_{i}.png")
+                if sprite is None:
+                    sprite = Sprite(self.create_fallback_garland(0))
+                self.garland_sprites[0].append(sprite)
                 
                 # img_1_* 系列
                 # path1 = f"/workspace/user_input_files/img_1_{i}.png"
-                path1 = os.path.join(res_dir, f"img_1_{i}.png")
-                if os.path.exists(path1):
-                    self.garland_pixmaps[1].append(QPixmap(path1))
-                else:
-                    self.garland_pixmaps[1].append(self.create_fallback_garland(1))
+                sprite = load_trimmed_sprite(atlas, res_dir, f"img_1_{i}.png")
+                if sprite is None:
+                    sprite = Sprite(self.create_fallback_garland(1))
+                self.garland_sprites[1].append(sprite)
                     
         except Exception as e:
             error_msg = f"资源加载错误: {e}\n将使用备用资源"
@@ -489,11 +645,11 @@ class ChristmasTreeWidget(TransparentWidget):
         
     def create_fallback_resources(self):
         """创建所有备用资源"""
-        self.tree_pixmap = self.create_fallback_tree()
+        self.tree_sprite = Sprite(self.create_fallback_tree())
         self.star_pixmaps = [self.create_fallback_star() for _ in range(6)]
-        self.garland_pixmaps = {
-            0: [self.create_fallback_garland(0) for _ in range(4)],
-            1: [self.create_fallback_garland(1) for _ in range(4)]
+        self.garland_sprites = {
+            0: [Sprite(self.create_fallback_garland(0)) for _ in range(4)],
+            1: [Sprite(self.create_fallback_garland(1)) for _ in range(4)]
         }
         
     def init_star_positions(self):
@@ -506,31 +662,63 @@ class ChristmasTreeWidget(TransparentWidget):
             # self.star_speeds[i][1] = random.uniform(1, 3)  # y速度
             self.star_coords[i][0] = random.uniform(80, 220)  # 缩小x范围，更靠近树
             self.star_coords[i][1] = random.uniform(15, 40)  # 调整y范围，更靠近树尖
-            self.star_speeds[i][0] = random.uniform(-0.1, 0.1)  # 减小横向速度
-            self.star_speeds[i][1] = random.uniform(0.3, 0.8)  # 减小纵向速度，飘落更慢
+            self.star_speeds[i][0] = random.uniform(-5 / 3, 5 / 3)  # 横向速度(px/s)，速度小更柔和
+            self.star_speeds[i][1] = random.uniform(5, 40 / 3)  # 纵向速度(px/s)，飘落更慢
             
-    def update_animation(self):
-        """更新动画帧"""
-        # 更新星星位置
+    def update_animation(self, dt):
+        """按dt秒推进动画"""
+        damage = QRegion()
+        
+        # 更新星星位置，新旧位置都需要重绘
         if self.stars_enabled:
-            self.update_stars()
+            damage = damage.united(self.stars_region())
+            self.update_stars(dt)
+            damage = damage.united(self.stars_region())
             
         # 更新灯带动画
         if self.garland_enabled:
-            self.current_garland_frame += 1  # 不断增加，不限制范围
-            # 避免数值过大，每960帧重置一次（1分钟）
-            if self.current_garland_frame > 960:
-                self.current_garland_frame = 0
+            phase = self.garland_phase()
+            # 按周期取余，避免数值一直增大
+            cycle_length = len(GARLAND_SEQUENCE) * GARLAND_PHASE_SECONDS
+            self.garland_time = (self.garland_time + dt) % cycle_length
+            # 灯带切换阶段时才需要重绘灯带区域
+            if self.garland_phase() != phase:
+                self.invalidate_background()
+                damage = damage.united(self.garland_rect())
             
-        # 重绘窗口
-        self.update()
+        # 累积落地的粒子并融化积雪，积雪图片重新生成时重绘它覆盖的区域
+        if hasattr(self.particle_system, 'take_landings'):
+            damage = damage.united(self.snow_cover.update(dt, self.particle_system.take_landings()))
         
-    def update_stars(self):
-        """更新星星位置"""
+        # 只重绘变化的区域（本帧结束时统一重绘）
+        self.frame_clock.request_update(self, damage)
+        
+    def stars_region(self):
+        """星星当前位置覆盖的区域"""
+        region = QRegion()
+        for i in range(len(self.star_pixmaps)):
+            pixmap = self.star_pixmaps[i]
+            region = region.united(QRect(QPoint(int(self.star_coords[i][0]) - 9,
+                                                int(self.star_coords[i][1]) - 10),
+                                         logical_size(pixmap)))
+        return region
+        
+    def garland_rect(self):
+        """圣诞树和灯带实际有内容的区域"""
+        tree_x = (300 - self.tree_sprite.width()) // 2
+        tree_y = 50
+        rect = self.tree_sprite.rect(tree_x, tree_y)
+        for sprites in self.garland_sprites.values():
+            for sprite in sprites:
+                rect = rect.united(sprite.rect(tree_x, tree_y))
+        return rect
+        
+    def update_stars(self, dt):
+        """按dt秒更新星星位置"""
         for i in range(6):
             # 更新位置
-            self.star_coords[i][0] += self.star_speeds[i][0]
-            self.star_coords[i][1] += self.star_speeds[i][1]
+            self.star_coords[i][0] += self.star_speeds[i][0] * dt
+            self.star_coords[i][1] += self.star_speeds[i][1] * dt
             
             # 边界检测和重置
             if self.star_coords[i][1] > 400:
@@ -543,26 +731,66 @@ class ChristmasTreeWidget(TransparentWidget):
             if (self.star_coords[i][0] < 0 or self.star_coords[i][0] > 300):
                 self.star_speeds[i][0] = -self.star_speeds[i][0]
                 
+    def create_particle_system(self):
+        """创建粒子系统 - 安装了numpy时使用向量化引擎，可以在工作线程中模拟"""
+        if self.particle_engine == 'numpy' and NUMPY_AVAILABLE:
+            system = VectorParticleSystem(sprite_count=len(self.star_pixmaps),
+                                          threaded=self.particle_thread,
+                                          wind_strength=self.wind_strength,
+                                          wind_direction=self.wind_direction)
+            system.record_landings(self.snow_cover_enabled)
+            return system
+        return ParticleSystem(sprite_count=len(self.star_pixmaps))
+        
+    def update_collider(self):
+        """让粒子落在圣诞树的轮廓上（灯带不参与碰撞）"""
+        if not hasattr(self.particle_system, 'set_collider'):
+            return  # 原来的ParticleSystem不支持碰撞
+        field = collision_field(self.tree_sprite) if self.particle_collision else None
+        tree_x = (300 - self.tree_sprite.width()) // 2
+        self.particle_system.set_collider(field, tree_x, 50)
+        # 积雪跟着轮廓移动，换了图片时清空
+        snow_field = field if self.snow_cover_enabled else None
+        self.frame_clock.request_update(self, self.snow_cover.set_collider(snow_field, tree_x, 50))
+        
+    def apply_quality(self, tier):
+        """应用画质档位：粒子数量、帧率，抗锯齿和贴图过滤在绘制时读取"""
+        if self.particle_system.running:
+            self.particle_system.set_particle_count(self.quality.particle_count(self.particle_count))
+        self.frame_governor.set_normal_interval(self, tier.frame_interval)
+        self.update()
+        
+    def set_quality(self, mode):
+        """设置画质（菜单）"""
+        self.quality.set_mode(mode)
+        self.save_config()
+        
     def update_particles(self, particles):
-        """更新粒子位置"""
+        """更新粒子位置 - 只保存粒子数据的引用，绘制时原地读取"""
         self.current_particles = particles
-        self.update()  # 触发重绘
+        if self.particle_system.generation != self.particle_generation:
+            self.particle_generation = self.particle_system.generation
+            # 只重绘粒子新旧位置覆盖的区域，本帧结束时统一重绘
+            region = particle_damage_region(particles, self.sprite_atlas.cell_size // 2)
+            self.frame_clock.request_update(self, region.united(self.particle_region))
+            self.particle_region = region
         
     def paintEvent(self, event):
         """绘制事件"""
+        if self.stats_overlay.enabled:
+            self.stats_overlay.begin_paint()
+        self.quality.begin_paint()
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+        tier = self.quality.tier
+        painter.setRenderHint(QPainter.Antialiasing, tier.antialiasing)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, tier.smooth_pixmaps)
+        
+        # 静态内容直接从背景图层贴图，只贴需要重绘的区域
+        self.background_layer.draw(painter, event.region())
+        
+        # 绘制积雪
+        self.snow_cover.draw(painter, event.rect())
         
-        # 绘制圣诞树
-        if hasattr(self, 'tree_pixmap'):
-            tree_x = (300 - self.tree_pixmap.width()) // 2
-            tree_y = 50
-            painter.drawPixmap(tree_x, tree_y, self.tree_pixmap)
-            
-        # 绘制灯带
-        if self.garland_enabled and hasattr(self, 'garland_pixmaps'):
-            self.draw_garland(painter)
-            
         # 绘制星星
         if self.stars_enabled:
             self.draw_stars(painter)
@@ -571,55 +799,64 @@ class ChristmasTreeWidget(TransparentWidget):
         if self.stars_enabled and hasattr(self, 'current_particles'):
             self.draw_particles(painter)
             
-    def draw_garland(self, painter):
-        """绘制灯带动画 - 实现6秒周期序列效果"""
-        # 获取圣诞树的实际位置和大小
-        if hasattr(self, 'tree_pixmap'):
-            tree_x = (300 - self.tree_pixmap.width()) // 2
-            tree_y = 50
-        else:
-            # 如果没有树图片，使用默认位置
-            tree_x = 50
-            tree_y = 50
+        self.quality.end_paint()
         
-        # 计算当前帧在6秒周期中的位置
-        # 动画帧率为16 FPS（每60ms一帧），6秒周期共96帧
-        cycle_length = 96  # 6秒 * 16 FPS = 96帧
-        cycle_frame = self.current_garland_frame % cycle_length
-        
-        # 根据当前帧位置决定显示哪些灯带图片
-        # 每个阶段持续16帧（1秒）
-        phase = cycle_frame // 16  # 0-5，对应6个阶段
-        
-        # 获取可用的灯带图片
-        garland_0 = self.garland_pixmaps[0]  # img_0_1到0_4
-        garland_1 = self.garland_pixmaps[1]  # img_1_1到1_4
-        
-        # 根据阶段绘制相应的灯带图片
-        if phase == 0:  # 第1秒：显示0_1
-            if len(garland_0) >= 1:
-                painter.drawPixmap(tree_x, tree_y, garland_0[0])
-        elif phase == 1:  # 第2秒：显示0_2和1_1
-            if len(garland_0) >= 2:
-                painter.drawPixmap(tree_x, tree_y, garland_0[1])
-            if len(garland_1) >= 1:
-                painter.drawPixmap(tree_x, tree_y, garland_1[0])
-        elif phase == 2:  # 第3秒：显示0_3和1_2
-            if len(garland_0) >= 3:
-                painter.drawPixmap(tree_x, tree_y, garland_0[2])
-            if len(garland_1) >= 2:
-                painter.drawPixmap(tree_x, tree_y, garland_1[1])
-        elif phase == 3:  # 第4秒：显示0_4和1_3
-            if len(garland_0) >= 4:
-                painter.drawPixmap(tree_x, tree_y, garland_0[3])
-            if len(garland_1) >= 3:
-                painter.drawPixmap(tree_x, tree_y, garland_1[2])
-        elif phase == 4:  # 第5秒：显示1_4
-            if len(garland_1) >= 4:
-                painter.drawPixmap(tree_x, tree_y, garland_1[3])
-        # phase == 5: 第6秒：不显示任何灯带
+        # 性能统计浮层
+        if self.stats_overlay.enabled:
+            self.stats_overlay.end_paint(painter, len(self.current_particles))
+            
+    def garland_phase(self):
+        """当前灯带阶段，对应GARLAND_SEQUENCE的下标"""
+        # 6个阶段，每个阶段GARLAND_PHASE_SECONDS秒
+        phase = int(self.garland_time / GARLAND_PHASE_SECONDS)
+        return min(phase, len(GARLAND_SEQUENCE) - 1)
+        
+    def garland_frame(self, phase):
+        """获取某个灯带阶段预先合成好的树+灯带图片，首次使用时合成"""
+        frame = self.garland_frames.get(phase)
+        if frame is None:
+            frame = self.compose_garland_frame(phase)
+            self.garland_frames[phase] = frame
+        return frame
+        
+    def compose_garland_frame(self, phase):
+        """把圣诞树和该阶段的灯带图片合成一张图，只保留有内容的区域"""
+        overlays = [self.garland_sprites[series][index]
+                    for series, index in GARLAND_SEQUENCE[phase]
+                    if index < len(self.garland_sprites[series])]
+        bounds = self.tree_sprite.bounds()
+        for overlay in overlays:
+            bounds = bounds.united(overlay.bounds())
+        
+        dpr = self.tree_sprite.pixmap.devicePixelRatio()
+        frame = QPixmap(bounds.size() * dpr)
+        frame.setDevicePixelRatio(dpr)
+        frame.fill(Qt.transparent)
+        painter = QPainter(frame)
+        for sprite in [self.tree_sprite] + overlays:
+            sprite.draw(painter, -bounds.x(), -bounds.y())
+        painter.end()
+        return Sprite(frame, bounds.topLeft(), self.tree_sprite.size)
         
+    def draw_garland(self, painter, tree_x, tree_y):
+        """绘制灯带动画 - 6秒周期序列，每帧只贴一张合成好的图"""
+        self.garland_frame(self.garland_phase()).draw(painter, tree_x, tree_y)
                 
+    def draw_background(self, painter):
+        """绘制静态背景图层的内容"""
+        # 绘制圣诞树，开启灯带时直接绘制预先合成好的树和灯带
+        if hasattr(self, 'tree_sprite'):
+            tree_x = (300 - self.tree_sprite.width()) // 2
+            tree_y = 50
+            if self.garland_enabled and hasattr(self, 'garland_sprites'):
+                self.draw_garland(painter, tree_x, tree_y)
+            else:
+                self.tree_sprite.draw(painter, tree_x, tree_y)
+            
+    def invalidate_background(self):
+        """静态内容变化，下次绘制时重新生成背景图层"""
+        self.background_layer.invalidate()
+        
     def draw_stars(self, painter):
         """绘制飘落的星星"""
         # 只绘制实际加载的星星数量，避免绘制备用黄色圆形
@@ -631,43 +868,9 @@ class ChristmasTreeWidget(TransparentWidget):
                 painter.drawPixmap(x - 9, y - 10, self.star_pixmaps[i])
                     
     def draw_particles(self, painter):
-        """绘制粒子效果"""
-        for particle in self.current_particles:
-            x = int(particle['x'])
-            y = int(particle['y'])
-            alpha = int(particle['alpha'])
-            size = int(particle['size'])
-            rotation = particle['rotation']
-            
-            # 设置透明度
-            painter.setOpacity(alpha / 255.0)
-            
-            # 保存当前变换矩阵
-            painter.save()
-            
-            # 平移到粒子位置
-            painter.translate(x, y)
-            
-            # 旋转
-            painter.rotate(rotation)
-            
-            # 使用加载的星星图片而不是十字架
-            if hasattr(self, 'star_pixmaps') and self.star_pixmaps:
-                # 随机选择一个星星图片
-                star_index = random.randint(0, len(self.star_pixmaps) - 1)
-                star_pixmap = self.star_pixmaps[star_index]
-                
-                # 根据粒子大小缩放图片
-                scaled_pixmap = star_pixmap.scaled(size * 2, size * 2, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                
-                # 居中绘制
-                painter.drawPixmap(-scaled_pixmap.width() // 2, -scaled_pixmap.height() // 2, scaled_pixmap)
-            
-            # 恢复变换矩阵
-            painter.restore()
-        
-        # 恢复不透明度
-        painter.setOpacity(1.0)
+        """绘制粒子效果 - 同一种星星的粒子合并成一次drawPixmapFragments调用"""
+        # 透明度、尺寸和角度由每个片段自带，星星图片在粒子出生时就已固定
+        self.sprite_atlas.draw_particles(painter, self.current_particles)
         
     def setup_context_menu(self):
         """设置右键菜单"""
@@ -713,6 +916,41 @@ class ChristmasTreeWidget(TransparentWidget):
             action.triggered.connect(lambda checked, a=alpha: self.set_transparency(a))
             transparency_menu.addAction(action)
             
+        # 画质设置，自动时显示当前使用的档位
+        quality_menu = menu.addMenu("画质")
+        quality_modes = [(QUALITY_AUTO, f"自动（当前：{self.quality.tier.label}）")]
+        quality_modes += [(tier.name, tier.label) for tier in reversed(QUALITY_TIERS)]
+        for mode, text in quality_modes:
+            action = QAction(text, self)
+            action.setCheckable(True)
+            action.setChecked(mode == self.quality.mode)
+            action.triggered.connect(lambda checked, m=mode: self.set_quality(m))
+            quality_menu.addAction(action)
+            
+        # 全屏飘雪（需要numpy）
+        snow_action = QAction("全屏飘雪", self)
+        snow_action.setCheckable(True)
+        snow_action.setChecked(self.snow_overlay.enabled)
+        snow_action.setEnabled(SNOW_OVERLAY_AVAILABLE)
+        snow_action.triggered.connect(self.toggle_snow_overlay)
+        menu.addAction(snow_action)
+        
+        # 粒子碰撞（需要numpy）
+        collision_action = QAction("星星落在树上", self)
+        collision_action.setCheckable(True)
+        collision_action.setChecked(self.particle_collision)
+        collision_action.setEnabled(hasattr(self.particle_system, 'set_collider'))
+        collision_action.triggered.connect(self.toggle_particle_collision)
+        menu.addAction(collision_action)
+        
+        # 积雪（需要numpy）
+        snow_cover_action = QAction("积雪", self)
+        snow_cover_action.setCheckable(True)
+        snow_cover_action.setChecked(self.snow_cover_enabled)
+        snow_cover_action.setEnabled(hasattr(self.particle_system, 'record_landings'))
+        snow_cover_action.triggered.connect(self.toggle_snow_cover)
+        menu.addAction(snow_cover_action)
+            
         menu.addSeparator()
         
         # 置顶开关
@@ -725,6 +963,19 @@ class ChristmasTreeWidget(TransparentWidget):
         
         menu.addSeparator()
         
+        # 隐藏的性能统计选项，按住Shift打开右键菜单时才显示
+        if QApplication.keyboardModifiers() & Qt.ShiftModifier:
+            stats_action = QAction("性能统计", self)
+            stats_action.setCheckable(True)
+            stats_action.setChecked(self.stats_overlay.enabled)
+            stats_action.triggered.connect(self.stats_overlay.toggle)
+            menu.addAction(stats_action)
+            if self.stats_overlay.enabled:
+                export_action = QAction("导出性能数据...", self)
+                export_action.triggered.connect(self.export_frame_stats)
+                menu.addAction(export_action)
+            menu.addSeparator()
+        
         # 退出
         exit_action = QAction("退出", self)
         exit_action.triggered.connect(self.close)
@@ -732,6 +983,16 @@ class ChristmasTreeWidget(TransparentWidget):
         
         menu.exec(self.mapToGlobal(position))
         
+    def export_frame_stats(self):
+        """把性能统计数据导出为JSON文件"""
+        default_path = os.path.join(os.path.dirname(self.get_config_path()), "frame_stats.json")
+        path, _ = QFileDialog.getSaveFileName(self, "导出性能数据", default_path, "JSON (*.json)")
+        if path:
+            try:
+                self.stats_overlay.export(path, len(self.current_particles))
+            except OSError as e:
+                QMessageBox.warning(self, "导出失败", f"导出性能数据失败: {e}")
+                
     def show_about(self):
         """显示关于对话框"""
         QMessageBox.about(self, "关于", 
@@ -740,6 +1001,29 @@ class ChristmasTreeWidget(TransparentWidget):
                          "版本：1.0\n"
                          "更多：https://github.com/liucf1224-del?tab=repositories\n")
                          
+    def toggle_snow_overlay(self):
+        """切换全屏飘雪"""
+        if self.snow_overlay.enabled:
+            self.snow_overlay.stop()
+        else:
+            self.snow_overlay.start(self.snow_count, self.particle_thread)
+        self.save_config()
+        
+    def toggle_particle_collision(self):
+        """切换粒子碰撞"""
+        self.particle_collision = not self.particle_collision
+        self.update_collider()
+        self.save_config()
+        
+    def toggle_snow_cover(self):
+        """切换积雪，关闭时清空已有的积雪"""
+        self.snow_cover_enabled = not self.snow_cover_enabled
+        self.particle_system.record_landings(self.snow_cover_enabled)
+        if not self.snow_cover_enabled:
+            self.frame_clock.request_update(self, self.snow_cover.clear())
+        self.update_collider()
+        self.save_config()
+        
     def toggle_stars(self):
         """切换星星效果"""
         self.stars_enabled = not self.stars_enabled
@@ -748,14 +1032,19 @@ class ChristmasTreeWidget(TransparentWidget):
         # 控制粒子系统的启停
         if hasattr(self, 'particle_system'):
             if self.stars_enabled:
-                self.particle_system.start_particles(120)  # 启动粒子系统
+                self.particle_system.start_particles(
+                    self.quality.particle_count(self.particle_count))  # 启动粒子系统
             else:
                 self.particle_system.stop_particles()  # 停止粒子系统
+        self.particle_region = QRegion()
+        self.update()  # 静态内容变化，重绘整个窗口
         
     def toggle_garland(self):
         """切换灯带效果"""
         self.garland_enabled = not self.garland_enabled
         self.save_config()
+        self.invalidate_background()
+        self.update()  # 静态内容变化，重绘整个窗口
         
     def set_transparency(self, alpha):
         """设置透明度"""
@@ -777,12 +1066,20 @@ class ChristmasTreeWidget(TransparentWidget):
         """关闭事件"""
         # 保存配置
         self.save_config()
-        # 停止动画定时器
-        if hasattr(self, 'animation_timer') and self.animation_timer.isActive():
-            self.animation_timer.stop()
+        # 停止动画
+        if hasattr(self, 'frame_clock'):
+            self.frame_clock.unregister(self.update_animation)
+        if hasattr(self, 'frame_governor'):
+            self.frame_governor.forget(self)
         # 停止粒子系统
         if hasattr(self, 'particle_system'):
             self.particle_system.stop_particles()
+        if hasattr(self, 'stats_overlay'):
+            self.stats_overlay.disable()
+        if hasattr(self, 'quality'):
+            self.quality.stop()
+        if hasattr(self, 'snow_overlay'):
+            self.snow_overlay.release(self)
         event.accept()
 
 
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面插件粒子碰撞 - 圣诞树/人物轮廓的碰撞场（需要numpy）
+作者：codeliu
+
+把图片的alpha通道预先计算成紧凑的数组，每张图片、每种镜像状态只计算
+一次，之后向量化粒子引擎每步对所有粒子批量查表：
+- occupied：像素是否属于轮廓（alpha超过阈值）
+- depth：从该像素向上连续被占用的像素数，落进轮廓的粒子按它抬到表面
+- slide：停在表面上的粒子向哪边滑（-1左、0不动、1右），由下方左右两侧
+  是否空出决定
+- surface：每一列最上面被占用的行（积雪堆在这里），空列为-1
+
+粒子从空白处落进轮廓时停在表面上，沿斜坡滑动，失去支撑时重新下落，
+停留一段时间后融化消失。出生时就在轮廓内的粒子（在人物前面）直接穿过。
+
+数组都是连续的，查表时按展平后的下标take，中间结果写入调用方预分配的
+LookupBuffers，粒子引擎每步查表不分配内存。
+"""
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage
+
+from image_loader import Sprite, logical_size
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+ALPHA_THRESHOLD = 128  # alpha超过这个值的像素算作轮廓
+
+MAX_FIELDS = 8  # 最多缓存的碰撞场数量，切换角色时淘汰最早计算的
+_fields = {}  # (图片cacheKey, 偏移, 是否镜像) -> 碰撞场，进程内共享
+
+
+class CollisionField:
+    """一张图片的碰撞场，坐标相对图片原图的左上角
+
+    left、top是数组左上角在原图中的位置（图集中裁剪过的图片有偏移）。
+    """
+
+    def __init__(self, occupied, left=0, top=0):
+        self.occupied = occupied = np.ascontiguousarray(occupied)
+        self.height, self.width = occupied.shape
+        self.left = left
+        self.top = top
+
+        # 向上连续被占用的像素数：逐行累加，遇到空白清零
+        depth = np.zeros(occupied.shape, dtype=np.uint16)
+        for row in range(self.height):
+            if row:
+                depth[row] = (depth[row - 1] + 1) * occupied[row]
+            else:
+                depth[row] = occupied[row]
+        self.depth = depth
+
+        # 下一行的左右两侧是否空出（超出边界算空出）
+        below = np.zeros(occupied.shape, dtype=bool)
+        below[:-1] = occupied[1:]
+        below_left = np.zeros(occupied.shape, dtype=bool)
+        below_left[:, 1:] = below[:, :-1]
+        below_right = np.zeros(occupied.shape, dtype=bool)
+        below_right[:, :-1] = below[:, 1:]
+        # 两边都空出（尖顶）或都没空出（平地）时不动
+        self.slide = (~below_right).astype(np.int8) - (~below_left).astype(np.int8)
+
+        self.surface = np.where(occupied.any(axis=0), occupied.argmax(axis=0), -1)
+
+    @classmethod
+    def from_image(cls, image, left=0, top=0):
+        """从QImage的alpha通道生成碰撞场"""
+        alpha = image.convertToFormat(QImage.Format_Alpha8)
+        width, height = alpha.width(), alpha.height()
+        stride = alpha.bytesPerLine()
+        data = np.frombuffer(alpha.constBits().asstring(stride * height), dtype=np.uint8)
+        occupied = data.reshape(height, stride)[:, :width] > ALPHA_THRESHOLD
+        return cls(occupied, left, top)
+
+    def mirrored(self, full_width):
+        """左右镜像后的碰撞场，full_width是原图宽度"""
+        field = CollisionField.__new__(CollisionField)
+        field.occupied = np.ascontiguousarray(self.occupied[:, ::-1])
+        field.height, field.width = self.height, self.width
+        field.left = full_width - self.left - self.width
+        field.top = self.top
+        field.depth = np.ascontiguousarray(self.depth[:, ::-1])
+        field.slide = np.ascontiguousarray(-self.slide[:, ::-1])
+        field.surface = np.ascontiguousarray(self.surface[::-1])
+        return field
+
+    def lookup(self, x, y, out):
+        """批量查表，结果写入out（LookupBuffers）
+
+        x、y是相对数组左上角的坐标（float数组）。查表后out.rows是行，
+        out.cells是展平后的下标（超出范围的夹到边缘），out.valid表示是否
+        在范围内，out.occupied表示是否落在轮廓内。
+        """
+        cols, rows, valid, check = out.cols, out.rows, out.valid, out.check
+        np.floor(x, out=out.work)
+        np.copyto(cols, out.work, casting='unsafe')
+        np.floor(y, out=out.work)
+        np.copyto(rows, out.work, casting='unsafe')
+        np.greater_equal(cols, 0, out=valid)
+        np.less(cols, self.width, out=check)
+        valid &= check
+        np.greater_equal(rows, 0, out=check)
+        valid &= check
+        np.less(rows, self.height, out=check)
+        valid &= check
+        np.clip(cols, 0, self.width - 1, out=cols)
+        np.clip(rows, 0, self.height - 1, out=rows)
+        np.multiply(rows, self.width, out=out.cells)
+        out.cells += cols
+        np.take(self.occupied.reshape(-1), out.cells, out=out.occupied)
+        out.occupied &= valid
+
+    def take_slide(self, out):
+        """上次lookup的位置的滑动方向，写入out.slide"""
+        return np.take(self.slide.reshape(-1), out.cells, out=out.slide)
+
+    def take_depth(self, out):
+        """上次lookup的位置向上连续被占用的像素数，写入out.depth"""
+        return np.take(self.depth.reshape(-1), out.cells, out=out.depth)
+
+    def contains(self, x, y):
+        """这些点是否落在轮廓内（临时分配数组，用于少量粒子）"""
+        out = LookupBuffers(len(x))
+        self.lookup(x, y, out)
+        return out.occupied
+
+
+class LookupBuffers:
+    """碰撞场批量查表用的预分配数组，每个粒子系统一份"""
+
+    def __init__(self, count):
+        self.work = np.empty(count, dtype=np.float64)
+        self.cols = np.empty(count, dtype=np.intp)
+        self.rows = np.empty(count, dtype=np.intp)
+        self.cells = np.empty(count, dtype=np.intp)
+        self.valid = np.empty(count, dtype=bool)
+        self.check = np.empty(count, dtype=bool)
+        self.occupied = np.empty(count, dtype=bool)
+        self.slide = np.empty(count, dtype=np.int8)
+        self.depth = np.empty(count, dtype=np.uint16)
+
+
+def collision_field(sprite, mirrored=False):
+    """获取图片（Sprite或QPixmap）的碰撞场，同一张图片和镜像状态只计算一次"""
+    if not NUMPY_AVAILABLE:
+        return None
+    if not isinstance(sprite, Sprite):
+        sprite = Sprite(sprite)
+    if sprite.pixmap.isNull():
+        return None
+    offset = (sprite.offset.x(), sprite.offset.y())
+    key = (sprite.pixmap.cacheKey(), offset, mirrored)
+    field = _fields.get(key)
+    if field is None:
+        if mirrored:
+            field = collision_field(sprite).mirrored(sprite.width())
+        else:
+            # 高分屏的图片按逻辑尺寸计算，与粒子坐标一致
+            image = sprite.pixmap.toImage()
+            size = logical_size(sprite.pixmap)
+            if image.size() != size:
+                image = image.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            field = CollisionField.from_image(image, *offset)
+        if len(_fields) >= MAX_FIELDS:
+            del _fields[next(iter(_fields))]
+        _fields[key] = field
+    return field
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面插件动画导出 - 不需要显示器，以固定时间步长快进并导出动画
+作者：codeliu
+
+在offscreen平台下创建插件，停掉它自己的帧时钟，由导出循环按输出帧率
+推进模拟（粒子按TICK_INTERVAL的固定步长，星星/灯带/上下浮动按60ms），
+每帧用widget.render把paintEvent画到QImage上。模拟不等定时器，CPU能跑
+多快就导出多快。
+
+GUI线程只负责模拟和绘制，压缩/量化交给线程池（zlib和Pillow在压缩时
+释放GIL），按帧号顺序取回结果写入文件，最多同时排队workers * 2帧：
+    png   PNG序列（输出目录，每帧一个文件，线程池直接写文件）
+    apng  动画PNG（纯Python写入acTL/fcTL/fdAT块，不需要额外的库）
+    gif   动画GIF（需要安装Pillow，GIF只有1位透明，使用不透明背景）
+
+固定--seed时粒子、风场和星星的随机数都固定，同一版本的代码导出的帧
+完全一致，可以用来对比渲染改动前后的画面。
+
+用法：
+    python export_animation.py tree.png --widget tree --duration 4
+    python export_animation.py labubu.gif --widget labubu --fps 25 --background "#202830"
+    python export_animation.py frames --format png --count 1000 --seed 1
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QImage
+from PyQt5.QtWidgets import QApplication
+
+from particle_engine import NUMPY_AVAILABLE, TICK_SECONDS
+from quality import QUALITY_NAMES
+from render_benchmark import (ANIMATION_INTERVAL, WIDGET_SCRIPTS, load_widget_class,
+                              prepare_widget, release_widget)
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+    from wind_field import WindField
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+DEFAULT_GIF_BACKGROUND = "#282c34"  # GIF没有半透明，默认画在深色背景上
+COMPRESS_LEVEL = 6
+
+
+def png_chunk(kind, data):
+    """一个PNG数据块：长度、类型、数据、CRC"""
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+
+def png_header(width, height):
+    """IHDR块：8位RGBA、不隔行"""
+    return png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+
+def compress_rgba(rgba, width, height):
+    """把RGBA像素压缩成PNG的图像数据（每行使用过滤类型0）"""
+    stride = width * 4
+    rows = b''.join(b'\x00' + rgba[row * stride:(row + 1) * stride] for row in range(height))
+    return zlib.compress(rows, COMPRESS_LEVEL)
+
+
+class AnimationWriter:
+    """导出文件的写入基类 - 作为上下文管理器使用
+
+    正常结束时close完成文件；导出过程中出错（包括close本身出错）时abort
+    关闭文件并删除写了一半的输出，不留下残缺的文件。
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.abort()
+            return False
+        try:
+            self.close()
+        except BaseException:
+            self.abort()
+            raise
+        return False
+
+    def close(self):
+        """完成导出"""
+
+    def abort(self):
+        """放弃导出，删除已经写入的文件"""
+
+
+class PngSequenceWriter(AnimationWriter):
+    """PNG序列 - 输出目录中每帧一个文件，由线程池直接写入"""
+
+    def __init__(self, path, width, height, frame_count, fps):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.frame_count = frame_count
+        self.digits = max(5, len(str(frame_count)))
+        os.makedirs(path, exist_ok=True)
+
+    def frame_path(self, index):
+        """第index帧的文件路径"""
+        return os.path.join(self.path, f"frame_{index:0{self.digits}d}.png")
+
+    def encode(self, index, rgba):
+        """在线程池中压缩并写入一帧"""
+        data = compress_rgba(rgba, self.width, self.height)
+        with open(self.frame_path(index), 'wb') as f:
+            f.write(PNG_SIGNATURE + png_header(self.width, self.height)
+                    + png_chunk(b'IDAT', data) + png_chunk(b'IEND', b''))
+
+    def write(self, result):
+        """按顺序处理一帧的压缩结果（已经写入文件）"""
+
+    def abort(self):
+        """删除这次导出的帧文件（线程池中的任务已经结束）"""
+        for index in range(self.frame_count):
+            try:
+                os.remove(self.frame_path(index))
+            except FileNotFoundError:
+                pass
+
+
+class ApngWriter(AnimationWriter):
+    """动画PNG - 第一帧同时作为普通PNG的图像，其余帧写成fdAT块"""
+
+    def __init__(self, path, width, height, frame_count, fps):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.sequence = 0  # fcTL和fdAT共用的序号
+        self.frame = 0
+        self.file = open(path, 'wb')
+        self.file.write(PNG_SIGNATURE + png_header(width, height)
+                        + png_chunk(b'acTL', struct.pack('>II', frame_count, 0)))  # 0表示无限循环
+
+    def encode(self, index, rgba):
+        """在线程池中压缩一帧"""
+        return compress_rgba(rgba, self.width, self.height)
+
+    def write(self, data):
+        """按顺序写入一帧：每帧覆盖整个画面（不混合，不处理上一帧）"""
+        control = struct.pack('>IIIIIHHBB', self.sequence, self.width, self.height, 0, 0,
+                              1, self.fps, 0, 0)
+        self.file.write(png_chunk(b'fcTL', control))
+        self.sequence += 1
+        if self.frame == 0:
+            self.file.write(png_chunk(b'IDAT', data))
+        else:
+            self.file.write(png_chunk(b'fdAT', struct.pack('>I', self.sequence) + data))
+            self.sequence += 1
+        self.frame += 1
+
+    def close(self):
+        """写入结束块并关闭文件"""
+        try:
+            self.file.write(png_chunk(b'IEND', b''))
+        finally:
+            self.file.close()
+
+    def abort(self):
+        """关闭并删除没有写完的文件"""
+        self.file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class GifWriter(AnimationWriter):
+    """动画GIF - 线程池中量化成256色，全部完成后由Pillow写入"""
+
+    def __init__(self, path, width, height, frame_count, fps):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.duration = round(1000 / fps)  # 每帧时长(ms)，GIF按10ms取整
+        self.frames = []
+
+    def encode(self, index, rgba):
+        """在线程池中把一帧量化成调色板图像"""
+        image = Image.frombytes('RGBA', (self.width, self.height), rgba).convert('RGB')
+        return image.quantize(colors=256)
+
+    def write(self, image):
+        """按顺序收集一帧"""
+        self.frames.append(image)
+
+    def close(self):
+        """写入GIF文件"""
+        if self.frames:
+            self.frames[0].save(self.path, save_all=True, append_images=self.frames[1:],
+                                duration=self.duration, loop=0)
+
+    def abort(self):
+        """丢弃收集的帧，删除可能写了一半的文件"""
+        self.frames = []
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+# 导出格式 -> (写入类, 说明)
+EXPORT_FORMATS = {
+    'png': (PngSequenceWriter, "PNG序列"),
+    'apng': (ApngWriter, "动画PNG"),
+    'gif': (GifWriter, "动画GIF"),
+}
+
+
+def guess_format(path):
+    """按输出路径的扩展名猜测格式，没有扩展名时导出为PNG序列"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.gif':
+        return 'gif'
+    if ext in ('.png', '.apng'):
+        return 'apng'
+    return 'png'
+
+
+def seed_random(seed):
+    """固定插件、粒子和风场使用的随机数"""
+    random.seed(seed)
+    if NUMPY_AVAILABLE:
+        WindField._shared = WindField(seed=seed)
+
+
+class AnimationExporter:
+    """按固定时间步长驱动插件并导出每一帧"""
+
+    def __init__(self, widget, fps, background=None, seed=None):
+        self.widget = widget
+        self.fps = fps
+        self.background = background
+        self.seed = seed
+        self.particle_time = 0.0  # 还没有推进的粒子模拟时间(秒)
+        self.animation_time = 0.0  # 还没有推进的动画时间(秒)
+        self.image = QImage(widget.size(), QImage.Format_ARGB32_Premultiplied)
+
+    def restart_particles(self, count):
+        """固定随机数后重新生成粒子，同样的seed得到同样的画面"""
+        system = self.widget.particle_system
+        if self.seed is not None and hasattr(system, 'rng'):
+            system.rng = np.random.default_rng(self.seed)
+        system.stop_particles()
+        system.start_particles(count)
+        self.widget.frame_clock.pause()
+
+    def advance(self, dt):
+        """推进dt秒：粒子按固定步长，最后一步按剩余时间插值；动画按60ms"""
+        widget = self.widget
+        self.particle_time += dt
+        while self.particle_time >= TICK_SECONDS:
+            widget.particle_system.update_particles(TICK_SECONDS)
+            self.particle_time -= TICK_SECONDS
+        widget.particle_system.interpolate(self.particle_time / TICK_SECONDS)
+
+        interval = ANIMATION_INTERVAL / 1000.0
+        self.animation_time += dt
+        while self.animation_time >= interval:
+            widget.update_animation(interval)
+            self.animation_time -= interval
+
+    def render(self):
+        """把当前画面画到QImage上，返回RGBA像素（非预乘）"""
+        widget = self.widget
+        # 不走帧时钟的重绘，丢弃收集到的脏区域
+        widget.frame_clock.pending_updates.pop(widget, None)
+        if self.background is not None:
+            self.image.fill(self.background)
+        else:
+            self.image.fill(Qt.transparent)
+        widget.render(self.image)
+        rgba = self.image.convertToFormat(QImage.Format_RGBA8888)
+        return rgba.constBits().asstring(rgba.sizeInBytes())
+
+    def export(self, writer, frames, warmup, workers):
+        """先空跑warmup帧让粒子散开，再导出frames帧；返回(模拟绘制耗时, 总耗时)
+
+        writer由调用方作为上下文管理器打开，结束时完成或删除输出文件。
+        """
+        dt = 1.0 / self.fps
+        for _ in range(warmup):
+            self.advance(dt)
+
+        start = time.perf_counter()
+        render_time = 0.0
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for index in range(frames):
+                begin = time.perf_counter()
+                self.advance(dt)
+                rgba = self.render()
+                render_time += time.perf_counter() - begin
+                pending.append(pool.submit(writer.encode, index, rgba))
+                # 排队的帧太多时先按顺序写出最早的，限制内存占用
+                while len(pending) > workers * 2:
+                    writer.write(pending.popleft().result())
+            while pending:
+                writer.write(pending.popleft().result())
+        return render_time, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把桌面插件的动画导出为GIF、APNG或PNG序列")
+    parser.add_argument('output', help="输出文件（.gif/.png/.apng），PNG序列时为输出目录")
+    parser.add_argument('--widget', choices=list(WIDGET_SCRIPTS), default='tree',
+                        help="要导出的插件，默认tree")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default=None,
+                        help="导出格式，默认按输出路径的扩展名判断")
+    parser.add_argument('--duration', type=float, default=4.0, help="动画时长(秒)，默认4")
+    parser.add_argument('--fps', type=int, default=30, help="输出帧率，默认30")
+    parser.add_argument('--warmup', type=float, default=2.0,
+                        help="开始导出前空跑的时间(秒)，让粒子散开，默认2")
+    parser.add_argument('--count', type=int, default=120, help="粒子数量，默认120")
+    parser.add_argument('--engine', choices=('numpy', 'python'), default=None,
+                        help="粒子引擎，默认使用config.json中的设置")
+    parser.add_argument('--quality', choices=QUALITY_NAMES, default='high',
+                        help="画质档位，默认high")
+    parser.add_argument('--background', default=None,
+                        help=f"背景颜色，默认透明（GIF默认{DEFAULT_GIF_BACKGROUND}）")
+    parser.add_argument('--seed', type=int, default=None, help="随机数种子，固定后每次导出相同的画面")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="压缩线程数，默认CPU核数")
+    args = parser.parse_args(argv)
+
+    export_format = args.format or guess_format(args.output)
+    writer_class, format_name = EXPORT_FORMATS[export_format]
+    if export_format == 'gif' and not PIL_AVAILABLE:
+        parser.error("导出GIF需要安装Pillow：pip install Pillow")
+    if args.fps <= 0 or args.duration <= 0:
+        parser.error("--fps和--duration必须大于0")
+    background = args.background
+    if background is None and export_format == 'gif':
+        background = DEFAULT_GIF_BACKGROUND
+    if background is not None:
+        background = QColor(background)
+        if not background.isValid():
+            parser.error(f"无效的背景颜色: {args.background}")
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    if args.seed is not None:
+        seed_random(args.seed)
+
+    widget = load_widget_class(args.widget)()
+    width, height = widget.width(), widget.height()
+    try:
+        prepare_widget(widget, args.count, args.engine, args.quality)
+        exporter = AnimationExporter(widget, args.fps, background, args.seed)
+        exporter.restart_particles(args.count)
+
+        frames = max(1, round(args.duration * args.fps))
+        warmup = round(args.warmup * args.fps)
+        with writer_class(args.output, width, height, frames, args.fps) as writer:
+            render_time, total_time = exporter.export(writer, frames, warmup,
+                                                      max(1, args.workers))
+    finally:
+        release_widget(widget)
+        app.processEvents()
+
+    print(f"{format_name}已导出到 {args.output}：{frames} 帧，{width}x{height}，"
+          f"{args.fps} FPS")
+    print(f"模拟和绘制 {render_time * 1000 / frames:.2f} ms/帧，总耗时 {total_time:.2f} 秒"
+          f"（{args.duration / total_time:.1f} 倍速）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面插件统一帧时钟
+作者：codeliu
+
+每个进程只有一个精确定时器，按QElapsedTimer测得的真实间隔推进所有
+注册的动画（星星、灯带、粒子、上下浮动等），每帧最后统一发出一次重绘。
+有运行间隔的回调按固定步长积分：累计的真实时间够几步就运行几次，
+每次传入固定的步长（秒），剩余不足一步的时间通过interpolate回调
+换算成0~1的插值系数，绘制时在上一步和当前状态之间插值。因此帧率
+是30Hz还是120Hz、定时器是否准时，动画的速度都一样。
+重绘请求可以带上脏区域，同一帧内的脏区域会合并后再提交。
+打开性能统计（frame_stats）时，每帧的模拟耗时和帧间隔写入stats；
+使用自动画质（quality）时测量每帧的模拟耗时。
+
+FrameGovernor根据窗口是否可见、用户是否空闲、是否使用电池调整帧时钟：
+窗口全部隐藏或被完全遮挡时暂停，空闲或电池供电时降低帧率。
+遮挡在Windows上按Z序中位于窗口上方的窗口判断，其他平台只能依靠
+QWindow.isExposed()（隐藏、最小化和部分窗口管理器报告的遮挡）。空闲时间
+读取系统级数据（Windows、macOS、X11），读取不到时（如Wayland）不按空闲降频。
+"""
+
+import ctypes
+import ctypes.util
+import glob
+import os
+import sys
+import time
+from PyQt5 import sip
+from PyQt5.QtCore import Qt, QTimer, QElapsedTimer, QEvent, QObject, QRect, pyqtSignal
+from PyQt5.QtGui import QRegion
+
+DEFAULT_FRAME_INTERVAL = 16  # 默认帧间隔(ms)，约60FPS
+MAX_FRAME_TIME = 250  # 单帧最多推进的时间(ms)，休眠或长时间卡顿后多出的时间丢弃
+TIMER_SLACK = 1.0  # 定时器提前触发的容差(ms)
+DAMAGE_TILE = 32  # 粒子脏区域的瓦片大小(px)
+LOW_POWER_FRAME_INTERVAL = 66  # 空闲或电池供电时的帧间隔(ms)，约15FPS
+IDLE_TIMEOUT = 120  # 无操作多少秒后进入空闲状态
+POWER_POLL_INTERVAL = 5000  # 检查空闲、电池和遮挡状态的间隔(ms)
+# Win32常量：Z序中的上一个窗口、扩展样式、分层窗口、DWM隐藏状态
+GW_HWNDPREV = 3
+GWL_EXSTYLE = -20
+WS_EX_LAYERED = 0x00080000
+DWMWA_CLOAKED = 14
+
+
+def tiles_to_region(tiles, tile=DAMAGE_TILE):
+    """把 (行, 列) 瓦片集合合并成QRegion，同一行连续的瓦片合成一个矩形"""
+    region = QRegion()
+    run_row = run_start = run_end = None
+    for row, col in sorted(tiles):
+        if row == run_row and col == run_end + 1:
+            run_end = col
+            continue
+        if run_row is not None:
+            region = region.united(QRect(run_start * tile, run_row * tile,
+                                         (run_end - run_start + 1) * tile, tile))
+        run_row, run_start, run_end = row, col, col
+    if run_row is not None:
+        region = region.united(QRect(run_start * tile, run_row * tile,
+                                     (run_end - run_start + 1) * tile, tile))
+    return region
+
+
+class FrameSubscriber:
+    """注册到帧时钟的回调及其运行间隔"""
+
+    def __init__(self, callback, interval, interpolate=None):
+        self.callback = callback  # callback(dt)，dt为推进的时间(秒)
+        self.interval = interval  # 固定步长(ms)，0表示每帧运行一次并传入真实间隔
+        self.interpolate = interpolate  # interpolate(alpha)，每帧步进之后调用
+        self.accumulated = 0.0  # 还没有推进的时间(ms)
+
+
+class FrameClock(QObject):
+    """统一帧时钟 - 推进所有动画并合并重绘请求"""
+    running_changed = pyqtSignal(bool)  # 暂停(False)或恢复(True)时发送
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        """获取进程内共享的帧时钟"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, parent=None, frame_interval=DEFAULT_FRAME_INTERVAL):
+        super().__init__(parent)
+        self.frame_interval = frame_interval
+        self.subscribers = []
+        self.pending_updates = {}  # 本帧需要重绘的窗口 -> 脏区域（None表示整个窗口）
+        self.paused = False
+        self.stats = None  # 性能统计，打开统计浮层时才设置
+        self.stats_owners = set()  # 打开了统计浮层的窗口
+        self.timing_owners = set()  # 需要模拟耗时的对象（自动画质）
+        self.simulate_time = 0.0  # 最近一帧的模拟耗时(ms)，有人需要时才测量
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        self.elapsed = QElapsedTimer()
+
+    def register(self, callback, interval=0, interpolate=None):
+        """注册回调，按interval毫秒的固定步长运行
+
+        interpolate不为空时，每帧步进之后以剩余时间占一步的比例调用，
+        用于在上一步和当前状态之间插值出绘制位置。
+        """
+        if any(sub.callback == callback for sub in self.subscribers):
+            return
+        self.subscribers.append(FrameSubscriber(callback, interval, interpolate))
+        if not self.timer.isActive() and not self.paused:
+            self.elapsed.start()
+            self.timer.start(self.frame_interval)
+
+    def unregister(self, callback):
+        """取消注册，没有回调时停止定时器"""
+        self.subscribers = [sub for sub in self.subscribers if sub.callback != callback]
+        if not self.subscribers:
+            self.timer.stop()
+
+    def set_frame_interval(self, frame_interval):
+        """调整帧间隔 - 整个进程的帧预算只有这一个开关"""
+        if frame_interval == self.frame_interval:
+            return
+        self.frame_interval = frame_interval
+        if self.timer.isActive():
+            self.timer.start(frame_interval)
+
+    def pause(self):
+        """暂停所有动画，注册的回调保持不变"""
+        self.timer.stop()
+        if not self.paused:
+            self.paused = True
+            self.running_changed.emit(False)
+
+    def resume(self):
+        """恢复动画 - 重新计时，暂停期间的时间不计入动画"""
+        if not self.paused:
+            return
+        self.paused = False
+        for sub in self.subscribers:
+            sub.accumulated = 0.0
+        if self.subscribers:
+            self.elapsed.start()
+            self.timer.start(self.frame_interval)
+        self.running_changed.emit(True)
+
+    def request_update(self, widget, region=None):
+        """请求在本帧结束时重绘窗口，同一帧内的多次请求合并成一次
+
+        region为空时重绘整个窗口，否则只重绘这些区域。
+        """
+        if widget in self.pending_updates:
+            pending = self.pending_updates[widget]
+            if pending is None or region is None:
+                self.pending_updates[widget] = None
+            else:
+                self.pending_updates[widget] = pending.united(region)
+        else:
+            self.pending_updates[widget] = region
+
+    def tick(self):
+        """推进一帧"""
+        delta = self.elapsed.nsecsElapsed() / 1e6
+        self.elapsed.restart()
+        stats = self.stats
+        if stats is not None:
+            stats.record('interval', delta)
+        timing = stats is not None or bool(self.timing_owners)
+        if timing:
+            simulate_start = time.perf_counter()
+        # 卡顿时按真实时间补跑，但不追赶休眠等造成的超长间隔
+        delta = min(delta, MAX_FRAME_TIME)
+
+        for sub in list(self.subscribers):
+            if sub.interval <= 0:
+                sub.callback(delta / 1000.0)
+                if sub.interpolate is not None:
+                    sub.interpolate(1.0)
+                continue
+            sub.accumulated += delta
+            step = sub.interval / 1000.0
+            while sub.accumulated + TIMER_SLACK >= sub.interval:
+                sub.callback(step)
+                sub.accumulated -= sub.interval
+            if sub.interpolate is not None:
+                sub.interpolate(min(1.0, max(0.0, sub.accumulated / sub.interval)))
+
+        if timing:
+            self.simulate_time = (time.perf_counter() - simulate_start) * 1000
+            if stats is not None:
+                stats.record('simulate', self.simulate_time)
+
+        # 每帧只发出一次重绘
+        pending, self.pending_updates = self.pending_updates, {}
+        for widget, region in pending.items():
+            if region is None:
+                widget.update()
+            elif not region.isEmpty():
+                widget.update(region)
+
+
+class XScreenSaverInfo(ctypes.Structure):
+    """libXss的XScreenSaverInfo"""
+    _fields_ = [('window', ctypes.c_ulong), ('state', ctypes.c_int), ('kind', ctypes.c_int),
+                ('til_or_since', ctypes.c_ulong), ('idle', ctypes.c_ulong),
+                ('event_mask', ctypes.c_ulong)]
+
+
+_idle_source = None  # 系统空闲时间的读取函数，第一次使用时查找，找不到时为False
+
+
+def mac_idle_source():
+    """macOS：CoreGraphics记录的距离上一次输入事件的秒数"""
+    path = ctypes.util.find_library('ApplicationServices')
+    if not path:
+        return None
+    func = ctypes.cdll.LoadLibrary(path).CGEventSourceSecondsSinceLastEventType
+    func.restype = ctypes.c_double
+    func.argtypes = [ctypes.c_int32, ctypes.c_uint32]
+    # kCGEventSourceStateCombinedSessionState, kCGAnyInputEventType
+    return lambda: func(0, 0xFFFFFFFF)
+
+
+def x11_idle_source():
+    """X11：XScreenSaver扩展记录的无操作毫秒数"""
+    x11_path = ctypes.util.find_library('X11')
+    xss_path = ctypes.util.find_library('Xss')
+    if not os.environ.get('DISPLAY') or not x11_path or not xss_path:
+        return None
+    x11 = ctypes.cdll.LoadLibrary(x11_path)
+    xss = ctypes.cdll.LoadLibrary(xss_path)
+    x11.XOpenDisplay.restype = ctypes.c_void_p
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XDefaultRootWindow.restype = ctypes.c_ulong
+    x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+    xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(XScreenSaverInfo)
+    xss.XScreenSaverQueryInfo.argtypes = [ctypes.c_void_p, ctypes.c_ulong,
+                                          ctypes.POINTER(XScreenSaverInfo)]
+    display = x11.XOpenDisplay(None)
+    if not display:
+        return None
+    root = x11.XDefaultRootWindow(display)
+    info = xss.XScreenSaverAllocInfo()
+
+    def idle():
+        if not xss.XScreenSaverQueryInfo(display, root, info):
+            return None
+        return info.contents.idle / 1000.0
+    return idle
+
+
+def system_idle_seconds():
+    """系统级无操作时间（秒），无法获取时返回None"""
+    global _idle_source
+    if sys.platform == 'win32':
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [('cbSize', ctypes.c_uint), ('dwTime', ctypes.c_uint)]
+
+        info = LASTINPUTINFO()
+        info.cbSize = ctypes.sizeof(info)
+        if ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+            millis = (ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF
+            return millis / 1000.0
+        return None
+
+    if _idle_source is None:
+        _idle_source = False
+        try:
+            source = mac_idle_source() if sys.platform == 'darwin' else x11_idle_source()
+        except (OSError, AttributeError):
+            source = None
+        if source is not None:
+            _idle_source = source
+    return _idle_source() if _idle_source else None
+
+
+def window_occluded(widget):
+    """Windows：窗口是否被Z序中位于它上方的窗口完全盖住
+
+    只计算可见、未最小化、未隐藏（cloaked，如其他虚拟桌面）的窗口；分层
+    窗口（半透明、鼠标穿透，包括其他插件和全屏飘雪）不算遮挡。其他平台
+    返回False。
+    """
+    if sys.platform != 'win32':
+        return False
+    from ctypes import wintypes
+    user32 = ctypes.windll.user32
+    user32.GetWindow.restype = ctypes.c_void_p
+    user32.GetWindow.argtypes = [ctypes.c_void_p, ctypes.c_uint]
+    user32.GetWindowRect.argtypes = [ctypes.c_void_p, ctypes.POINTER(wintypes.RECT)]
+    user32.GetWindowLongW.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    user32.IsWindowVisible.argtypes = [ctypes.c_void_p]
+    user32.IsIconic.argtypes = [ctypes.c_void_p]
+
+    def window_rect(hwnd):
+        rect = wintypes.RECT()
+        user32.GetWindowRect(hwnd, ctypes.byref(rect))
+        return QRect(rect.left, rect.top, rect.right - rect.left, rect.bottom - rect.top)
+
+    def cloaked(hwnd):
+        value = ctypes.c_int(0)
+        try:
+            ctypes.windll.dwmapi.DwmGetWindowAttribute(
+                ctypes.c_void_p(hwnd), DWMWA_CLOAKED, ctypes.byref(value), ctypes.sizeof(value))
+        except (OSError, AttributeError):
+            return False
+        return value.value != 0
+
+    hwnd = int(widget.winId())
+    remaining = QRegion(window_rect(hwnd))
+    above = user32.GetWindow(hwnd, GW_HWNDPREV)
+    while above and not remaining.isEmpty():
+        if (user32.IsWindowVisible(above) and not user32.IsIconic(above)
+                and not user32.GetWindowLongW(above, GWL_EXSTYLE) & WS_EX_LAYERED
+                and not cloaked(above)):
+            remaining = remaining.subtracted(QRegion(window_rect(above)))
+        above = user32.GetWindow(above, GW_HWNDPREV)
+    return remaining.isEmpty()
+
+
+def on_battery_power():
+    """是否正在使用电池供电，无法判断时按外接电源处理"""
+    if sys.platform == 'win32':
+        class SYSTEM_POWER_STATUS(ctypes.Structure):
+            _fields_ = [('ACLineStatus', ctypes.c_byte), ('BatteryFlag', ctypes.c_byte),
+                        ('BatteryLifePercent', ctypes.c_byte), ('SystemStatusFlag', ctypes.c_byte),
+                        ('BatteryLifeTime', ctypes.c_ulong), ('BatteryFullLifeTime', ctypes.c_ulong)]
+
+        status = SYSTEM_POWER_STATUS()
+        if ctypes.windll.kernel32.GetSystemPowerStatus(ctypes.byref(status)):
+            return status.ACLineStatus == 0
+        return False
+
+    # Linux：存在外接电源但都未接通时认为在用电池
+    mains = []
+    for path in glob.glob('/sys/class/power_supply/*'):
+        try:
+            with open(os.path.join(path, 'type')) as f:
+                if f.read().strip() != 'Mains':
+                    continue
+            with open(os.path.join(path, 'online')) as f:
+                mains.append(f.read().strip() == '1')
+        except OSError:
+            continue
+    return bool(mains) and not any(mains)
+
+
+class FrameGovernor(QObject):
+    """自适应帧率调节 - 隐藏/遮挡时暂停，空闲或电池供电时降频"""
+    state_changed = pyqtSignal(str)  # 状态变化时发送状态说明，用于托盘提示
+
+    ACTIVE = 'active'
+    IDLE = 'idle'
+    BATTERY = 'battery'
+    PAUSED = 'paused'
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        """获取进程内共享的帧率调节器"""
+        if cls._instance is None:
+            cls._instance = cls(FrameClock.instance())
+        return cls._instance
+
+    def __init__(self, frame_clock, parent=None):
+        super().__init__(parent)
+        self.frame_clock = frame_clock
+        self.default_interval = frame_clock.frame_interval
+        self.normal_intervals = {}  # 各插件画质档位要求的帧间隔
+        self.widgets = []
+        self.state = self.ACTIVE
+        self.reported = None  # 上次通知托盘的 (状态, 帧间隔)
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.timeout.connect(self.evaluate)
+        self.poll_timer.start(POWER_POLL_INTERVAL)
+
+    def watch(self, widget):
+        """监视一个插件窗口的显示状态和用户操作"""
+        if widget not in self.widgets:
+            self.widgets.append(widget)
+            widget.installEventFilter(self)
+            if widget.windowHandle() is not None:
+                widget.windowHandle().installEventFilter(self)
+            widget.destroyed.connect(lambda obj=None, w=widget: self.forget(w))
+        self.evaluate()
+
+    def forget(self, widget):
+        """不再监视该窗口"""
+        if widget in self.widgets:
+            self.widgets.remove(widget)
+        self.normal_intervals.pop(widget, None)
+        # 进程退出时帧时钟和调节器可能已先于窗口销毁
+        if not sip.isdeleted(self) and not sip.isdeleted(self.frame_clock.timer):
+            self.evaluate()
+
+    def set_normal_interval(self, widget, frame_interval):
+        """设置某个插件正常运行时要求的帧间隔"""
+        self.normal_intervals[widget] = frame_interval
+        self.evaluate()
+
+    @property
+    def normal_interval(self):
+        """正常运行时的帧间隔 - 帧时钟由所有插件共享，取要求最高的帧率"""
+        if not self.normal_intervals:
+            return self.default_interval
+        return min(self.normal_intervals.values())
+
+    def eventFilter(self, obj, event):
+        """窗口显示状态或用户操作变化时立即重新评估"""
+        event_type = event.type()
+        if event_type in (QEvent.MouseButtonPress, QEvent.MouseMove, QEvent.Wheel,
+                          QEvent.KeyPress, QEvent.Enter, QEvent.ContextMenu):
+            if self.state != self.ACTIVE:
+                self.evaluate()
+        elif event_type in (QEvent.Show, QEvent.Hide, QEvent.WindowStateChange):
+            if event_type == QEvent.Show and obj in self.widgets and obj.windowHandle() is not None:
+                obj.windowHandle().installEventFilter(self)
+            QTimer.singleShot(0, self.evaluate)
+        elif event_type == QEvent.Expose:
+            QTimer.singleShot(0, self.evaluate)
+        return False
+
+    def is_visible(self, widget):
+        """窗口是否可见：已显示、未最小化且没有被完全遮挡
+
+        被其他窗口盖住时Windows上isExposed()仍为True，另外按Z序检查；
+        其他平台只能发现窗口管理器报告的遮挡。
+        """
+        if not widget.isVisible() or widget.isMinimized():
+            return False
+        window = widget.windowHandle()
+        if window is not None and not window.isExposed():
+            return False
+        return not window_occluded(widget)
+
+    def idle_seconds(self):
+        """用户在整个系统中的无操作时间，无法获取时返回None（不按空闲降频）
+
+        只看插件自己收到的输入会把在其他程序里打字的用户当成空闲。
+        """
+        return system_idle_seconds()
+
+    def evaluate(self):
+        """根据当前状况决定暂停、降频还是正常运行"""
+        if self.widgets and not any(self.is_visible(w) for w in self.widgets):
+            state = self.PAUSED
+        elif (self.idle_seconds() or 0) >= IDLE_TIMEOUT:
+            state = self.IDLE
+        elif on_battery_power():
+            state = self.BATTERY
+        else:
+            state = self.ACTIVE
+
+        if state == self.PAUSED:
+            self.frame_clock.pause()
+        else:
+            if state == self.ACTIVE:
+                self.frame_clock.set_frame_interval(self.normal_interval)
+            else:
+                self.frame_clock.set_frame_interval(max(self.normal_interval,
+                                                        LOW_POWER_FRAME_INTERVAL))
+            self.frame_clock.resume()
+
+        # 同一状态下帧间隔也会变（画质档位、降频），托盘里的帧率要跟着更新
+        self.state = state
+        reported = (state, self.frame_clock.frame_interval)
+        if reported != self.reported:
+            self.reported = reported
+            self.state_changed.emit(self.status_text())
+
+    def status_text(self):
+        """当前状态的说明文字"""
+        if self.state == self.PAUSED:
+            return "已暂停"
+        fps = round(1000 / self.frame_clock.frame_interval)
+        if self.state == self.IDLE:
+            return f"空闲降频 {fps} FPS"
+        if self.state == self.BATTERY:
+            return f"电池供电 {fps} FPS"
+        return f"运行中 {fps} FPS"
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面插件运行时性能统计
+作者：codeliu
+
+在用户机器上查看实际开销：帧时钟记录每帧的模拟耗时和定时器间隔，
+插件记录每次paintEvent的耗时，都写入固定大小的环形缓冲。按住Shift
+打开右键菜单可以看到隐藏的“性能统计”选项，打开后在左上角显示FPS、
+各阶段耗时的百分位数、粒子数量和图片占用的内存，并可以导出为JSON。
+
+统计关闭时帧时钟和插件都不做任何计时。
+"""
+
+import json
+import math
+import time
+from array import array
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QColor, QFont, QPixmap, QRegion
+
+from frame_clock import FrameClock
+from image_loader import Sprite
+
+STATS_CAPACITY = 600  # 每种数据保留最近多少个样本（60FPS约10秒）
+OVERLAY_REFRESH_INTERVAL = 250  # 浮层刷新间隔(ms)
+OVERLAY_RECT = QRect(4, 4, 172, 108)  # 浮层在窗口中的位置
+
+# 统计图片内存时检查的插件属性，点号表示属性的属性
+PIXMAP_ATTRIBUTES = ('tree_pixmap', 'tree_sprite', 'original_pixmap', 'star_pixmaps',
+                     'garland_sprites', 'garland_frames', 'background_layer.pixmap', 'sprite_atlas.sheets',
+                     'mirrored_pixmaps.pixmaps', 'character_loader.pixmaps')
+
+
+class RingBuffer:
+    """固定大小的环形缓冲，写满后覆盖最旧的数据"""
+
+    def __init__(self, capacity=STATS_CAPACITY):
+        self.values = array('d', bytes(8 * capacity))
+        self.capacity = capacity
+        self.index = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
+
+    def append(self, value):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def samples(self):
+        """按时间顺序返回当前保存的样本"""
+        if self.count < self.capacity:
+            return list(self.values[:self.count])
+        return list(self.values[self.index:]) + list(self.values[:self.index])
+
+
+def percentile(sorted_values, fraction):
+    """最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, rank))]
+
+
+def summarize(samples):
+    """把耗时样本(ms)汇总成平均值和百分位数"""
+    values = sorted(samples)
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else 0.0,
+        'p50': percentile(values, 0.50),
+        'p95': percentile(values, 0.95),
+        'p99': percentile(values, 0.99),
+    }
+
+
+class FrameStats:
+    """每帧耗时统计 - simulate（模拟）、paint（绘制）、interval（帧间隔）"""
+    KINDS = ('simulate', 'paint', 'interval')
+
+    def __init__(self, capacity=STATS_CAPACITY):
+        self.buffers = {kind: RingBuffer(capacity) for kind in self.KINDS}
+        self.started = time.time()
+
+    def record(self, kind, milliseconds):
+        """记录一个样本(ms)"""
+        self.buffers[kind].append(milliseconds)
+
+    def summary(self, kind):
+        """某种数据的百分位数"""
+        return summarize(self.buffers[kind].samples())
+
+    def fps(self):
+        """按最近的帧间隔计算的帧率"""
+        intervals = self.buffers['interval'].samples()
+        if not intervals:
+            return 0.0
+        return 1000.0 * len(intervals) / max(sum(intervals), 1e-6)
+
+    def to_dict(self, extra=None):
+        """导出为可以写入JSON的字典"""
+        data = {
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+            'exported': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'fps': self.fps(),
+            'summary': {kind: self.summary(kind) for kind in self.KINDS},
+            'samples': {kind: self.buffers[kind].samples() for kind in self.KINDS},
+        }
+        if extra:
+            data.update(extra)
+        return data
+
+    def export_json(self, path, extra=None):
+        """把统计数据保存为JSON文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(extra), f, indent=4, ensure_ascii=False)
+
+
+def pixmap_bytes(value, seen=None):
+    """统计QPixmap或Sprite（可以嵌套在列表/字典中）占用的内存，同一张图片只算一次"""
+    if seen is None:
+        seen = set()
+    if isinstance(value, Sprite):
+        value = value.pixmap
+    if isinstance(value, QPixmap):
+        if value.isNull() or value.cacheKey() in seen:
+            return 0
+        seen.add(value.cacheKey())
+        return value.width() * value.height() * value.depth() // 8
+    if isinstance(value, dict):
+        value = value.values()
+    if isinstance(value, (list, tuple, type({}.values()))):
+        return sum(pixmap_bytes(item, seen) for item in value)
+    return 0
+
+
+def widget_pixmap_bytes(widget):
+    """插件持有的所有图片占用的内存"""
+    seen = set()
+    total = 0
+    for path in PIXMAP_ATTRIBUTES:
+        value = widget
+        for name in path.split('.'):
+            value = getattr(value, name, None)
+            if value is None:
+                break
+        total += pixmap_bytes(value, seen)
+    return total
+
+
+class StatsOverlay:
+    """性能统计浮层 - 打开时才让帧时钟和paintEvent计时"""
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.frame_clock = FrameClock.instance()
+        self.enabled = False
+        self.stats = None
+        self.paint_start = 0.0
+        self.particle_count = 0  # 最近一次绘制时的粒子数量
+        self.text = ""  # 浮层文字，刷新时才重新计算
+        self.font = QFont()
+        self.font.setPointSize(8)
+
+    def toggle(self):
+        """打开或关闭统计"""
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def enable(self):
+        """开始统计并显示浮层"""
+        if self.enabled:
+            return
+        # 同一进程的插件共用帧时钟，也共用一份统计数据
+        if self.frame_clock.stats is None:
+            self.frame_clock.stats = FrameStats()
+        self.frame_clock.stats_owners.add(self.widget)
+        self.stats = self.frame_clock.stats
+        self.enabled = True
+        self.frame_clock.register(self.refresh, OVERLAY_REFRESH_INTERVAL)
+        self.widget.update(OVERLAY_RECT)
+
+    def disable(self):
+        """停止统计并隐藏浮层"""
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.frame_clock.unregister(self.refresh)
+        self.frame_clock.stats_owners.discard(self.widget)
+        if not self.frame_clock.stats_owners:
+            self.frame_clock.stats = None
+        self.stats = None
+        self.widget.update(OVERLAY_RECT)
+
+    def refresh(self, dt=None):
+        """定期更新浮层文字并重绘浮层区域（由帧时钟调用）"""
+        self.text = '\n'.join(self.lines(self.particle_count))
+        self.frame_clock.request_update(self.widget, QRegion(OVERLAY_RECT))
+
+    def begin_paint(self):
+        """paintEvent开始"""
+        self.paint_start = time.perf_counter()
+
+    def end_paint(self, painter, particle_count):
+        """paintEvent结束：记录耗时并绘制浮层"""
+        self.stats.record('paint', (time.perf_counter() - self.paint_start) * 1000)
+        self.particle_count = particle_count
+        self.draw(painter)
+
+    def lines(self, particle_count):
+        """浮层显示的文字"""
+        interval = self.stats.summary('interval')
+        simulate = self.stats.summary('simulate')
+        paint = self.stats.summary('paint')
+        memory = widget_pixmap_bytes(self.widget) / (1024 * 1024)
+        return [
+            f"FPS {self.stats.fps():.1f}",
+            f"帧间隔 {interval['p50']:.1f}/{interval['p95']:.1f}/{interval['p99']:.1f} ms",
+            f"模拟 {simulate['p50']:.2f}/{simulate['p95']:.2f}/{simulate['p99']:.2f} ms",
+            f"绘制 {paint['p50']:.2f}/{paint['p95']:.2f}/{paint['p99']:.2f} ms",
+            f"粒子 {particle_count}",
+            f"图片内存 {memory:.1f} MB",
+        ]
+
+    def draw(self, painter):
+        """在左上角绘制统计浮层（p50/p95/p99）"""
+        painter.save()
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(0, 0, 0, 160))
+        painter.drawRoundedRect(OVERLAY_RECT, 6, 6)
+        painter.setPen(QColor(255, 255, 255))
+        painter.setFont(self.font)
+        text_rect = OVERLAY_RECT.adjusted(8, 6, -8, -6)
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignTop, self.text)
+        painter.restore()
+
+    def export(self, path, particle_count):
+        """导出统计数据"""
+        self.stats.export_json(path, {
+            'particles': particle_count,
+            'pixmap_bytes': widget_pixmap_bytes(self.widget),
+            'frame_interval': self.frame_clock.frame_interval,
+        })
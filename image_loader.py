@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面插件图片加载器 - 后台线程解码
+作者：codeliu
+
+启动时只同步解码当前要显示的图片，其余图片在用到时（或预取时）交给
+QThreadPool在工作线程中解码和缩放。工作线程只使用QImage，解码完成后
+回到主线程再转换成QPixmap，并通过image_ready信号通知插件。
+
+缩放后的图片以预乘ARGB32的原始像素保存在系统缓存目录中，以源文件路径、
+修改时间、大小、目标尺寸和设备像素比作为key，之后启动时直接读取，不再
+重新缩放，也不需要解码或转换像素格式；源文件变化后key随之改变，旧的
+缓存文件会被替换。插件按自己的devicePixelRatioF()加载，高分屏上图片按
+物理像素缩放，布局仍然使用逻辑尺寸（logical_size、Sprite）。
+
+PackedAtlas读取build_assets.py生成的图集：图集是zlib压缩的预乘ARGB32
+原始像素，第一次使用时解压到缓存目录，之后通过mmap打开后直接作为QImage
+使用，不需要解码；精灵已经按插件的显示尺寸缩放好并裁掉了透明边，
+load_trimmed_sprite返回裁剪后的图片和绘制偏移。没有图集时load_sprite回退到res下的单独图片。
+load_sprite加载过的精灵在进程内共享（最多MAX_LOADED_SPRITES个，淘汰最久
+未用的），同一进程中的多个插件（widget_host）只解码一次。
+"""
+
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from PyQt5.QtCore import (Qt, QObject, QPoint, QRect, QRectF, QRunnable, QSize, QThreadPool,
+                          QStandardPaths, pyqtSignal)
+from PyQt5.QtGui import QImage, QImageReader, QPainter, QPixmap
+
+SCALED_CACHE_DIR = 'scaled_images'  # 缓存目录下存放缩放结果的子目录
+SCALED_CACHE_VERSION = 2  # 缩放方式或缓存格式变化时加一，让旧缓存全部失效
+SCALED_CACHE_SUFFIX = '.argb'  # 缓存文件保存预乘ARGB32的原始像素
+RAW_IMAGE_HEADER = struct.Struct('<4sII')  # 原始像素文件头：标记、宽、高
+RAW_IMAGE_MAGIC = b'ARGB'
+ATLAS_INDEX_VERSION = 3  # 图集索引格式版本，与build_assets保持一致
+ATLAS_FORMAT = 'argb32_premultiplied'  # 图集像素格式，与build_assets保持一致
+ATLAS_COMPRESSION = 'zlib'  # 图集文件的压缩方式，与build_assets保持一致
+
+MAX_LOADED_SPRITES = 64  # 进程内最多共享多少个已加载的精灵
+_loaded_sprites = OrderedDict()  # (图片路径, 宽, 高, 设备像素比) -> 已加载的精灵，进程内共享
+MAX_OPAQUE_RECTS = 32  # 最多缓存多少张图片的不透明区域
+_opaque_rects = {}  # 图片cacheKey -> 不透明区域
+_decode_pool = None  # 解码图片的线程池，进程内共享
+
+
+def decode_pool():
+    """解码图片用的线程池
+
+    不使用QThreadPool.globalInstance()：QImage平滑缩放会把工作分给全局
+    线程池并等待完成，如果全局线程池被等待GIL的解码任务占满，持有GIL
+    缩放图片的主线程就会一直等下去。
+    """
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = QThreadPool()
+    return _decode_pool
+
+
+def scaled_cache_path(path, width, height, dpr=1.0, sprite=''):
+    """缩放结果的缓存文件路径，源文件不存在或没有缓存目录时返回None
+
+    文件名由两部分组成：源文件（图集中的精灵名）和目标尺寸决定前缀，
+    修改时间和大小决定后缀，同一前缀只保留最新的一个文件。
+    """
+    base = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+    if not base:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    target = f"{SCALED_CACHE_VERSION}|{os.path.abspath(path)}|{sprite}|{width}x{height}@{dpr}"
+    version = f"{stat.st_mtime_ns}|{stat.st_size}"
+    prefix = hashlib.sha1(target.encode('utf-8')).hexdigest()
+    suffix = hashlib.sha1(version.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(base, SCALED_CACHE_DIR, f"{prefix}_{suffix}{SCALED_CACHE_SUFFIX}")
+
+
+def read_cached_image(cache_path):
+    """读取缓存的缩放结果（预乘ARGB32），不存在或损坏时返回空QImage"""
+    if cache_path is None or not os.path.exists(cache_path):
+        return QImage()
+    try:
+        with open(cache_path, 'rb') as f:
+            data = f.read()
+        magic, width, height = RAW_IMAGE_HEADER.unpack_from(data)
+    except (OSError, struct.error):
+        return QImage()
+    if magic != RAW_IMAGE_MAGIC or len(data) != RAW_IMAGE_HEADER.size + width * height * 4:
+        return QImage()
+    # QImage不持有data，复制一次后data可以释放
+    image = QImage(data[RAW_IMAGE_HEADER.size:], width, height, width * 4,
+                   QImage.Format_ARGB32_Premultiplied)
+    return image.copy()
+
+
+def write_cached_image(image, cache_path):
+    """保存缩放结果（文件头加原始像素）"""
+    image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    # ARGB32每行正好width * 4字节，没有行尾填充
+    write_cache_file(cache_path, (
+        RAW_IMAGE_HEADER.pack(RAW_IMAGE_MAGIC, image.width(), image.height()),
+        image.constBits().asstring(image.width() * image.height() * 4)))
+
+
+def write_cache_file(cache_path, chunks):
+    """写入缓存文件并删除同一源文件的旧缓存，失败时忽略（缓存只是加速）"""
+    directory = os.path.dirname(cache_path)
+    prefix = os.path.basename(cache_path).split('_')[0]
+    temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(temp_path, cache_path)
+        for stale in glob.glob(os.path.join(directory, prefix + '_*')):
+            if stale != cache_path and not stale.endswith('.tmp'):
+                os.remove(stale)
+    except OSError as e:
+        print(f"保存图片缓存失败: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def scale_image(image, width, height, dpr=1.0):
+    """按比例平滑缩放到width x height以内"""
+    return image.scaled(int(width * dpr), int(height * dpr), Qt.KeepAspectRatio,
+                        Qt.SmoothTransformation)
+
+
+def finish_image(image, dpr=1.0):
+    """转换成预乘格式并设置设备像素比，主线程转换成QPixmap时不需要再转换像素
+
+    从缓存读取的图片已经是预乘格式，这里不再复制。
+    """
+    image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    image.setDevicePixelRatio(dpr)
+    return image
+
+
+def decode_image(path, width, height, dpr=1.0):
+    """解码图片并按比例缩放到width x height以内（工作线程安全）
+
+    优先读取缓存的缩放结果，没有缓存时缩放后写入缓存。
+    """
+    cache_path = scaled_cache_path(path, width, height, dpr)
+    image = read_cached_image(cache_path)
+    if image.isNull():
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        image = reader.read()
+        if image.isNull():
+            return image
+        image = finish_image(scale_image(image, width, height, dpr), dpr)
+        if cache_path is not None:
+            write_cached_image(image, cache_path)
+    return finish_image(image, dpr)
+
+
+def load_scaled_pixmap(path, width, height, dpr=1.0):
+    """在主线程加载按比例缩放后的图片（使用缩放缓存），失败时返回空QPixmap"""
+    image = decode_image(path, width, height, dpr)
+    if image.isNull():
+        return QPixmap()
+    return QPixmap.fromImage(image)
+
+
+def logical_size(pixmap):
+    """图片的逻辑尺寸（按设备像素比换算），插件布局都使用逻辑尺寸"""
+    dpr = pixmap.devicePixelRatio()
+    if dpr == 1.0:
+        return pixmap.size()
+    return QSize(int(round(pixmap.width() / dpr)), int(round(pixmap.height() / dpr)))
+
+
+def opaque_rect(pixmap):
+    """图片中alpha不为0的像素的外接矩形（逻辑像素），同一张图片只计算一次"""
+    key = pixmap.cacheKey()
+    rect = _opaque_rects.get(key)
+    if rect is None:
+        alpha = pixmap.toImage().convertToFormat(QImage.Format_Alpha8)
+        width, stride = alpha.width(), alpha.bytesPerLine()
+        data = alpha.constBits().asstring(stride * alpha.height())
+        left, right, top, bottom = width, 0, None, 0
+        for row in range(alpha.height()):
+            line = data[row * stride:row * stride + width]
+            trimmed = line.lstrip(b'\0')
+            if not trimmed:
+                continue
+            if top is None:
+                top = row
+            bottom = row + 1
+            left = min(left, width - len(trimmed))
+            right = max(right, len(line.rstrip(b'\0')))
+        rect = QRect()
+        if top is not None:
+            dpr = pixmap.devicePixelRatio()
+            rect = QRectF(left / dpr, top / dpr, (right - left) / dpr,
+                          (bottom - top) / dpr).toAlignedRect()
+        if len(_opaque_rects) >= MAX_OPAQUE_RECTS:
+            del _opaque_rects[next(iter(_opaque_rects))]
+        _opaque_rects[key] = rect
+    return rect
+
+
+class Sprite:
+    """一张精灵图片和它在原图中的位置
+
+    图集中的精灵裁掉了透明边，pixmap只是原图中有内容的部分，offset是它
+    在原图中的左上角，size是原图（显示尺寸）的大小。插件按原图大小排版，
+    绘制时把图片贴到 (x + offset) 处。
+    """
+
+    def __init__(self, pixmap, offset=None, size=None):
+        self.pixmap = pixmap
+        self.offset = offset if offset is not None else QPoint(0, 0)
+        self.size = size if size is not None else logical_size(pixmap)
+
+    def width(self):
+        """原图宽度"""
+        return self.size.width()
+
+    def height(self):
+        """原图高度"""
+        return self.size.height()
+
+    def bounds(self):
+        """图片在原图坐标中覆盖的区域"""
+        return QRect(self.offset, logical_size(self.pixmap))
+
+    def rect(self, x, y):
+        """原图左上角放在(x, y)时图片覆盖的区域"""
+        return self.bounds().translated(x, y)
+
+    def draw(self, painter, x, y):
+        """把原图的左上角放在(x, y)绘制"""
+        painter.drawPixmap(x + self.offset.x(), y + self.offset.y(), self.pixmap)
+
+    def mirrored(self, pixmap):
+        """左右镜像后的精灵，pixmap是镜像后的图片，偏移也按原图宽度镜像"""
+        x = self.size.width() - self.offset.x() - logical_size(self.pixmap).width()
+        return Sprite(pixmap, QPoint(x, self.offset.y()), self.size)
+
+
+class PackedAtlas:
+    """build_assets.py生成的图集 - 一个压缩的像素文件加一个索引
+
+    图集文件是zlib压缩的预乘ARGB32原始像素。第一次打开时解压到缓存目录
+    （图集文件变化后重新解压），之后的启动直接mmap解压好的文件，作为
+    QImage使用；没有缓存目录时在内存中解压。精灵在打包时已经缩放到插件
+    的显示尺寸（target）并裁掉了透明边；请求其他尺寸时先还原成原图再
+    缩放（使用缩放缓存）。
+    """
+
+    def __init__(self, image_path, index_path):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != ATLAS_INDEX_VERSION:
+            raise ValueError(f"不支持的图集版本: {index.get('version')}")
+        if (index.get('format') != ATLAS_FORMAT or index.get('compression') != ATLAS_COMPRESSION
+                or index.get('byte_order') != sys.byteorder):
+            raise ValueError(f"不支持的图集格式: {index.get('format')} "
+                             f"{index.get('compression')} {index.get('byte_order')}")
+        self.path = image_path
+        self.width = index['width']
+        self.height = index['height']
+        self.sprites = {}  # 名称 -> (图集中的位置, 偏移, 原图大小, 打包时的显示尺寸)
+        for name, entry in index['sprites'].items():
+            target = entry.get('target')
+            self.sprites[name] = (QRect(*entry['rect']), QPoint(*entry['offset']),
+                                  QSize(*entry['size']), tuple(target) if target else None)
+        self.data = None  # 解压后的像素（缓存文件的mmap或内存），QImage直接引用
+        self.image = None
+
+    @classmethod
+    def open(cls, res_dir, name):
+        """打开res目录下的图集，不存在或损坏时返回None"""
+        image_path = os.path.join(res_dir, f"atlas_{name}.argb.z")
+        index_path = os.path.join(res_dir, f"atlas_{name}.json")
+        if not os.path.exists(image_path) or not os.path.exists(index_path):
+            return None
+        try:
+            atlas = cls(image_path, index_path)
+            atlas.atlas_image()  # 打开时就解压（或映射缓存），文件损坏时在这里回退
+            return atlas
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"图集加载失败，使用单独的图片: {e}")
+            return None
+
+    def __contains__(self, name):
+        return name in self.sprites
+
+    def atlas_image(self):
+        """图集的像素（只准备一次），像素不复制也不转换格式"""
+        if self.image is None:
+            self.data = self.map_pixels()
+            self.image = QImage(self.data, self.width, self.height, self.width * 4,
+                                QImage.Format_ARGB32_Premultiplied)
+        return self.image
+
+    def map_pixels(self):
+        """缓存目录中有解压好的像素时直接mmap，否则解压一次并写入缓存目录"""
+        size = self.width * self.height * 4
+        cache_path = scaled_cache_path(self.path, self.width, self.height, sprite='atlas')
+        if cache_path is not None and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    if os.fstat(f.fileno()).st_size == size:
+                        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except OSError:
+                pass
+        try:
+            with open(self.path, 'rb') as f:
+                data = zlib.decompress(f.read())
+        except zlib.error as e:
+            raise ValueError(f"图集文件损坏: {e}") from e
+        if len(data) != size:
+            raise ValueError("图集文件大小与索引不一致")
+        if cache_path is not None:
+            write_cache_file(cache_path, (data,))
+        return data
+
+    def sprite_image(self, name):
+        """从图集中切出一张（裁剪后的）图片"""
+        return self.atlas_image().copy(self.sprites[name][0])
+
+    def untrimmed_image(self, name):
+        """还原成裁剪前的原图大小，透明边重新补上"""
+        _, offset, size, _ = self.sprites[name]
+        image = QImage(size, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.drawImage(offset, self.sprite_image(name))
+        painter.end()
+        return image
+
+    def sprite(self, name, width=None, height=None, dpr=1.0):
+        """获取精灵，尺寸与打包时的显示尺寸一致时直接使用裁剪后的图片"""
+        _, offset, size, target = self.sprites[name]
+        requested = (width, height) if width is not None else None
+        if requested == target and dpr == 1.0:
+            return Sprite(QPixmap.fromImage(self.sprite_image(name)), offset, size)
+        return Sprite(self.pixmap(name, width, height, dpr))
+
+    def pixmap(self, name, width=None, height=None, dpr=1.0):
+        """获取原图大小的精灵图片，指定尺寸时按比例缩放（使用缩放缓存）"""
+        if width is None:
+            return QPixmap.fromImage(self.untrimmed_image(name))
+        cache_path = scaled_cache_path(self.path, width, height, dpr, name)
+        image = read_cached_image(cache_path)
+        if image.isNull():
+            image = finish_image(scale_image(self.untrimmed_image(name), width, height, dpr), dpr)
+            if cache_path is not None:
+                write_cached_image(image, cache_path)
+        return QPixmap.fromImage(finish_image(image, dpr))
+
+
+def load_trimmed_sprite(atlas, res_dir, filename, width=None, height=None, dpr=1.0):
+    """加载一个精灵（Sprite）：优先从图集中切出，图集中没有时读取res下的单独文件
+
+    图集中的精灵已经缩放好并裁掉了透明边，按Sprite的偏移绘制；单独的
+    图片偏移为0。指定尺寸时按比例缩放到dpr倍的物理像素，图片不存在时
+    返回None。同一精灵只加载一次，之后直接返回共享的Sprite。
+    """
+    if width is None:
+        dpr = 1.0  # 不缩放的图片按原始像素使用
+    key = (os.path.abspath(os.path.join(res_dir, filename)), width, height, dpr)
+    sprite = _loaded_sprites.get(key)
+    if sprite is not None:
+        _loaded_sprites.move_to_end(key)
+        return sprite
+    if atlas is not None and filename in atlas:
+        sprite = atlas.sprite(filename, width, height, dpr)
+    elif not os.path.exists(key[0]):
+        return None
+    elif width is None:
+        sprite = Sprite(QPixmap(key[0]))
+    else:
+        sprite = Sprite(load_scaled_pixmap(key[0], width, height, dpr))
+    if not sprite.pixmap.isNull():
+        remember_sprite(key, sprite)
+    return sprite
+
+
+def load_sprite(atlas, res_dir, filename, width=None, height=None, dpr=1.0):
+    """加载一张精灵图片（原图大小，不需要偏移），图片不存在时返回None
+
+    图集中裁掉了透明边的精灵会补回透明边，需要省掉透明像素时使用
+    load_trimmed_sprite。
+    """
+    sprite = load_trimmed_sprite(atlas, res_dir, filename, width, height, dpr)
+    if sprite is None:
+        return None
+    if sprite.bounds() == QRect(QPoint(0, 0), sprite.size):
+        return sprite.pixmap
+    if width is None:
+        dpr = 1.0
+    key = (os.path.abspath(os.path.join(res_dir, filename)), width, height, dpr, 'untrimmed')
+    pixmap = _loaded_sprites.get(key)
+    if pixmap is None:
+        scale = sprite.pixmap.devicePixelRatio()
+        image = QImage(int(round(sprite.size.width() * scale)),
+                       int(round(sprite.size.height() * scale)),
+                       QImage.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(scale)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        painter.drawPixmap(sprite.offset, sprite.pixmap)
+        painter.end()
+        pixmap = QPixmap.fromImage(image)
+        remember_sprite(key, pixmap)
+    return pixmap
+
+
+def remember_sprite(key, sprite):
+    """在进程内共享一个已加载的精灵，超出容量时淘汰最久未用的"""
+    _loaded_sprites[key] = sprite
+    while len(_loaded_sprites) > MAX_LOADED_SPRITES:
+        _loaded_sprites.popitem(last=False)
+
+
+class ImageDecodeTask(QRunnable):
+    """在线程池中解码一张图片"""
+
+    def __init__(self, loader, key, path, width, height, dpr=1.0):
+        super().__init__()
+        self.loader = loader
+        self.key = key
+        self.path = path
+        self.width = width
+        self.height = height
+        self.dpr = dpr
+
+    def run(self):
+        image = decode_image(self.path, self.width, self.height, self.dpr)
+        # loader属于主线程，信号会排队到主线程处理
+        self.loader.decoded.emit(self.key, image)
+
+
+class ImageLoader(QObject):
+    """按需加载图片 - 同步加载当前图片，其余图片在后台线程解码"""
+    image_ready = pyqtSignal(object)  # 图片解码完成，参数为图片的key
+    decoded = pyqtSignal(object, QImage)  # 工作线程 -> 主线程
+
+    def __init__(self, width, height, fallback=None, dpr=1.0, parent=None):
+        super().__init__(parent)
+        self.width = width
+        self.height = height
+        self.dpr = dpr  # 按dpr倍的物理像素缩放，图片的逻辑尺寸仍是width x height以内
+        self.fallback = fallback  # 解码失败时使用的图片
+        self.paths = {}  # key -> 图片路径
+        self.pixmaps = {}  # key -> 已解码的图片
+        self.pending = set()  # 正在后台解码的key
+        self.failed = set()  # 解码失败且没有备用图片的key
+        self.pool = decode_pool()
+        self.decoded.connect(self.on_decoded)
+
+    def add(self, key, path):
+        """登记一张图片，此时不解码"""
+        self.paths[key] = path
+
+    def insert(self, key, pixmap):
+        """直接放入一张已经准备好的图片"""
+        self.pixmaps[key] = pixmap
+
+    def pixmap(self, key):
+        """已解码的图片，还没解码时返回None"""
+        return self.pixmaps.get(key)
+
+    def load(self, key):
+        """在当前线程同步解码（用于启动时的第一张图片）"""
+        pixmap = self.pixmaps.get(key)
+        if pixmap is None:
+            image = decode_image(self.paths[key], self.width, self.height, self.dpr)
+            pixmap = self.store(key, image)
+        return pixmap
+
+    def request(self, key):
+        """在后台线程解码，完成后发送image_ready"""
+        if (key in self.pixmaps or key in self.pending or key in self.failed
+                or key not in self.paths):
+            return
+        self.pending.add(key)
+        self.pool.start(ImageDecodeTask(self, key, self.paths[key], self.width, self.height,
+                                        self.dpr))
+
+    def on_decoded(self, key, image):
+        """后台解码完成（主线程）"""
+        self.pending.discard(key)
+        if key not in self.pixmaps:
+            self.store(key, image)
+        self.image_ready.emit(key)
+
+    def store(self, key, image):
+        """把解码结果转换成QPixmap保存，失败时使用备用图片"""
+        if image.isNull():
+            print(f"图片解码失败: {self.paths.get(key)}")
+            pixmap = self.fallback
+        else:
+            pixmap = QPixmap.fromImage(image)
+        if pixmap is None:
+            self.failed.add(key)
+        else:
+            self.pixmaps[key] = pixmap
+        return pixmap
@@ -1,4 +1,10 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+import subprocess
+import sys
+
+# 图集是生成文件，不在仓库中：先运行build_assets.py生成
+subprocess.check_call([sys.executable, os.path.join(SPECPATH, 'build_assets.py'), 'labubu'], cwd=SPECPATH)
 
 # 定义需要包含的资源文件
 datas = [
@@ -21,15 +27,14 @@ datas = [
     ('res/labubu15.png', 'res'),
     ('res/labubu16.png', 'res'),
     ('res/labubu17.png', 'res'),
-    ('res/Star4.png', 'res'),
-    ('res/Star5.png', 'res'),
-    ('res/Star6.png', 'res'),
+    # 星星已打包成图集（下面的build_assets步骤生成）
+    ('res/atlas_labubu.argb.z', 'res'),
+    ('res/atlas_labubu.json', 'res'),
 ]
 
-# 定义需要排除的模块
+# 定义需要排除的模块（numpy不能排除：向量化粒子引擎、碰撞、积雪和风场都依赖它）
 excludes = [
     'matplotlib',
-    'numpy',
     'scipy',
     'pandas',
     'tkinter',
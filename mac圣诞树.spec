@@ -1,15 +1,20 @@
 # -*- mode: python ; coding: utf-8 -*-
 import os
+import subprocess
+import sys
 
 block_cipher = None  # 不加密，体积更小
 
+# 图集是生成文件，不在仓库中：先运行build_assets.py生成
+subprocess.check_call([sys.executable, os.path.join(SPECPATH, 'build_assets.py'), 'tree'], cwd=SPECPATH)
+
 # 资源文件配置（跨平台兼容）
 added_files = [
     (os.path.join('res', 'Icon1.ico'), 'res'),
     (os.path.join('res', 'Icon1.icns'), 'res'),
-    (os.path.join('res', 'Star*.png'), 'res'),
-    (os.path.join('res', 'img*.png'), 'res'),
-    (os.path.join('res', 'imgTree.png'), 'res'),
+    # 星星、圣诞树和灯带已打包成一张图集（下面的build_assets步骤生成）
+    (os.path.join('res', 'atlas_tree.argb.z'), 'res'),
+    (os.path.join('res', 'atlas_tree.json'), 'res'),
 ]
 
 a = Analysis(
@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面插件粒子引擎 - NumPy向量化实现（可选）
+作者：codeliu
+
+粒子以结构数组（SoA）的形式保存在连续的NumPy数组中，风力、积分、
+渐隐和重生都按整个数组计算，视觉效果与各插件里的ParticleSystem一致。
+未安装numpy时插件继续使用原来的ParticleSystem。
+
+速度的单位是像素/秒，由帧时钟按TICK_INTERVAL的固定步长积分；每帧
+再按插值系数在上一步和当前位置之间插值后发布快照。风力从预先计算的
+噪声风场中按粒子位置和时间取样（见wind_field.py），相邻的粒子受到同一
+阵风，强度和方向可以通过set_wind设置。
+
+threaded=True时模拟在ParticleWorker线程中运行，每步把结果发布到快照
+环形缓冲，GUI线程每帧只取最新的一帧绘制（不插值）。两端交接不加锁：
+只有一个写入端，槽号的读写在GIL下是原子的，见ParticleSnapshot。帧时钟
+暂停（窗口隐藏）或停止粒子时工作线程退出。
+
+set_collider设置碰撞场（见collision_field.py）后，落到圣诞树/人物轮廓上
+的粒子会停在表面，沿斜坡滑动，失去支撑时重新下落，停留MELT_TIME秒后
+融化消失。record_landings打开后，在轮廓上停到融化的粒子和落到窗口底部的
+粒子位置会被记录下来，由插件用take_landings取出生成积雪（见snow_cover.py）。
+"""
+
+import math
+import threading
+import time
+from PyQt5.QtCore import pyqtSignal, QCoreApplication, QObject, QThread
+
+from collision_field import LookupBuffers
+from frame_clock import FrameClock, DAMAGE_TILE, MAX_FRAME_TIME, tiles_to_region
+from wind_field import WindBuffers, WindField
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+# 与ParticleSystem保持一致的模拟参数（速度单位：像素/秒）
+TICK_INTERVAL = 16  # 固定步长(ms)，约60FPS
+TICK_SECONDS = TICK_INTERVAL / 1000.0
+WIND_STRENGTH = 195.3125  # 风力加速度(px/s²)，即每16ms步长横向速度变化0.05px/步
+DEFAULT_WIND_STRENGTH = 1.0  # 阵风强度（WIND_STRENGTH的倍数），0表示没有风
+DEFAULT_WIND_DIRECTION = 0.0  # 阵风方向（度），0为水平左右吹，正数向下倾斜
+MAX_SPEED_X = 31.25  # 横向速度上限(px/s)，即0.5px/步
+SPEED_X = (-18.75, 18.75)  # 出生时的横向速度(px/s)
+SPEED_Y = (12.5, 50.0)  # 出生时的纵向速度(px/s)
+MIN_ALPHA = 150  # 渐隐时的最低透明度
+SLIDE_SPEED = 15.0  # 停在轮廓上的粒子沿斜坡滑动、失去支撑后开始下落的速度(px/s)
+MELT_TIME = 6.0  # 停在轮廓上的粒子融化所需时间(秒)
+
+PARTICLE_FIELDS = ('x', 'y', 'vx', 'vy', 'size', 'alpha', 'rotation',
+                   'rotation_speed', 'age', 'lifetime', 'sprite',
+                   'prev_x', 'prev_y', 'prev_rotation', 'landed', 'inside')
+# landed：停在轮廓上的时间(秒)，下落中为-1；inside：粒子是否在轮廓内（出生在
+# 轮廓内的粒子在人物前面，穿过轮廓不停留）
+INTEGER_FIELDS = ('sprite', 'inside')  # 整数字段，其余都是float
+# 绘制时需要的字段，快照只复制这些
+SNAPSHOT_FIELDS = ('x', 'y', 'size', 'alpha', 'rotation', 'sprite')
+# 发布快照时在上一步和当前值之间插值的字段
+INTERPOLATED_FIELDS = ('x', 'y', 'rotation')
+SNAPSHOT_SLOTS = 3  # 环形缓冲的槽数
+
+
+class ParticleArrays:
+    """粒子数据 - 每个属性一个连续的float数组"""
+
+    def __init__(self, count, fields=PARTICLE_FIELDS):
+        self.count = count
+        for name in fields:
+            dtype = np.int32 if name in INTEGER_FIELDS else np.float64
+            setattr(self, name, np.zeros(count, dtype=dtype))
+
+    def __len__(self):
+        return self.count
+
+
+class ParticleSnapshot:
+    """粒子快照环形缓冲 - 模拟写入空闲槽，绘制端原地读取最新槽
+
+    所有槽在创建时一次性分配，之后每帧只做np.copyto，不产生新对象。
+    generation在每次发布后加一，绘制端据此判断是否有新数据。
+
+    模拟和绘制可以在不同线程，交接不加锁：写入端只有一个，只写既不是
+    最新、也不是正在读取的槽，写完后切换latest；绘制端登记reading后再
+    确认latest没有变化，确认之后写入端一定能看到这次登记。这依赖GIL下
+    属性读写的原子性，在没有GIL的Python上需要改用原子操作。
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self.frames = [ParticleArrays(count, SNAPSHOT_FIELDS)
+                       for _ in range(SNAPSHOT_SLOTS)]
+        self.latest = 0  # 最新发布的槽
+        self.reading = -1  # 绘制端正在读取的槽
+        self.generation = 0
+
+    def __len__(self):
+        return self.count
+
+    def publish(self, particles, alpha=1.0):
+        """把模拟数据复制到空闲槽并发布，位置和角度按alpha插值"""
+        # 只有写入端修改latest；reading只读一次，绘制端之后登记的槽要么是
+        # latest，要么会在确认时发现latest变了而重新登记
+        latest = self.latest
+        reading = self.reading
+        slot = (latest + 1) % SNAPSHOT_SLOTS
+        if slot == reading:
+            slot = (slot + 1) % SNAPSHOT_SLOTS
+        frame = self.frames[slot]
+        for name in SNAPSHOT_FIELDS:
+            target = getattr(frame, name)
+            if name in INTERPOLATED_FIELDS and alpha < 1.0:
+                # prev + (current - prev) * alpha
+                previous = getattr(particles, 'prev_' + name)
+                np.subtract(getattr(particles, name), previous, out=target)
+                target *= alpha
+                target += previous
+            else:
+                np.copyto(target, getattr(particles, name))
+        self.latest = slot
+        self.generation += 1
+
+    def acquire(self):
+        """占用最新一帧，在下次acquire之前该槽不会被覆盖"""
+        while True:
+            latest = self.latest
+            self.reading = latest
+            # 读取latest之后写入端可能已经发布了新的一帧并开始覆盖这一槽
+            if self.latest == latest:
+                return self.frames[latest]
+
+    def current(self):
+        """绘制端占用的一帧，脏区域和绘制都读取这一帧"""
+        return self.frames[self.reading if self.reading >= 0 else self.latest]
+
+
+def particle_damage_region(particles, extent, tile=DAMAGE_TILE):
+    """计算粒子覆盖的脏区域 - 每个粒子以自身为中心、半径extent的方块
+
+    粒子比瓦片小，所以只需要标记方块四个角所在的瓦片。
+    particles可以是粒子字典列表，也可以是向量化引擎的快照。
+    """
+    if NUMPY_AVAILABLE and isinstance(particles, ParticleSnapshot):
+        frame = particles.current()
+        # 瓦片坐标平移一格后编码成一个整数，去重后再解码
+        cols = [np.clip(np.floor_divide(frame.x + dx, tile), -1, 4094).astype(np.int64) + 1
+                for dx in (-extent, extent)]
+        rows = [np.clip(np.floor_divide(frame.y + dy, tile), -1, 4094).astype(np.int64) + 1
+                for dy in (-extent, extent)]
+        keys = np.unique(np.concatenate([r * 4096 + c for r in rows for c in cols]))
+        tiles = ((key // 4096 - 1, key % 4096 - 1) for key in keys.tolist())
+    else:
+        tiles = set()
+        for particle in particles:
+            x = particle['draw_x']
+            y = particle['draw_y']
+            for col in (int((x - extent) // tile), int((x + extent) // tile)):
+                for row in (int((y - extent) // tile), int((y + extent) // tile)):
+                    tiles.add((row, col))
+    # 超出窗口左上方的瓦片不需要重绘
+    return tiles_to_region(t for t in tiles if t[0] >= 0 and t[1] >= 0)
+
+
+class VectorParticleSystem(QObject):
+    """星星粒子系统（向量化版）- 接口与ParticleSystem相同"""
+    position_updated = pyqtSignal(object)  # 发送粒子位置更新信号
+
+    def __init__(self, parent=None, spawn_x=(50, 200), initial_top_y=(15, 30),
+                 top_y=(0, 30), middle_y=(30, 150), initial_top_count=90,
+                 top_ratio=0.7, bounds=(-50, 300, 400), sprite_count=3, threaded=False,
+                 speed_y=SPEED_Y, lifetime=(4, 10), wind_strength=DEFAULT_WIND_STRENGTH,
+                 wind_direction=DEFAULT_WIND_DIRECTION):
+        super().__init__(parent)
+        self.particles = None
+        self.snapshot = None
+        self.generation = 0
+        self.running = False
+        self.rng = np.random.default_rng()
+        self.threaded = threaded  # 是否在工作线程中模拟
+        self.worker = None
+        self.published_generation = 0  # 已经通知绘制端的快照代数
+        # 碰撞场和它在窗口中的位置 (field, x, y)，整体替换，工作线程每步读取一次
+        self.collider = None
+        self.collider_origin = None  # 上一步碰撞场的位置，停住的粒子跟着移动
+        # 落地记录：None表示不记录，否则为 (碰撞场, 列) 的列表，落到窗口底部的为 (None, x)
+        self.landings = None
+        self.landings_lock = threading.Lock()
+
+        # 出生区域：x范围、初始顶部y范围、重生顶部/中间y范围
+        self.spawn_x = spawn_x
+        self.initial_top_y = initial_top_y
+        self.top_y = top_y
+        self.middle_y = middle_y
+        self.initial_top_count = initial_top_count
+        self.top_ratio = top_ratio
+        # 边界：x最小值、x最大值、y最大值，超出则重置
+        self.bounds = bounds
+        # 星星图片数量，每个粒子出生时固定选一种
+        self.sprite_count = sprite_count
+        # 下落速度(px/s)和寿命(秒)的范围，大窗口需要更快、更久才能落到底部
+        self.speed_y = speed_y
+        self.lifetime = lifetime
+        # 风场和阵风在x、y方向上的加速度系数，整体替换，工作线程每步读取一次
+        self.wind_field = WindField.shared()
+        self.wind_time = 0.0
+        self.wind = (0.0, 0.0)
+        self.set_wind(wind_strength, wind_direction)
+
+        # 由进程共享的帧时钟驱动
+        self.frame_clock = FrameClock.instance()
+        if threaded:
+            # 帧时钟暂停（窗口隐藏）时工作线程也退出，恢复时重新启动
+            self.frame_clock.running_changed.connect(self.on_clock_running)
+            QCoreApplication.instance().aboutToQuit.connect(self.stop_particles)
+
+    def start_particles(self, particle_count=30):
+        """初始化粒子系统，已经在运行时重新生成所有粒子"""
+        # 工作线程还在读写旧数组，先停下，重新分配后再启动（与set_particle_count相同）
+        self.stop_worker()
+        p = ParticleArrays(particle_count)
+        rng = self.rng
+
+        # 前initial_top_count个粒子在顶部区域，其余在中间区域
+        top_count = min(self.initial_top_count, particle_count)
+        p.y[:top_count] = rng.uniform(*self.initial_top_y, top_count)
+        p.y[top_count:] = rng.uniform(*self.middle_y, particle_count - top_count)
+
+        p.x[:] = rng.uniform(*self.spawn_x, particle_count)
+        p.vx[:] = rng.uniform(*SPEED_X, particle_count)
+        p.vy[:] = rng.uniform(*self.speed_y, particle_count)
+        p.size[:] = rng.uniform(6, 12, particle_count)
+        p.alpha[:] = rng.uniform(200, 225, particle_count)
+        p.rotation[:] = rng.uniform(0, 360, particle_count)
+        p.rotation_speed[:] = rng.uniform(-60, 60, particle_count)
+        p.lifetime[:] = rng.uniform(*self.lifetime, particle_count)
+        p.sprite[:] = rng.integers(0, self.sprite_count, particle_count)
+        p.landed[:] = -1
+        self.particles = p
+        p.inside[:] = self._inside_collider(slice(None))
+        self.save_previous(slice(None))
+        self._allocate(particle_count)
+
+        self.running = True
+        if self.threaded:
+            self.frame_clock.register(self.poll_snapshot)
+            if not self.frame_clock.paused:
+                self.start_worker()
+        else:
+            self.frame_clock.register(self.update_particles, TICK_INTERVAL, self.interpolate)
+
+    def stop_particles(self):
+        """停止粒子系统，线程模式下等待工作线程退出"""
+        self.running = False
+        self.frame_clock.unregister(self.update_particles)
+        self.frame_clock.unregister(self.poll_snapshot)
+        self.stop_worker()
+
+    def start_worker(self):
+        """启动模拟线程"""
+        if self.worker is None and self.running:
+            self.worker = ParticleWorker(self)
+            self.worker.start()
+
+    def stop_worker(self):
+        """停止模拟线程并等待退出，之后粒子数据只由GUI线程访问"""
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+
+    def set_collider(self, field, x=0, y=0):
+        """设置粒子碰撞的轮廓，field为None时取消碰撞
+
+        x、y是图片原图左上角在窗口中的位置，图片移动或切换时重新调用。
+        """
+        self.collider = (field, x, y) if field is not None else None
+
+    def record_landings(self, enabled=True):
+        """开始或停止记录落地的粒子"""
+        with self.landings_lock:
+            self.landings = [] if enabled else None
+
+    def take_landings(self):
+        """取出上次调用以来落地的粒子，工作线程模拟时也可以在GUI线程调用"""
+        with self.landings_lock:
+            landings = self.landings
+            if landings:
+                self.landings = []
+        return landings or []
+
+    def _record_landing(self, field, positions):
+        """记录一批落地的粒子"""
+        with self.landings_lock:
+            if self.landings is not None:
+                self.landings.append((field, positions))
+
+    def set_wind(self, strength=DEFAULT_WIND_STRENGTH, direction=DEFAULT_WIND_DIRECTION):
+        """设置阵风强度（WIND_STRENGTH的倍数）和方向（度，0为水平，正数向下倾斜）"""
+        angle = math.radians(direction)
+        self.wind = (WIND_STRENGTH * strength * math.cos(angle),
+                     WIND_STRENGTH * strength * math.sin(angle))
+
+    def on_clock_running(self, running):
+        """帧时钟暂停或恢复"""
+        if running:
+            self.start_worker()
+        else:
+            self.stop_worker()
+
+    def _allocate(self, particle_count):
+        """预分配快照和临时数组
+
+        之后每步对整批粒子的计算（风场取样、积分、渐隐、碰撞、边界检测）都
+        写入这些数组，不再分配内存；只有重生、融化、飞出边界的少数粒子
+        按需分配下标数组。
+        """
+        self.snapshot = ParticleSnapshot(particle_count)
+        self.snapshot.publish(self.particles)
+        self.published_generation = 0
+        self._scratch = np.empty(particle_count, dtype=np.float64)
+        self._wind_samples = np.empty(particle_count, dtype=np.float64)
+        self._wind_buffers = WindBuffers(self.wind_field, particle_count)
+        self._collide_x = np.empty(particle_count, dtype=np.float64)
+        self._collide_y = np.empty(particle_count, dtype=np.float64)
+        self._lookup = LookupBuffers(particle_count)
+        self._mask = np.empty(particle_count, dtype=bool)
+        self._mask_tmp = np.empty(particle_count, dtype=bool)
+
+    def set_particle_count(self, particle_count):
+        """调整粒子数量，保留现有的粒子，只删除或补充差额"""
+        old = self.particles
+        if old is None or particle_count == old.count:
+            return
+        # 线程模式下先停下工作线程，调整完再启动
+        restart = self.worker is not None
+        self.stop_worker()
+        p = ParticleArrays(particle_count)
+        keep = min(old.count, particle_count)
+        for name in PARTICLE_FIELDS:
+            getattr(p, name)[:keep] = getattr(old, name)[:keep]
+        self.particles = p
+        if particle_count > keep:
+            p.size[keep:] = self.rng.uniform(6, 12, particle_count - keep)
+            self._respawn(np.arange(keep, particle_count), full=True)
+        # 快照换成新的大小，绘制端在下一次更新时拿到新快照
+        self._allocate(particle_count)
+        if restart:
+            self.start_worker()
+
+    def save_previous(self, index):
+        """记录上一步的位置和角度，用于插值"""
+        p = self.particles
+        p.prev_x[index] = p.x[index]
+        p.prev_y[index] = p.y[index]
+        p.prev_rotation[index] = p.rotation[index]
+
+    def update_particles(self, dt):
+        """按dt秒推进粒子位置和属性"""
+        if not self.running or self.particles is None:
+            return
+
+        p = self.particles
+        tmp = self._scratch
+        mask = self._mask
+        np.copyto(p.prev_x, p.x)
+        np.copyto(p.prev_y, p.y)
+        np.copyto(p.prev_rotation, p.rotation)
+
+        # 风力效果：按位置和时间从风场取样，相邻的粒子受到同一阵风，并限制速度
+        wind_x, wind_y = self.wind
+        self.wind_time += dt
+        wind = self.wind_field.sample(p.x, p.y, self.wind_time, self._wind_samples,
+                                      self._wind_buffers)
+        if wind_y:
+            np.multiply(wind, wind_y * dt, out=tmp)
+            p.vy += tmp
+            np.clip(p.vy, self.speed_y[0] / 2, self.speed_y[1] * 2, out=p.vy)
+        np.multiply(wind, wind_x * dt, out=tmp)
+        p.vx += tmp
+        np.clip(p.vx, -MAX_SPEED_X, MAX_SPEED_X, out=p.vx)
+
+        # 更新位置、旋转和年龄
+        np.multiply(p.vx, dt, out=tmp)
+        p.x += tmp
+        np.multiply(p.vy, dt, out=tmp)
+        p.y += tmp
+        np.multiply(p.rotation_speed, dt, out=tmp)
+        p.rotation += tmp
+        p.age += dt
+
+        # 透明度随年龄渐隐，但不低于MIN_ALPHA
+        np.divide(p.age, p.lifetime, out=tmp)
+        np.subtract(1, tmp, out=tmp)
+        tmp *= 255
+        np.maximum(tmp, MIN_ALPHA, out=p.alpha)
+
+        # 与圣诞树/人物轮廓碰撞
+        self._collide(dt)
+
+        # 生命周期结束的粒子完全重置
+        np.greater_equal(p.age, p.lifetime, out=mask)
+        if mask.any():
+            self._respawn(np.flatnonzero(mask), full=True)
+
+        # 边界检测 - 超出范围的粒子只重置位置和速度
+        min_x, max_x, max_y = self.bounds
+        np.greater(p.y, max_y, out=mask)
+        if self.landings is not None and mask.any():
+            self._record_landing(None, p.x[mask])
+        np.less(p.x, min_x, out=self._mask_tmp)
+        mask |= self._mask_tmp
+        np.greater(p.x, max_x, out=self._mask_tmp)
+        mask |= self._mask_tmp
+        if mask.any():
+            self._respawn(np.flatnonzero(mask), full=False)
+
+    def interpolate(self, alpha):
+        """按插值系数发布快照，绘制端原地读取，不再复制粒子列表"""
+        if not self.running or self.particles is None:
+            return
+        self.snapshot.publish(self.particles, alpha)
+        self.snapshot.acquire()
+        self.generation += 1
+        self.position_updated.emit(self.snapshot)
+
+    def poll_snapshot(self, dt):
+        """线程模式：每帧检查工作线程是否发布了新快照，有则占用并通知绘制端"""
+        snapshot = self.snapshot
+        if not self.running or snapshot is None:
+            return
+        if snapshot.generation != self.published_generation:
+            self.published_generation = snapshot.generation
+            snapshot.acquire()
+            self.generation += 1
+            self.position_updated.emit(snapshot)
+
+    def _collide(self, dt):
+        """落进轮廓的粒子停在表面，停住的粒子滑动、重新下落或融化
+
+        按整个数组计算，只写入停住或刚落地的粒子（where=），中间结果都在
+        预分配的数组里；只有融化、取消碰撞这类少数粒子的事件才分配下标数组。
+        """
+        p = self.particles
+        collider = self.collider
+        landed = np.greater_equal(p.landed, 0, out=self._mask)
+        if collider is None:
+            # 取消碰撞后停住的粒子继续下落
+            self.collider_origin = None
+            if landed.any():
+                index = np.flatnonzero(landed)
+                p.landed[index] = -1
+                p.vy[index] = self.rng.uniform(*self.speed_y, index.size)
+            return
+
+        field, origin_x, origin_y = collider
+        left = origin_x + field.left
+        top = origin_y + field.top
+        look = self._lookup
+        x, y = self._collide_x, self._collide_y  # 相对碰撞场数组左上角的坐标
+        tmp = self._scratch
+        other = self._mask_tmp
+        melted = None
+        if landed.any():
+            # 停住的粒子不受风和速度影响，跟着轮廓移动，并沿斜坡滑动
+            shift_x, shift_y = 0, 0
+            if self.collider_origin is not None:
+                shift_x = origin_x - self.collider_origin[0]
+                shift_y = origin_y - self.collider_origin[1]
+            np.add(p.prev_x, shift_x - left, out=x)
+            np.add(p.prev_y, shift_y - top, out=y)
+            field.lookup(x, y, look)
+            field.take_slide(look)
+            np.multiply(look.slide, SLIDE_SPEED * dt, out=tmp)
+            tmp *= look.valid
+            x += tmp
+            np.copyto(p.vx, 0, where=landed)
+
+            # 轮廓移进了粒子（人物上移、换图）时把粒子抬到表面
+            field.lookup(x, y, look)
+            field.take_depth(look)
+            np.subtract(look.rows, look.depth, out=tmp)
+            tmp += 0.5
+            np.copyto(y, tmp, where=look.occupied)
+            np.add(x, left, out=tmp)
+            np.copyto(p.x, tmp, where=landed)
+            np.add(y, top, out=tmp)
+            np.copyto(p.y, tmp, where=landed)
+
+            # 下方没有支撑的粒子重新下落
+            np.add(y, 1, out=tmp)
+            field.lookup(x, tmp, look)
+            np.logical_not(look.occupied, out=other)
+            other &= landed
+            np.copyto(p.landed, -1, where=other)
+            np.copyto(p.vy, SLIDE_SPEED, where=other)
+
+            # 停住的粒子不再变老，停留越久越透明，到时间后融化
+            still = landed
+            still &= look.occupied
+            np.subtract(p.age, dt, out=p.age, where=still)
+            np.add(p.landed, dt, out=p.landed, where=still)
+            np.divide(p.landed, -MELT_TIME, out=tmp)
+            tmp += 1
+            np.clip(tmp, 0, 1, out=tmp)
+            np.multiply(p.alpha, tmp, out=p.alpha, where=still)
+            np.less_equal(tmp, 0, out=other)
+            other &= still
+            if other.any():
+                melted = np.flatnonzero(other)
+                # 积雪记在粒子最终停住（滑到平缓处）的位置
+                if self.landings is not None:
+                    self._record_landing(field, np.floor(p.x[melted] - left).astype(np.intp))
+
+        # 从空白处落进轮廓的粒子停在表面（抬到这一列轮廓的上边缘）
+        np.subtract(p.x, left, out=x)
+        np.subtract(p.y, top, out=y)
+        field.lookup(x, y, look)
+        hit = np.less(p.landed, 0, out=self._mask)
+        hit &= look.occupied
+        np.equal(p.inside, 0, out=other)
+        hit &= other
+        np.copyto(p.inside, look.occupied)
+        if hit.any():
+            field.take_depth(look)
+            np.subtract(look.rows, look.depth, out=tmp)
+            tmp += top + 0.5
+            np.copyto(p.y, tmp, where=hit)
+            np.copyto(p.landed, 0, where=hit)
+            np.copyto(p.vx, 0, where=hit)
+            np.copyto(p.vy, 0, where=hit)
+            np.copyto(p.rotation_speed, 0, where=hit)
+            np.copyto(p.inside, 0, where=hit)
+
+        if melted is not None:
+            self._respawn(melted, full=True)
+        self.collider_origin = (origin_x, origin_y)
+
+    def _inside_collider(self, index):
+        """指定下标的粒子是否在轮廓内"""
+        collider = self.collider
+        if collider is None:
+            return 0
+        field, x, y = collider
+        p = self.particles
+        return field.contains(p.x[index] - (x + field.left), p.y[index] - (y + field.top))
+
+    def _respawn(self, index, full):
+        """重置指定下标的粒子"""
+        n = index.size
+        p = self.particles
+        rng = self.rng
+        p.x[index] = rng.uniform(*self.spawn_x, n)
+        # 随机决定重置到顶部还是中间，保持顶部多、中间少的比例
+        p.y[index] = np.where(rng.random(n) < self.top_ratio,
+                              rng.uniform(*self.top_y, n),
+                              rng.uniform(*self.middle_y, n))
+        p.vx[index] = rng.uniform(*SPEED_X, n)
+        p.vy[index] = rng.uniform(*self.speed_y, n)
+        p.rotation[index] = rng.uniform(0, 360, n)
+        p.rotation_speed[index] = rng.uniform(-60, 60, n)
+        p.landed[index] = -1
+        p.inside[index] = self._inside_collider(index)
+        # 重生的粒子不从旧位置插值过来
+        self.save_previous(index)
+
+        if full:
+            p.age[index] = 0
+            p.alpha[index] = rng.uniform(200, 225, n)
+            p.lifetime[index] = rng.uniform(*self.lifetime, n)
+            p.sprite[index] = rng.integers(0, self.sprite_count, n)
+
+
+class ParticleWorker(QThread):
+    """粒子模拟线程 - 按固定步长推进粒子，每推进一次发布一帧快照"""
+
+    def __init__(self, system):
+        super().__init__()
+        self.system = system
+        self.stopping = threading.Event()
+
+    def run(self):
+        system = self.system
+        max_lag = MAX_FRAME_TIME / 1000.0
+        accumulated = 0.0
+        last = time.perf_counter()
+        while not self.stopping.is_set():
+            now = time.perf_counter()
+            accumulated += min(now - last, max_lag)
+            last = now
+            steps = 0
+            while accumulated >= TICK_SECONDS:
+                system.update_particles(TICK_SECONDS)
+                accumulated -= TICK_SECONDS
+                steps += 1
+            if steps:
+                system.snapshot.publish(system.particles)
+            # 睡到下一步，停止时立即醒来
+            self.stopping.wait(TICK_SECONDS - accumulated)
+
+    def stop(self):
+        """通知线程退出并等待结束"""
+        self.stopping.set()
+        self.wait()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面插件画质档位
+作者：codeliu
+
+config.json中的quality选择画质：low、medium、high或auto。每个档位
+决定粒子数量（相对particle_count的比例）、是否抗锯齿、贴图是否平滑
+过滤以及帧率。
+
+auto从high开始，测量每帧在GUI线程上的工作时间（帧时钟的模拟耗时 +
+paintEvent耗时），每秒评估一次：连续两次超出帧预算（按当前档位的帧间隔
+计算）就降一档，连续多次远低于预算才升一档。升档后很快又降回来时，下次
+升档需要等待的时间加倍，避免在两个档位之间来回切换。
+"""
+
+import time
+
+from frame_clock import FrameClock
+from frame_stats import RingBuffer, percentile
+
+QUALITY_AUTO = 'auto'
+DEFAULT_QUALITY = QUALITY_AUTO
+
+QUALITY_EVALUATE_INTERVAL = 1000  # 自动画质的评估间隔(ms)
+QUALITY_SAMPLES = 240  # 每次评估最多使用的样本数
+MIN_QUALITY_SAMPLES = 10  # 样本太少（暂停、隐藏）时不评估
+TARGET_LOAD = 0.5  # 每帧工作时间占帧间隔的比例上限，超出则降档
+UPGRADE_LOAD = 0.25  # 低于这个比例才考虑升档
+DOWNGRADE_WINDOWS = 2  # 连续超出几次才降档
+UPGRADE_WINDOWS = 5  # 连续低于几次才升档
+MAX_UPGRADE_WINDOWS = 60  # 升档等待次数的上限
+UPGRADE_PROBATION = 5  # 升档后这么多次评估内又降档，视为来回切换
+
+
+class QualityTier:
+    """一个画质档位"""
+
+    def __init__(self, name, label, particle_scale, antialiasing, smooth_pixmaps, frame_interval):
+        self.name = name
+        self.label = label  # 菜单中显示的名称
+        self.particle_scale = particle_scale  # 粒子数量相对particle_count的比例
+        self.antialiasing = antialiasing  # 是否抗锯齿
+        self.smooth_pixmaps = smooth_pixmaps  # 贴图是否平滑过滤
+        self.frame_interval = frame_interval  # 帧间隔(ms)
+
+
+# 从低到高排列，自动画质按这个顺序升降
+QUALITY_TIERS = (
+    QualityTier('low', "低", 1 / 3, False, False, 33),
+    QualityTier('medium', "中", 2 / 3, True, False, 25),
+    QualityTier('high', "高", 1.0, True, True, 16),
+)
+QUALITY_NAMES = tuple(tier.name for tier in QUALITY_TIERS)
+
+
+def quality_level(name):
+    """档位名称对应的下标，未知名称按high处理"""
+    if name in QUALITY_NAMES:
+        return QUALITY_NAMES.index(name)
+    return len(QUALITY_TIERS) - 1
+
+
+class QualityController:
+    """画质控制 - 固定档位或根据帧耗时自动调整
+
+    档位变化时调用widget.apply_quality(tier)。
+    """
+
+    def __init__(self, widget, mode=DEFAULT_QUALITY):
+        self.widget = widget
+        self.frame_clock = FrameClock.instance()
+        self.mode = None
+        self.level = len(QUALITY_TIERS) - 1
+        self.samples = RingBuffer(QUALITY_SAMPLES)
+        self.paint_start = None
+        self.over_windows = 0  # 连续超出预算的评估次数
+        self.under_windows = 0  # 连续远低于预算的评估次数
+        self.upgrade_windows = UPGRADE_WINDOWS
+        self.windows_since_upgrade = None  # 上次升档后的评估次数
+        self.set_mode(mode, apply=False)
+
+    @property
+    def tier(self):
+        """当前档位"""
+        return QUALITY_TIERS[self.level]
+
+    def set_mode(self, mode, apply=True):
+        """设置画质：档位名称或auto"""
+        if mode != QUALITY_AUTO and mode not in QUALITY_NAMES:
+            print(f"未知的画质设置: {mode}，使用自动画质")
+            mode = QUALITY_AUTO
+        if mode == self.mode:
+            return
+        self.mode = mode
+        self.reset_measurements()
+        if mode == QUALITY_AUTO:
+            # 自动画质从最高档开始，逐步降到机器能承受的档位
+            self.level = len(QUALITY_TIERS) - 1
+            self.upgrade_windows = UPGRADE_WINDOWS
+            self.windows_since_upgrade = None
+            self.frame_clock.timing_owners.add(self)
+            self.frame_clock.register(self.evaluate, QUALITY_EVALUATE_INTERVAL)
+        else:
+            self.level = quality_level(mode)
+            self.frame_clock.timing_owners.discard(self)
+            self.frame_clock.unregister(self.evaluate)
+        if apply:
+            self.widget.apply_quality(self.tier)
+
+    def stop(self):
+        """停止自动评估（窗口关闭时调用）"""
+        self.frame_clock.timing_owners.discard(self)
+        self.frame_clock.unregister(self.evaluate)
+
+    def particle_count(self, configured):
+        """当前档位下实际使用的粒子数量"""
+        return max(1, round(configured * self.tier.particle_scale))
+
+    def reset_measurements(self):
+        """清空样本和计数"""
+        self.samples.clear()
+        self.over_windows = 0
+        self.under_windows = 0
+
+    def begin_paint(self):
+        """paintEvent开始，只有自动画质才计时"""
+        if self.mode == QUALITY_AUTO:
+            self.paint_start = time.perf_counter()
+
+    def end_paint(self):
+        """paintEvent结束：记录本帧的工作时间(ms)"""
+        if self.paint_start is None:
+            return
+        paint = (time.perf_counter() - self.paint_start) * 1000
+        self.paint_start = None
+        self.samples.append(paint + self.frame_clock.simulate_time)
+
+    def evaluate(self, dt=None):
+        """根据最近的帧耗时决定是否调整档位（由帧时钟每秒调用）"""
+        if self.mode != QUALITY_AUTO or len(self.samples) < MIN_QUALITY_SAMPLES:
+            return
+        cost = percentile(sorted(self.samples.samples()), 0.9)
+        # 按档位自己的帧间隔计算负载：实际帧间隔会被其他插件或降频改变
+        load = cost / self.tier.frame_interval
+        self.samples.clear()
+        if self.windows_since_upgrade is not None:
+            self.windows_since_upgrade += 1
+
+        if load > TARGET_LOAD:
+            self.over_windows += 1
+            self.under_windows = 0
+        elif load < UPGRADE_LOAD:
+            self.under_windows += 1
+            self.over_windows = 0
+        else:
+            self.over_windows = 0
+            self.under_windows = 0
+
+        if self.over_windows >= DOWNGRADE_WINDOWS and self.level > 0:
+            if (self.windows_since_upgrade is not None
+                    and self.windows_since_upgrade <= UPGRADE_PROBATION):
+                # 刚升上来又撑不住，下次升档前等待更久
+                self.upgrade_windows = min(self.upgrade_windows * 2, MAX_UPGRADE_WINDOWS)
+            self.windows_since_upgrade = None
+            self.change_level(self.level - 1)
+        elif self.under_windows >= self.upgrade_windows and self.level < len(QUALITY_TIERS) - 1:
+            self.windows_since_upgrade = 0
+            self.change_level(self.level + 1)
+
+    def change_level(self, level):
+        """切换档位并通知插件"""
+        self.level = level
+        self.reset_measurements()
+        self.widget.apply_quality(self.tier)
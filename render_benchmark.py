@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面插件渲染性能测试
+作者：codeliu
+
+不需要显示器，在offscreen平台下创建圣诞树、Labubu、圣诞老人插件，
+以固定的时间步长模拟并渲染N帧到QImage，统计每个阶段的耗时：
+    simulate   粒子和动画更新（update_particles + interpolate + update_animation）
+    paint      整个paintEvent
+    particles  paintEvent中的draw_particles
+    background 背景图层重新生成（树/灯带/人物，只在内容变化的帧出现）
+    composite  把插件画面混合到不透明的桌面背景上（模拟窗口合成）
+输出p50/p95/p99（毫秒），可以保存为JSON，并与之前保存的结果比较，
+p95变慢超过阈值时以非0退出码结束，方便在修改渲染代码前后对比。
+
+用法：
+    python render_benchmark.py
+    python render_benchmark.py --counts 120,1000 --widgets tree --json before.json
+    python render_benchmark.py --baseline before.json --tolerance 0.2
+    python render_benchmark.py --quality low
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import Qt, QPoint
+from PyQt5.QtGui import QColor, QImage, QPainter
+from PyQt5.QtWidgets import QApplication
+
+from frame_stats import summarize
+from quality import QUALITY_NAMES
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 插件名称 -> 脚本文件
+WIDGET_SCRIPTS = {
+    'tree': 'christmas_tree_app_pyqt5.py',
+    'labubu': 'christmas_man.py',
+    'santa': 'christmas_man_base.py',
+}
+PHASES = ('simulate', 'paint', 'particles', 'background', 'composite')
+DEFAULT_COUNTS = (120, 1000, 10000)
+FRAME_DT = 16  # 每帧的固定时间步长(ms)，与粒子系统一致（每帧正好一步，插值系数为1）
+ANIMATION_INTERVAL = 60  # 星星/灯带/上下浮动的更新间隔(ms)，与插件一致
+MIN_REGRESSION_MS = 0.05  # 小于这个差值的变化视为噪声
+
+
+def load_widget_class(name):
+    """按文件加载插件模块，返回其中的ChristmasTreeWidget"""
+    path = os.path.join(BENCH_DIR, WIDGET_SCRIPTS[name])
+    spec = importlib.util.spec_from_file_location(f"bench_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.ChristmasTreeWidget
+
+
+def timed(func, samples):
+    """包装插件方法，记录每次调用的耗时"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            samples.append((time.perf_counter() - start) * 1000)
+    return wrapper
+
+
+def prepare_widget(widget, count, engine, quality):
+    """停掉插件自己的帧时钟，按指定的粒子数量、引擎和画质重新创建粒子系统
+
+    画质固定为一个档位（不使用auto），粒子数量不按档位缩放。
+    """
+    widget.frame_clock.pause()
+    widget.quality.set_mode(quality, apply=False)
+    widget.particle_system.stop_particles()
+    if engine:
+        widget.particle_engine = engine
+    widget.particle_thread = False  # 模拟由测试循环逐帧驱动
+    widget.particle_count = count
+    widget.stars_enabled = True
+    widget.particle_system = widget.create_particle_system()
+    widget.particle_system.position_updated.connect(widget.update_particles)
+    widget.update_collider()
+    widget.particle_system.start_particles(count)
+    widget.frame_clock.pause()
+
+
+def release_widget(widget):
+    """释放插件，不经过closeEvent（避免写入config.json）"""
+    widget.particle_system.stop_particles()
+    widget.frame_clock.unregister(widget.update_animation)
+    widget.quality.stop()
+    widget.snow_overlay.release(widget)
+    widget.frame_governor.forget(widget)
+    if hasattr(widget, 'tray_icon'):
+        widget.tray_icon.hide()
+    widget.hide()
+    widget.deleteLater()
+
+
+def run_case(widget_class, name, count, frames, warmup, engine, damage_only, quality):
+    """测试一个插件在一种粒子数量下的各阶段耗时"""
+    widget = widget_class()
+    prepare_widget(widget, count, engine, quality)
+
+    samples = {phase: [] for phase in PHASES}
+    recording = {phase: [] for phase in ('particles', 'background')}
+    widget.draw_particles = timed(widget.draw_particles, recording['particles'])
+    widget.background_layer.render = timed(widget.background_layer.render, recording['background'])
+
+    frame = QImage(widget.size(), QImage.Format_ARGB32_Premultiplied)
+    desktop = QImage(widget.size(), QImage.Format_ARGB32_Premultiplied)
+    animation_time = 0
+    try:
+        for index in range(warmup + frames):
+            measured = index >= warmup
+            for phase in recording:
+                recording[phase].clear()
+
+            # 模拟：粒子每帧更新，其余动画按自己的间隔更新
+            start = time.perf_counter()
+            widget.particle_system.update_particles(FRAME_DT / 1000.0)
+            widget.particle_system.interpolate(1.0)
+            animation_time += FRAME_DT
+            while animation_time >= ANIMATION_INTERVAL:
+                widget.update_animation(ANIMATION_INTERVAL / 1000.0)
+                animation_time -= ANIMATION_INTERVAL
+            simulate = (time.perf_counter() - start) * 1000
+
+            # 绘制：默认整窗口重绘，damage_only时只重绘帧时钟收集的脏区域
+            region = widget.frame_clock.pending_updates.pop(widget, None)
+            frame.fill(Qt.transparent)
+            start = time.perf_counter()
+            if damage_only and region is not None:
+                widget.render(frame, QPoint(), region)
+            else:
+                widget.render(frame)
+            paint = (time.perf_counter() - start) * 1000
+
+            # 合成：半透明窗口混合到桌面背景上
+            desktop.fill(QColor(40, 44, 52))
+            start = time.perf_counter()
+            painter = QPainter(desktop)
+            painter.drawImage(0, 0, frame)
+            painter.end()
+            composite = (time.perf_counter() - start) * 1000
+
+            if measured:
+                samples['simulate'].append(simulate)
+                samples['paint'].append(paint)
+                samples['composite'].append(composite)
+                samples['particles'].extend(recording['particles'])
+                samples['background'].extend(recording['background'])
+    finally:
+        release_widget(widget)
+
+    return {
+        'widget': name,
+        'particles': count,
+        'engine': type(widget.particle_system).__name__,
+        'quality': quality,
+        'frames': frames,
+        'phases': {phase: summarize(values) for phase, values in samples.items() if values},
+    }
+
+
+def print_result(result):
+    """打印一组结果"""
+    print(f"\n{result['widget']}  粒子 {result['particles']}  "
+          f"({result['engine']}, 画质 {result['quality']}, {result['frames']} 帧)")
+    print(f"  {'阶段':<12}{'p50':>9}{'p95':>9}{'p99':>9}{'次数':>8}")
+    for phase in PHASES:
+        stats = result['phases'].get(phase)
+        if stats:
+            print(f"  {phase:<12}{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['p99']:>9.3f}"
+                  f"{stats['count']:>8}")
+
+
+def compare_baseline(results, baseline_path, tolerance):
+    """与保存的结果比较p95，返回变慢的项"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r['widget'], r['particles'], r['engine'], r.get('quality', 'high')): r
+                for r in baseline.get('results', [])}
+
+    regressions = []
+    for result in results:
+        old = previous.get((result['widget'], result['particles'], result['engine'],
+                            result['quality']))
+        if old is None:
+            continue
+        for phase, stats in result['phases'].items():
+            old_stats = old['phases'].get(phase)
+            if old_stats is None:
+                continue
+            before, after = old_stats['p95'], stats['p95']
+            if after > before * (1 + tolerance) and after - before > MIN_REGRESSION_MS:
+                regressions.append((result['widget'], result['particles'], phase, before, after))
+    return regressions
+
+
+def parse_args(argv=None):
+    """解析命令行参数，插件和粒子数量转换成列表"""
+    parser = argparse.ArgumentParser(description="桌面插件渲染性能测试")
+    parser.add_argument('--widgets', default=','.join(WIDGET_SCRIPTS),
+                        help="要测试的插件，逗号分隔：" + ','.join(WIDGET_SCRIPTS))
+    parser.add_argument('--counts', default=','.join(str(c) for c in DEFAULT_COUNTS),
+                        help="粒子数量，逗号分隔")
+    parser.add_argument('--frames', type=int, default=300, help="每组测试的帧数")
+    parser.add_argument('--warmup', type=int, default=30, help="预热帧数（不计入统计）")
+    parser.add_argument('--engine', choices=('numpy', 'python'), default=None,
+                        help="粒子引擎，默认使用config.json中的设置")
+    parser.add_argument('--quality', choices=QUALITY_NAMES, default='high',
+                        help="画质档位（抗锯齿和贴图过滤），默认high")
+    parser.add_argument('--damage', action='store_true', help="只重绘脏区域（与实际运行一致）")
+    parser.add_argument('--json', dest='json_path', help="把结果保存为JSON")
+    parser.add_argument('--baseline', help="与之前保存的JSON结果比较")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="p95允许变慢的比例，默认0.2（20%%）")
+    args = parser.parse_args(argv)
+
+    args.widgets = [w.strip() for w in args.widgets.split(',') if w.strip()]
+    unknown = [name for name in args.widgets if name not in WIDGET_SCRIPTS]
+    if unknown:
+        parser.error(f"未知的插件: {', '.join(unknown)}")
+    try:
+        args.counts = [int(c) for c in args.counts.split(',') if c.strip()]
+    except ValueError:
+        parser.error(f"粒子数量必须是整数: {args.counts}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    results = []
+    for name in args.widgets:
+        widget_class = load_widget_class(name)
+        for count in args.counts:
+            result = run_case(widget_class, name, count, args.frames, args.warmup,
+                              args.engine, args.damage, args.quality)
+            print_result(result)
+            results.append(result)
+            app.processEvents()
+
+    if args.json_path:
+        report = {
+            'meta': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'qt_platform': app.platformName(),
+                'frames': args.frames,
+                'damage_only': args.damage,
+                'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            },
+            'results': results,
+        }
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+        print(f"\n结果已保存到 {args.json_path}")
+
+    if args.baseline:
+        regressions = compare_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n以下阶段的p95比基准慢了{args.tolerance:.0%}以上：")
+            for widget, count, phase, before, after in regressions:
+                print(f"  {widget} 粒子{count} {phase}: {before:.3f}ms -> {after:.3f}ms")
+            return 1
+        print("\n没有发现性能下降")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
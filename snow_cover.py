@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面插件积雪 - 圣诞树/人物上边缘和窗口底部的积雪（需要numpy）
+作者：codeliu
+
+积雪按COLUMN_WIDTH像素一列保存成高度数组：
+- 每次动画更新时，把粒子引擎记录的落地位置用bincount一次性累加到对应的列，
+  再和相邻列平滑，避免出现一根根的雪柱
+- 越陡的地方能留住的积雪越薄（按相邻列的高低差计算每列的容量）
+- 积雪随时间慢慢融化，切换角色或镜像时轮廓上和窗口底部的积雪都清空
+- 高度数组渲染成缓存的图片，只有某一列的高度变化超过REDRAW_STEP像素时才
+  重新生成，平时每帧只贴图片
+
+轮廓上的积雪跟着人物移动（只改变贴图位置，不重新生成图片）。未安装numpy时
+没有积雪，SnowCover的方法什么也不做。
+"""
+
+import math
+from PyQt5.QtCore import Qt, QPointF, QRect
+from PyQt5.QtGui import QColor, QPainter, QPixmap, QPolygonF, QRegion
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+COLUMN_WIDTH = 2  # 每列的宽度(px)
+DEPOSIT = 0.4  # 每个落地粒子增加的积雪高度(px)
+MAX_DEPTH = 12  # 积雪最大厚度(px)
+MELT_RATE = 0.3  # 融化速度(px/s)
+REDRAW_STEP = 0.5  # 高度变化超过这个值(px)才重新生成图片
+MIN_VISIBLE = 0.5  # 低于这个高度的列不绘制
+RUN_BREAK = 4  # 相邻列的轮廓高低差超过这个值(px)时分成两段积雪，不画连接两段的斜条
+SMOOTH_KERNEL = (0.25, 0.5, 0.25)  # 新增积雪分摊到相邻列的比例
+SNOW_COLOR = QColor(250, 252, 255, 235)
+
+
+class SnowHeightmap:
+    """一条积雪 - 按列保存的高度，base是每列积雪底部的y（NaN表示这一列不积雪）
+
+    坐标相对积雪的原点，图片覆盖的区域rect在创建时固定。
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.valid = ~np.isnan(base)
+        # 每列能留住的积雪厚度：与左右相邻列的高低差越大越薄，超出的积雪滑落
+        padded = np.concatenate(([np.nan], base, [np.nan]))
+        steps = np.fmax(np.abs(padded[1:-1] - padded[:-2]), np.abs(padded[2:] - padded[1:-1]))
+        self.capacity = MAX_DEPTH / (1 + np.nan_to_num(steps) / COLUMN_WIDTH)
+        self.capacity[~self.valid] = 0
+        self.heights = np.zeros(base.size)
+        self.rendered = np.zeros(base.size)  # 生成图片时的高度
+        self.pixmap = None
+        if self.valid.any():
+            top = int(math.floor(np.nanmin(base))) - MAX_DEPTH - 1
+            bottom = int(math.ceil(np.nanmax(base))) + 2
+        else:
+            top = bottom = 0
+        self.rect = QRect(0, top, base.size * COLUMN_WIDTH, bottom - top)
+
+    def add(self, positions):
+        """按落地位置(px)累加积雪"""
+        cols = np.floor_divide(positions, COLUMN_WIDTH).astype(np.intp)
+        cols = cols[(cols >= 0) & (cols < self.heights.size)]
+        if not cols.size:
+            return
+        deposit = np.bincount(cols, minlength=self.heights.size) * DEPOSIT
+        self.heights += np.convolve(deposit, SMOOTH_KERNEL, mode='same')
+        np.minimum(self.heights, self.capacity, out=self.heights)
+
+    def melt(self, dt):
+        """按dt秒融化"""
+        self.heights -= MELT_RATE * dt
+        np.maximum(self.heights, 0, out=self.heights)
+
+    def changed(self):
+        """高度变化是否大到需要重新生成图片"""
+        return np.abs(self.heights - self.rendered).max() >= REDRAW_STEP
+
+    def render(self, dpr):
+        """把高度数组渲染成图片：每段连续积雪一个多边形，底边沿轮廓向下盖住1像素"""
+        np.copyto(self.rendered, self.heights)
+        if self.pixmap is None or self.pixmap.devicePixelRatio() != dpr:
+            self.pixmap = QPixmap(max(1, int(math.ceil(self.rect.width() * dpr))),
+                                  max(1, int(math.ceil(self.rect.height() * dpr))))
+            self.pixmap.setDevicePixelRatio(dpr)
+        self.pixmap.fill(Qt.transparent)
+
+        visible = self.valid & (self.heights >= MIN_VISIBLE)
+        if not visible.any():
+            return
+        # 找出连续可见、轮廓高低相近的列
+        with np.errstate(invalid='ignore'):
+            jump = np.abs(np.diff(self.base)) > RUN_BREAK
+        starts = np.flatnonzero(visible & np.concatenate(([True], ~visible[:-1] | jump)))
+        ends = np.flatnonzero(visible & np.concatenate((~visible[1:] | jump, [True]))) + 1
+
+        painter = QPainter(self.pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.translate(0, -self.rect.y())
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(SNOW_COLOR)
+        half = COLUMN_WIDTH / 2
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            xs = (np.arange(start, end) * COLUMN_WIDTH + half).tolist()
+            tops = (self.base[start:end] - self.heights[start:end]).tolist()
+            bottoms = (self.base[start:end] + 1).tolist()
+            points = [QPointF(start * COLUMN_WIDTH, bottoms[0])]
+            points += [QPointF(x, y) for x, y in zip(xs, tops)]
+            points.append(QPointF(end * COLUMN_WIDTH, bottoms[-1]))
+            points += [QPointF(x, y) for x, y in zip(reversed(xs), reversed(bottoms))]
+            painter.drawPolygon(QPolygonF(points))
+        painter.end()
+
+    def draw(self, painter, x, y, clip):
+        """把图片贴到(x, y)为原点的位置，与clip不相交时跳过"""
+        target = self.rect.translated(x, y)
+        if self.pixmap is not None and self.rendered.any() and target.intersects(clip):
+            painter.drawPixmap(target.topLeft(), self.pixmap)
+
+
+class SnowCover:
+    """插件的积雪 - 窗口底部一条，圣诞树/人物轮廓上边缘一条"""
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.floor = None  # 窗口底部的积雪
+        if NUMPY_AVAILABLE:
+            columns = int(math.ceil(widget.width() / COLUMN_WIDTH))
+            self.floor = SnowHeightmap(np.full(columns, float(widget.height())))
+        self.top = None  # 轮廓上的积雪，没有碰撞场时为None
+        self.field = None
+        self.origin = (0, 0)  # 碰撞场数组左上角在窗口中的位置
+
+    def set_collider(self, field, x=0, y=0):
+        """轮廓移动或切换，返回需要重绘的区域；换了图片时和clear一样清空所有积雪"""
+        region = self.top_region()
+        if field is not self.field:
+            self.field = field
+            self.top = SnowHeightmap(self.column_base(field)) if field is not None else None
+            if self.floor is not None:
+                region = region.united(self.floor.rect)
+                self.floor = SnowHeightmap(self.floor.base)
+        if field is not None:
+            self.origin = (x + field.left, y + field.top)
+        return region.united(self.top_region())
+
+    @staticmethod
+    def column_base(field):
+        """每列积雪底部的y：这一列中各像素列最高的轮廓上边缘"""
+        surface = np.where(field.surface >= 0, field.surface, np.inf)
+        columns = int(math.ceil(surface.size / COLUMN_WIDTH))
+        padded = np.full(columns * COLUMN_WIDTH, np.inf)
+        padded[:surface.size] = surface
+        base = padded.reshape(columns, COLUMN_WIDTH).min(axis=1)
+        base[np.isinf(base)] = np.nan
+        return base
+
+    def top_region(self):
+        """轮廓上的积雪当前覆盖的区域"""
+        if self.top is None or not self.top.rendered.any():
+            return QRegion()
+        return QRegion(self.top.rect.translated(*self.origin))
+
+    def clear(self):
+        """清空所有积雪，返回需要重绘的区域"""
+        region = self.top_region()
+        if self.floor is not None:
+            region = region.united(self.floor.rect)
+            self.floor = SnowHeightmap(self.floor.base)
+        if self.top is not None:
+            self.top = SnowHeightmap(self.top.base)
+        return region
+
+    def update(self, dt, landings):
+        """累加落地的粒子并融化，返回图片重新生成后需要重绘的区域"""
+        for field, positions in landings:
+            if field is None:
+                self.floor.add(positions)
+            elif field is self.field:
+                self.top.add(positions)
+
+        region = QRegion()
+        dpr = self.widget.devicePixelRatioF()
+        for layer, (x, y) in ((self.floor, (0, 0)), (self.top, self.origin)):
+            if layer is None:
+                continue
+            layer.melt(dt)
+            if layer.changed():
+                layer.render(dpr)
+                region = region.united(layer.rect.translated(x, y))
+        return region
+
+    def draw(self, painter, clip):
+        """绘制积雪，clip是本次重绘的范围"""
+        if self.floor is not None:
+            self.floor.draw(painter, 0, 0, clip)
+        if self.top is not None:
+            self.top.draw(painter, *self.origin, clip)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全屏飘雪 - 覆盖整个桌面、鼠标可以穿透的雪花图层
+作者：codeliu
+
+每个屏幕一个无边框、透明、置顶且不接收鼠标键盘输入的窗口，雪花沿用
+插件粒子的运动方式（风力、旋转、渐隐），出生范围和边界换成整个屏幕。
+为了支撑2000到10000个雪花：
+- 使用向量化粒子引擎（需要numpy），可以按particle_thread在工作线程中模拟
+- 每个屏幕只模拟自己的雪花，数量按屏幕面积分配
+- 绘制时剔除重绘区域以外的雪花（包括在屏幕上方等待落下的）
+- 雪花图片只有两种，同一种的雪花合并成一次drawPixmapFragments调用
+
+雪花几乎铺满屏幕，按瓦片计算脏区域得到的也是整个窗口，所以每帧直接
+重绘整个窗口，不再计算脏区域。
+
+在插件右键菜单中打开“全屏飘雪”，或单独运行：
+    python snow_overlay.py --count 5000
+"""
+
+import argparse
+import os
+import signal
+import sys
+from PyQt5.QtCore import Qt, QObject, QPointF
+from PyQt5.QtGui import QColor, QIcon, QPainter, QPen, QPixmap, QRadialGradient
+from PyQt5.QtWidgets import QAction, QApplication, QMenu, QStyle, QSystemTrayIcon, QWidget
+
+from frame_clock import FrameClock, FrameGovernor
+from particle_engine import NUMPY_AVAILABLE, VectorParticleSystem
+from sprite_cache import StarSpriteAtlas
+
+SNOW_OVERLAY_AVAILABLE = NUMPY_AVAILABLE
+DEFAULT_SNOW_COUNT = 3000  # 所有屏幕的雪花总数
+MAX_SNOW_COUNT = 10000
+SNOW_SPEED_Y = (40, 110)  # 雪花下落速度(px/s)
+SNOW_SPAWN_Y = (-30, -10)  # 雪花在屏幕上方出生，落进屏幕前不绘制
+FLAKE_SIZE = 40  # 雪花原图大小(px)，图集按粒子大小缩放
+
+_flake_pixmaps = None  # 雪花图片，进程内共享（图集按图片共享）
+
+
+def flake_pixmaps():
+    """生成两种雪花图片：柔和的圆点和六角雪花"""
+    global _flake_pixmaps
+    if _flake_pixmaps is not None:
+        return _flake_pixmaps
+
+    center = FLAKE_SIZE / 2
+    dot = QPixmap(FLAKE_SIZE, FLAKE_SIZE)
+    dot.fill(Qt.transparent)
+    painter = QPainter(dot)
+    painter.setRenderHint(QPainter.Antialiasing)
+    gradient = QRadialGradient(QPointF(center, center), center)
+    gradient.setColorAt(0.0, QColor(255, 255, 255, 255))
+    gradient.setColorAt(0.5, QColor(255, 255, 255, 180))
+    gradient.setColorAt(1.0, QColor(255, 255, 255, 0))
+    painter.setPen(Qt.NoPen)
+    painter.setBrush(gradient)
+    painter.drawEllipse(0, 0, FLAKE_SIZE, FLAKE_SIZE)
+    painter.end()
+
+    crystal = QPixmap(FLAKE_SIZE, FLAKE_SIZE)
+    crystal.fill(Qt.transparent)
+    painter = QPainter(crystal)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setPen(QPen(QColor(255, 255, 255, 230), 3, Qt.SolidLine, Qt.RoundCap))
+    painter.translate(center, center)
+    for _ in range(6):
+        painter.drawLine(QPointF(0, 0), QPointF(0, -center + 3))
+        painter.drawLine(QPointF(0, -center * 0.55), QPointF(-center * 0.25, -center * 0.75))
+        painter.drawLine(QPointF(0, -center * 0.55), QPointF(center * 0.25, -center * 0.75))
+        painter.rotate(60)
+    painter.end()
+
+    _flake_pixmaps = [dot, crystal]
+    return _flake_pixmaps
+
+
+class SnowOverlayWindow(QWidget):
+    """一个屏幕上的雪花窗口"""
+
+    def __init__(self, screen, count, threaded=False):
+        super().__init__(None, Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool
+                         | Qt.WindowTransparentForInput | Qt.WindowDoesNotAcceptFocus)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
+        # 雪花窗口不影响“最后一个窗口关闭时退出”
+        self.setAttribute(Qt.WA_QuitOnClose, False)
+
+        # 比屏幕矮1像素，避免Windows把它当成全屏程序（自动隐藏任务栏、屏蔽通知）
+        geometry = screen.geometry()
+        geometry.setHeight(geometry.height() - 1)
+        self.setGeometry(geometry)
+        width, height = geometry.width(), geometry.height()
+
+        self.frame_clock = FrameClock.instance()
+        self.sprite_atlas = StarSpriteAtlas(flake_pixmaps())
+        self.snapshot = None
+        # 寿命至少够最慢的雪花从顶部落到底部
+        fall_time = height / SNOW_SPEED_Y[0]
+        self.particle_system = VectorParticleSystem(
+            self, spawn_x=(0, width), initial_top_y=SNOW_SPAWN_Y, top_y=SNOW_SPAWN_Y,
+            middle_y=(0, height), initial_top_count=0, top_ratio=1.0,
+            bounds=(-50, width + 50, height + 30), sprite_count=len(flake_pixmaps()),
+            threaded=threaded, speed_y=SNOW_SPEED_Y, lifetime=(fall_time, fall_time * 2))
+        self.particle_system.position_updated.connect(self.update_particles)
+        self.count = count
+
+    def start(self):
+        """显示窗口并开始下雪"""
+        self.show()
+        FrameGovernor.instance().watch(self)
+        self.particle_system.start_particles(self.count)
+
+    def stop(self):
+        """停止下雪并关闭窗口"""
+        self.particle_system.stop_particles()
+        FrameGovernor.instance().forget(self)
+        self.close()
+        self.deleteLater()
+
+    def update_particles(self, snapshot):
+        """保存快照引用，本帧结束时重绘整个窗口"""
+        self.snapshot = snapshot
+        self.frame_clock.request_update(self)
+
+    def paintEvent(self, event):
+        """只绘制重绘区域内的雪花"""
+        if self.snapshot is None:
+            return
+        painter = QPainter(self)
+        self.sprite_atlas.draw_particles(painter, self.snapshot, event.rect())
+
+
+class SnowOverlay(QObject):
+    """全屏飘雪 - 进程内共享，屏幕增减或分辨率变化时重新创建窗口
+
+    插件创建时hold，关闭时release，所有插件都关闭后自动停止。
+    """
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        """获取进程内共享的全屏飘雪"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.windows = []
+        self.holders = set()
+        self.enabled = False
+        self.count = DEFAULT_SNOW_COUNT
+        self.threaded = False
+
+        app = QApplication.instance()
+        app.screenAdded.connect(self.on_screens_changed)
+        app.screenRemoved.connect(self.on_screens_changed)
+
+    def hold(self, owner):
+        """登记使用者"""
+        self.holders.add(owner)
+
+    def release(self, owner):
+        """使用者退出，没有使用者时停止"""
+        self.holders.discard(owner)
+        if not self.holders:
+            self.stop()
+
+    def start(self, count=None, threaded=None):
+        """在所有屏幕上开始下雪"""
+        if not SNOW_OVERLAY_AVAILABLE:
+            print("全屏飘雪需要安装numpy")
+            return False
+        if count is not None:
+            self.count = max(1, min(int(count), MAX_SNOW_COUNT))
+        if threaded is not None:
+            self.threaded = threaded
+        if self.enabled:
+            return True
+        self.enabled = True
+        self.create_windows()
+        return True
+
+    def stop(self):
+        """停止下雪"""
+        self.enabled = False
+        self.close_windows()
+
+    def toggle(self):
+        """切换全屏飘雪"""
+        if self.enabled:
+            self.stop()
+        else:
+            self.start()
+        return self.enabled
+
+    def create_windows(self):
+        """每个屏幕一个窗口，雪花数量按屏幕面积分配"""
+        screens = QApplication.screens()
+        areas = [s.geometry().width() * s.geometry().height() for s in screens]
+        total = sum(areas) or 1
+        for screen, area in zip(screens, areas):
+            window = SnowOverlayWindow(screen, max(1, round(self.count * area / total)),
+                                       self.threaded)
+            screen.geometryChanged.connect(self.on_screens_changed)
+            window.start()
+            self.windows.append(window)
+
+    def close_windows(self):
+        """关闭所有雪花窗口"""
+        for screen in QApplication.screens():
+            try:
+                screen.geometryChanged.disconnect(self.on_screens_changed)
+            except TypeError:
+                pass
+        for window in self.windows:
+            window.stop()
+        self.windows = []
+
+    def on_screens_changed(self, *args):
+        """屏幕增减或分辨率变化"""
+        if self.enabled:
+            self.close_windows()
+            self.create_windows()
+
+
+def main():
+    """单独运行全屏飘雪，通过托盘图标退出"""
+    parser = argparse.ArgumentParser(description="全屏飘雪")
+    parser.add_argument('--count', type=int, default=DEFAULT_SNOW_COUNT,
+                        help=f"雪花总数，默认{DEFAULT_SNOW_COUNT}，最多{MAX_SNOW_COUNT}")
+    parser.add_argument('--thread', action='store_true', help="在工作线程中模拟雪花")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    app.setApplicationName("全屏飘雪")
+    app.setOrganizationName("codeliu")
+    app.setQuitOnLastWindowClosed(False)
+    # 雪花窗口不接收键盘输入，在终端中按Ctrl+C直接结束
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    overlay = SnowOverlay.instance()
+    if not overlay.start(args.count, args.thread):
+        return 1
+
+    tray_icon = None
+    if QSystemTrayIcon.isSystemTrayAvailable():
+        icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "res", "Icon1.ico")
+        if os.path.exists(icon_path):
+            tray_icon = QSystemTrayIcon(QIcon(icon_path))
+        else:
+            tray_icon = QSystemTrayIcon(app.style().standardIcon(QStyle.SP_MessageBoxInformation))
+        tray_icon.setToolTip("全屏飘雪")
+        tray_menu = QMenu()
+        quit_action = QAction("退出", tray_menu)
+        quit_action.triggered.connect(app.quit)
+        tray_menu.addAction(quit_action)
+        tray_icon.setContextMenu(tray_menu)
+        tray_icon.show()
+
+    app.aboutToQuit.connect(overlay.stop)
+    return app.exec_()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面插件精灵缓存 - 预先变换好的星星图集
+作者：codeliu
+
+粒子绘制时不再逐个缩放、旋转星星图片，而是在图集里按尺寸档位和
+量化后的旋转角度取出对应的格子直接贴图。使用同一种星星的粒子合并成
+一次drawPixmapFragments调用。
+
+BackgroundLayer把树、灯带、人物这些很少变化的内容预先画到一张和窗口
+一样大的图层上，重绘时只按脏区域从图层贴图；上下晃动的人物只改变图层的
+贴图偏移，不重新生成图层。MirroredPixmapCache缓存
+镜像后的人物图片，镜像显示时也是不带变换的直接贴图。
+"""
+
+import math
+from collections import OrderedDict
+from PyQt5 import sip
+from PyQt5.QtCore import Qt, QPoint, QRect, QRectF
+from PyQt5.QtGui import QImage, QPainter, QPixmap
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+MIRROR_CACHE_SIZE = 4  # 最多缓存几张镜像图片
+
+
+class FragmentBuffer:
+    """drawPixmapFragments使用的片段数组 - 复用内存，容量不足时翻倍扩容
+
+    QPainter.PixmapFragment依次是 x, y, sourceLeft, sourceTop, width, height,
+    scaleX, scaleY, rotation, opacity 十个qreal，安装了numpy时直接通过
+    view按列批量写入。
+    """
+    X, Y, SOURCE_LEFT, SOURCE_TOP, WIDTH, HEIGHT, SCALE_X, SCALE_Y, ROTATION, OPACITY = range(10)
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.fragments = None
+        self.view = None
+        self.capacity = 0
+
+    def reserve(self, count):
+        """确保至少能容纳count个片段"""
+        if count <= self.capacity:
+            return
+        capacity = max(count, self.capacity * 2, 64)
+        self.fragments = sip.array(QPainter.PixmapFragment, capacity)
+        self.capacity = capacity
+
+        # 图集格子已经缩放旋转好了，片段本身不需要再变换
+        if NUMPY_AVAILABLE:
+            self.view = np.frombuffer(memoryview(self.fragments), dtype=np.float64)
+            self.view = self.view.reshape(capacity, 10)
+            self.view[:] = 0
+            self.view[:, [self.WIDTH, self.HEIGHT]] = self.cell_size
+            self.view[:, [self.SCALE_X, self.SCALE_Y, self.OPACITY]] = 1
+        else:
+            for i in range(capacity):
+                fragment = self.fragments[i]
+                fragment.width = fragment.height = self.cell_size
+                fragment.scaleX = fragment.scaleY = fragment.opacity = 1
+                fragment.rotation = 0
+
+
+class StarSpriteAtlas:
+    """星星精灵图集 - 每种星星一张表，行是尺寸档位，列是旋转角度
+
+    生成的表按星星图片在进程内共享，多个插件使用同一张星星图片时只生成一次。
+    """
+    _shared_sheets = {}  # (图片cacheKey, 最小尺寸, 最大尺寸, 角度数) -> 图集
+
+    def __init__(self, star_pixmaps, min_size=6, max_size=12, rotation_steps=24):
+        self.star_pixmaps = list(star_pixmaps)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.rotation_steps = rotation_steps
+        self.step_degrees = 360.0 / rotation_steps
+        # 格子要能放下旋转45度后的最大尺寸星星
+        self.cell_size = int(math.ceil(max_size * 2 * math.sqrt(2))) + 2
+        self.sheets = {}  # 星星下标 -> 图集，首次使用时生成
+        self.buffers = [FragmentBuffer(self.cell_size) for _ in self.star_pixmaps]
+
+    def __len__(self):
+        return len(self.star_pixmaps)
+
+    def sheet(self, index):
+        """获取指定星星的图集"""
+        sheet = self.sheets.get(index)
+        if sheet is None:
+            star_pixmap = self.star_pixmaps[index]
+            key = (star_pixmap.cacheKey(), self.min_size, self.max_size, self.rotation_steps)
+            sheet = StarSpriteAtlas._shared_sheets.get(key)
+            if sheet is None:
+                sheet = self.build_sheet(star_pixmap)
+                StarSpriteAtlas._shared_sheets[key] = sheet
+            self.sheets[index] = sheet
+        return sheet
+
+    def build_sheet(self, star_pixmap):
+        """生成一张图集：每个尺寸档位缩放一次，再按量化角度旋转绘制"""
+        cell = self.cell_size
+        buckets = self.max_size - self.min_size + 1
+        image = QImage(cell * self.rotation_steps, cell * buckets,
+                       QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        # 图集按1倍像素生成，高分屏的星星图片先去掉设备像素比再缩放
+        star_image = star_pixmap.toImage()
+        star_image.setDevicePixelRatio(1.0)
+        for row in range(buckets):
+            size = self.min_size + row
+            scaled = QPixmap.fromImage(star_image.scaled(size * 2, size * 2, Qt.KeepAspectRatio,
+                                                         Qt.SmoothTransformation))
+            for col in range(self.rotation_steps):
+                painter.save()
+                painter.translate(col * cell + cell / 2, row * cell + cell / 2)
+                painter.rotate(col * self.step_degrees)
+                painter.drawPixmap(-scaled.width() // 2, -scaled.height() // 2, scaled)
+                painter.restore()
+        painter.end()
+
+        return QPixmap.fromImage(image)
+
+    def cell_origin(self, size, rotation):
+        """根据粒子大小和角度计算格子在图集中的左上角"""
+        row = min(max(int(size), self.min_size), self.max_size) - self.min_size
+        col = int(round(rotation / self.step_degrees)) % self.rotation_steps
+        return col * self.cell_size, row * self.cell_size
+
+    def draw_particles(self, painter, particles, clip=None):
+        """批量绘制粒子 - 每种星星一次drawPixmapFragments调用
+
+        particles可以是粒子字典列表，也可以是向量化引擎的快照。指定clip
+        （QRect）时跳过格子完全落在clip以外的粒子。
+        """
+        if hasattr(particles, 'current'):
+            self.draw_arrays(painter, particles.current(), clip)
+        else:
+            self.draw_rows(painter, particles, clip)
+
+    def clip_bounds(self, clip):
+        """粒子中心需要落在的范围 (左, 上, 右, 下)：clip向外扩半个格子"""
+        margin = self.cell_size / 2
+        return (clip.left() - margin, clip.top() - margin,
+                clip.right() + margin, clip.bottom() + margin)
+
+    def draw_rows(self, painter, particles, clip=None):
+        """绘制粒子字典列表（使用插值后的draw_x/draw_y/draw_rotation）"""
+        counts = [0] * len(self.buffers)
+        for buffer in self.buffers:
+            buffer.reserve(len(particles))
+        if clip is not None:
+            left, top, right, bottom = self.clip_bounds(clip)
+
+        for particle in particles:
+            if clip is not None and not (left <= particle['draw_x'] <= right
+                                         and top <= particle['draw_y'] <= bottom):
+                continue
+            index = particle['sprite']
+            sx, sy = self.cell_origin(particle['size'], particle['draw_rotation'])
+            fragment = self.buffers[index].fragments[counts[index]]
+            fragment.x = int(particle['draw_x'])
+            fragment.y = int(particle['draw_y'])
+            fragment.sourceLeft = sx
+            fragment.sourceTop = sy
+            fragment.opacity = int(particle['alpha']) / 255.0
+            counts[index] += 1
+
+        for index, count in enumerate(counts):
+            if count:
+                painter.drawPixmapFragments(self.buffers[index].fragments[0:count],
+                                            self.sheet(index))
+
+    def draw_arrays(self, painter, frame, clip=None):
+        """绘制向量化引擎的一帧快照，片段数据按列批量写入"""
+        cell = self.cell_size
+        rows = np.clip(np.floor(frame.size), self.min_size, self.max_size) - self.min_size
+        cols = np.rint(frame.rotation / self.step_degrees) % self.rotation_steps
+        visible = None
+        if clip is not None:
+            left, top, right, bottom = self.clip_bounds(clip)
+            visible = (frame.x >= left) & (frame.x <= right)
+            visible &= (frame.y >= top) & (frame.y <= bottom)
+
+        for index, buffer in enumerate(self.buffers):
+            if visible is None:
+                selected = np.flatnonzero(frame.sprite == index)
+            else:
+                selected = np.flatnonzero((frame.sprite == index) & visible)
+            count = selected.size
+            if count == 0:
+                continue
+
+            buffer.reserve(count)
+            view = buffer.view[:count]
+            view[:, FragmentBuffer.X] = np.floor(frame.x[selected])
+            view[:, FragmentBuffer.Y] = np.floor(frame.y[selected])
+            view[:, FragmentBuffer.SOURCE_LEFT] = cols[selected] * cell
+            view[:, FragmentBuffer.SOURCE_TOP] = rows[selected] * cell
+            view[:, FragmentBuffer.OPACITY] = np.floor(frame.alpha[selected]) / 255.0
+            painter.drawPixmapFragments(buffer.fragments[0:count], self.sheet(index))
+
+
+class BackgroundLayer:
+    """静态背景图层 - 只在内容变化时重新生成，绘制时只贴脏区域
+
+    render(painter)负责画出全部静态内容。内容变化时由插件调用invalidate()，
+    窗口大小或设备像素比变化时自动重新生成。内容整体平移（人物上下晃动）
+    时调用set_offset，只改变贴图位置。
+    """
+
+    def __init__(self, widget, render):
+        self.widget = widget
+        self.render = render
+        self.pixmap = None
+        self.valid = False
+        self.offset = QPoint(0, 0)  # 图层贴到窗口上时的偏移
+
+    def invalidate(self):
+        """标记图层需要重新生成（下次绘制时生成）"""
+        self.valid = False
+
+    def set_offset(self, x, y):
+        """整个图层平移到(x, y)，图层本身不需要重新生成"""
+        self.offset = QPoint(x, y)
+
+    def size_changed(self):
+        """图层大小是否与窗口（按设备像素比）不一致"""
+        if self.pixmap is None:
+            return True
+        dpr = self.widget.devicePixelRatioF()
+        return (self.pixmap.devicePixelRatio() != dpr
+                or self.pixmap.width() != int(math.ceil(self.widget.width() * dpr))
+                or self.pixmap.height() != int(math.ceil(self.widget.height() * dpr)))
+
+    def rebuild(self):
+        """按窗口大小重新生成图层"""
+        if self.size_changed():
+            dpr = self.widget.devicePixelRatioF()
+            self.pixmap = QPixmap(int(math.ceil(self.widget.width() * dpr)),
+                                  int(math.ceil(self.widget.height() * dpr)))
+            self.pixmap.setDevicePixelRatio(dpr)
+        self.pixmap.fill(Qt.transparent)
+
+        painter = QPainter(self.pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        self.render(painter)
+        painter.end()
+        self.valid = True
+
+    def draw(self, painter, region):
+        """把图层中region覆盖的部分贴到窗口上"""
+        if not self.valid or self.size_changed():
+            self.rebuild()
+        dpr = self.pixmap.devicePixelRatio()
+        bounds = QRect(0, 0, self.widget.width(), self.widget.height())
+        for rect in region.rects():
+            # 按偏移换算成图层中的位置，超出图层的部分是透明的，不需要贴
+            rect = rect.translated(-self.offset).intersected(bounds)
+            if rect.isEmpty():
+                continue
+            source = QRectF(rect.x() * dpr, rect.y() * dpr, rect.width() * dpr, rect.height() * dpr)
+            painter.drawPixmap(QRectF(rect.translated(self.offset)), self.pixmap, source)
+
+
+class MirroredPixmapCache:
+    """左右镜像图片缓存 - 每张图片只镜像一次，超出容量时淘汰最久未用的"""
+
+    def __init__(self, capacity=MIRROR_CACHE_SIZE):
+        self.capacity = capacity
+        self.pixmaps = OrderedDict()  # 原图的cacheKey -> 镜像后的图片
+
+    def __len__(self):
+        return len(self.pixmaps)
+
+    def get(self, pixmap):
+        """获取pixmap的镜像图片，没有缓存时生成"""
+        key = pixmap.cacheKey()
+        mirrored = self.pixmaps.get(key)
+        if mirrored is not None:
+            self.pixmaps.move_to_end(key)
+            return mirrored
+
+        mirrored = QPixmap.fromImage(pixmap.toImage().mirrored(True, False))
+        mirrored.setDevicePixelRatio(pixmap.devicePixelRatio())
+        self.pixmaps[key] = mirrored
+        while len(self.pixmaps) > self.capacity:
+            self.pixmaps.popitem(last=False)
+        return mirrored
+
+    def discard(self, pixmap):
+        """丢弃pixmap对应的镜像图片"""
+        self.pixmaps.pop(pixmap.cacheKey(), None)
+
+    def clear(self):
+        """清空缓存"""
+        self.pixmaps.clear()
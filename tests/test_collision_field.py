@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""碰撞场：表面、深度、滑动方向和镜像"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from collision_field import CollisionField, LookupBuffers
+
+# 一个向右倾斜的小山：顶上一格的左下方空出、右下方有支撑；最后一列是空列
+SHAPE = np.array([
+    [0, 0, 0, 0, 0, 0],
+    [0, 0, 1, 0, 0, 0],
+    [0, 0, 1, 1, 0, 0],
+    [1, 1, 1, 1, 1, 0],
+], dtype=bool)
+
+
+@pytest.fixture
+def field():
+    return CollisionField(SHAPE, left=3, top=4)
+
+
+def test_surface_is_top_occupied_row(field):
+    assert field.surface.tolist() == [3, 3, 1, 2, 3, -1]
+
+
+def test_depth_counts_occupied_pixels_above(field):
+    assert field.depth[:, 2].tolist() == [0, 1, 2, 3]
+    assert field.depth[:, 0].tolist() == [0, 0, 0, 1]
+    assert field.depth[3].tolist() == [1, 1, 3, 2, 1, 0]
+
+
+def test_slide_follows_slope(field):
+    # 只有一侧空出时向空出的一侧滑，两侧都有支撑时不动
+    assert field.slide[1, 2] == -1
+    assert field.slide[2, 3] == 0
+    # 最底行下面超出边界，算两边都空出
+    assert not field.slide[3].any()
+
+
+def test_lookup_reports_occupied_and_depth(field):
+    x = np.array([2.5, 0.2, -1.0, 5.5, 2.0])
+    y = np.array([3.9, 1.0, 3.0, 3.0, 9.0])
+    out = LookupBuffers(len(x))
+    field.lookup(x, y, out)
+    assert out.occupied.tolist() == [True, False, False, False, False]
+    assert out.valid.tolist() == [True, True, False, True, False]
+    field.take_depth(out)
+    assert out.depth[0] == 3
+    assert field.contains(x, y).tolist() == out.occupied.tolist()
+
+
+def test_mirrored_field(field):
+    mirrored = field.mirrored(full_width=10)
+    assert mirrored.left == 10 - 3 - field.width
+    assert mirrored.surface.tolist() == field.surface[::-1].tolist()
+    assert np.array_equal(mirrored.depth, field.depth[:, ::-1])
+    assert mirrored.slide[1, 3] == 1
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""动画导出：APNG的块结构和序号、PNG序列的帧数、出错时不留下残缺的文件"""
+
+import struct
+import zlib
+
+import pytest
+from PyQt5.QtGui import QColor, QImage
+
+import export_animation
+from export_animation import PNG_SIGNATURE, ApngWriter, PngSequenceWriter
+from wind_field import WindField
+
+
+def read_chunks(path):
+    """按顺序读出PNG的块 (类型, 数据)，同时检查CRC"""
+    data = open(path, 'rb').read()
+    assert data.startswith(PNG_SIGNATURE)
+    chunks = []
+    offset = len(PNG_SIGNATURE)
+    while offset < len(data):
+        length, = struct.unpack_from('>I', data, offset)
+        kind = data[offset + 4:offset + 8]
+        body = data[offset + 8:offset + 8 + length]
+        crc, = struct.unpack_from('>I', data, offset + 8 + length)
+        assert crc == zlib.crc32(kind + body) & 0xffffffff
+        chunks.append((kind, body))
+        offset += 12 + length
+    assert offset == len(data)
+    return chunks
+
+
+def solid_rgba(width, height, rgba):
+    return bytes(rgba) * (width * height)
+
+
+def write_apng(path, colors, fps=10):
+    with ApngWriter(str(path), 2, 3, len(colors), fps) as writer:
+        for index, color in enumerate(colors):
+            writer.write(writer.encode(index, solid_rgba(2, 3, color)))
+
+
+def test_apng_chunk_layout(tmp_path):
+    path = tmp_path / 'anim.png'
+    colors = [(255, 0, 0, 255), (0, 255, 0, 128), (0, 0, 255, 0)]
+    write_apng(path, colors, fps=12)
+    chunks = read_chunks(path)
+    assert [kind for kind, _ in chunks] == [b'IHDR', b'acTL', b'fcTL', b'IDAT', b'fcTL', b'fdAT',
+                                            b'fcTL', b'fdAT', b'IEND']
+    assert struct.unpack('>IIBBBBB', chunks[0][1]) == (2, 3, 8, 6, 0, 0, 0)
+    assert struct.unpack('>II', chunks[1][1]) == (3, 0)
+
+    # fcTL和fdAT共用一个从0开始连续的序号
+    sequence = []
+    for kind, body in chunks:
+        if kind == b'fcTL':
+            fields = struct.unpack('>IIIIIHHBB', body)
+            assert fields[1:] == (2, 3, 0, 0, 1, 12, 0, 0)
+            sequence.append(fields[0])
+        elif kind == b'fdAT':
+            sequence.append(struct.unpack_from('>I', body)[0])
+    assert sequence == [0, 1, 2, 3, 4]
+
+    # 每帧的数据是按行加过滤类型0的RGBA
+    frames = [chunks[3][1], chunks[5][1][4:], chunks[7][1][4:]]
+    for data, color in zip(frames, colors):
+        assert zlib.decompress(data) == (b'\x00' + bytes(color) * 2) * 3
+
+
+def test_apng_first_frame_is_a_plain_png(qapp, tmp_path):
+    path = tmp_path / 'anim.png'
+    write_apng(path, [(255, 0, 0, 255), (0, 255, 0, 255)])
+    image = QImage(str(path))
+    assert (image.width(), image.height()) == (2, 3)
+    assert image.pixelColor(1, 2) == QColor(255, 0, 0)
+
+
+def test_failed_apng_export_removes_the_file(tmp_path):
+    path = tmp_path / 'anim.png'
+    with pytest.raises(RuntimeError):
+        with ApngWriter(str(path), 2, 3, 3, 10) as writer:
+            writer.write(writer.encode(0, solid_rgba(2, 3, (1, 2, 3, 4))))
+            raise RuntimeError("渲染失败")
+    assert writer.file.closed
+    assert not path.exists()
+
+
+def test_png_sequence_writes_one_file_per_frame(tmp_path):
+    with PngSequenceWriter(str(tmp_path / 'frames'), 2, 2, 3, 10) as writer:
+        for index in range(3):
+            writer.encode(index, solid_rgba(2, 2, (9, 9, 9, 255)))
+    names = sorted(p.name for p in (tmp_path / 'frames').iterdir())
+    assert names == ['frame_00000.png', 'frame_00001.png', 'frame_00002.png']
+    assert [kind for kind, _ in read_chunks(tmp_path / 'frames' / names[0])] == [
+        b'IHDR', b'IDAT', b'IEND']
+
+
+@pytest.fixture
+def export(qapp, monkeypatch):
+    """运行export_animation.main，不修改共享风场"""
+    pytest.importorskip('numpy')
+    monkeypatch.setattr(WindField, '_shared', WindField._shared)
+
+    def run(*argv):
+        return export_animation.main([str(arg) for arg in argv] + [
+            '--widget', 'santa', '--fps', '10', '--duration', '0.3', '--warmup', '0.1',
+            '--count', '20', '--seed', '1', '--workers', '2'])
+    return run
+
+
+def test_main_exports_every_frame(export, tmp_path):
+    assert export(tmp_path / 'anim.png') == 0
+    chunks = read_chunks(tmp_path / 'anim.png')
+    assert struct.unpack('>II', dict(chunks)[b'acTL']) == (3, 0)
+    assert [kind for kind, _ in chunks].count(b'fcTL') == 3
+    assert export(tmp_path / 'frames', '--format', 'png') == 0
+    assert len(list((tmp_path / 'frames').iterdir())) == 3
+
+
+def test_main_removes_partial_output_on_error(export, tmp_path, monkeypatch):
+    calls = []
+
+    def render(self):
+        calls.append(1)
+        if len(calls) > 1:
+            raise RuntimeError("渲染失败")
+        return bytes(self.image.width() * self.image.height() * 4)
+
+    monkeypatch.setattr(export_animation.AnimationExporter, 'render', render)
+    with pytest.raises(RuntimeError):
+        export(tmp_path / 'anim.png')
+    assert not (tmp_path / 'anim.png').exists()
+    calls.clear()
+    with pytest.raises(RuntimeError):
+        export(tmp_path / 'frames', '--format', 'png')
+    assert list((tmp_path / 'frames').iterdir()) == []
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""帧时钟：按间隔运行回调、插值、合并重绘请求和脏区域；帧率调节器的状态"""
+
+import pytest
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QRegion
+
+import frame_clock
+from frame_clock import (DAMAGE_TILE, IDLE_TIMEOUT, LOW_POWER_FRAME_INTERVAL, MAX_FRAME_TIME,
+                         FrameClock, FrameGovernor, tiles_to_region)
+
+
+class FakeElapsed:
+    """代替QElapsedTimer，每帧的间隔由测试指定"""
+
+    def __init__(self):
+        self.delta = 0.0
+
+    def nsecsElapsed(self):
+        return int(self.delta * 1e6)
+
+    def restart(self):
+        pass
+
+    def start(self):
+        pass
+
+
+class FakeWidget:
+    """记录update调用的窗口"""
+
+    def __init__(self):
+        self.updates = []
+
+    def update(self, region=None):
+        self.updates.append(region)
+
+
+@pytest.fixture
+def clock(qapp):
+    clock = FrameClock()
+    clock.elapsed = FakeElapsed()
+    yield clock
+    clock.timer.stop()
+
+
+def advance(clock, ms):
+    clock.elapsed.delta = ms
+    clock.tick()
+
+
+def test_interval_callbacks_run_when_due(clock):
+    steps = []
+    clock.register(steps.append, 60)
+    advance(clock, 40)
+    assert len(steps) == 0
+    advance(clock, 40)
+    assert len(steps) == 1
+    advance(clock, 130)
+    assert len(steps) == 3
+
+
+def test_per_frame_callback_gets_real_delta(clock):
+    deltas = []
+    clock.register(deltas.append)
+    advance(clock, 33)
+    assert deltas == [pytest.approx(0.033)]
+
+
+def test_interpolation_gets_leftover_fraction(clock):
+    steps, alphas = [], []
+    clock.register(steps.append, 16, alphas.append)
+    advance(clock, 24)
+    assert steps == [pytest.approx(0.016)]
+    assert alphas == [pytest.approx(0.5)]
+    advance(clock, 4)
+    assert len(steps) == 1
+    assert alphas[-1] == pytest.approx(0.75)
+
+
+def test_long_frames_are_capped(clock):
+    steps = []
+    clock.register(steps.append, 10)
+    advance(clock, 5000)  # 休眠唤醒后不追赶
+    assert len(steps) == MAX_FRAME_TIME // 10
+
+
+def test_resume_drops_paused_time(clock):
+    steps = []
+    clock.register(steps.append, 16)
+    advance(clock, 12)
+    clock.pause()
+    assert not clock.timer.isActive()
+    clock.resume()
+    assert clock.timer.isActive()
+    advance(clock, 12)
+    assert steps == []
+
+
+def test_register_once_and_unregister_stops_timer(clock):
+    calls = []
+    clock.register(calls.append, 16)
+    clock.register(calls.append, 16)
+    assert len(clock.subscribers) == 1
+    assert clock.timer.isActive()
+    clock.unregister(calls.append)
+    assert not clock.timer.isActive()
+
+
+def test_set_frame_interval_restarts_timer(clock):
+    clock.register(lambda dt: None)
+    clock.set_frame_interval(33)
+    assert clock.frame_interval == 33
+    assert clock.timer.interval() == 33
+
+
+def test_one_update_per_widget_per_frame(clock):
+    widget = FakeWidget()
+
+    def animate(dt):
+        clock.request_update(widget)
+        clock.request_update(widget)
+
+    clock.register(animate, 10)
+    advance(clock, 35)  # 一帧内运行三次
+    assert widget.updates == [None]
+    advance(clock, 1)
+    assert widget.updates == [None]
+
+
+def test_dirty_regions_merge_within_a_frame(clock):
+    widget = FakeWidget()
+    clock.request_update(widget, QRegion(QRect(0, 0, 10, 10)))
+    clock.request_update(widget, QRegion(QRect(50, 50, 10, 10)))
+    clock.register(lambda dt: None)
+    advance(clock, 16)
+    assert len(widget.updates) == 1
+    assert widget.updates[0] == QRegion(QRect(0, 0, 10, 10)).united(QRect(50, 50, 10, 10))
+
+
+def test_full_repaint_wins_over_regions(clock):
+    widget = FakeWidget()
+    clock.request_update(widget, QRegion(QRect(0, 0, 10, 10)))
+    clock.request_update(widget)
+    clock.request_update(widget, QRegion(QRect(5, 5, 10, 10)))
+    clock.register(lambda dt: None)
+    advance(clock, 16)
+    assert widget.updates == [None]
+
+
+def test_empty_region_skips_update(clock):
+    widget = FakeWidget()
+    clock.request_update(widget, QRegion())
+    clock.register(lambda dt: None)
+    advance(clock, 16)
+    assert widget.updates == []
+
+
+def test_tiles_merge_into_row_runs():
+    tile = DAMAGE_TILE
+    region = tiles_to_region({(0, 0), (0, 1), (0, 2), (0, 5), (2, 1)})
+    assert sorted((r.x(), r.y(), r.width(), r.height()) for r in region.rects()) == [
+        (0, 0, 3 * tile, tile), (tile, 2 * tile, tile, tile), (5 * tile, 0, tile, tile)]
+    assert tiles_to_region(set()).isEmpty()
+
+
+@pytest.fixture
+def governor(clock, monkeypatch):
+    monkeypatch.setattr(frame_clock, 'on_battery_power', lambda: False)
+    monkeypatch.setattr(frame_clock, 'system_idle_seconds', lambda: 0.0)
+    governor = FrameGovernor(clock)
+    governor.poll_timer.stop()
+    clock.register(lambda dt: None)
+    yield governor
+    governor.deleteLater()
+
+
+def test_tooltip_follows_interval_changes(governor):
+    texts = []
+    governor.state_changed.connect(texts.append)
+    owner = object()
+    governor.set_normal_interval(owner, 33)
+    governor.set_normal_interval(owner, 25)
+    governor.set_normal_interval(owner, 25)
+    # 状态一直是运行中，但帧率变了两次
+    assert texts == ["运行中 30 FPS", "运行中 40 FPS"]
+
+
+def test_idle_throttles_only_with_system_idle_time(governor, monkeypatch):
+    monkeypatch.setattr(frame_clock, 'system_idle_seconds', lambda: None)
+    governor.evaluate()
+    assert governor.state == FrameGovernor.ACTIVE
+    monkeypatch.setattr(frame_clock, 'system_idle_seconds', lambda: IDLE_TIMEOUT + 1.0)
+    governor.evaluate()
+    assert governor.state == FrameGovernor.IDLE
+    assert governor.frame_clock.frame_interval == LOW_POWER_FRAME_INTERVAL
+
+
+def test_hidden_widgets_pause_the_clock(governor):
+    from PyQt5.QtWidgets import QWidget
+    widget = QWidget()
+    governor.watch(widget)
+    assert governor.state == FrameGovernor.PAUSED
+    assert governor.frame_clock.paused
+    governor.forget(widget)
+    assert governor.state == FrameGovernor.ACTIVE
+    assert not governor.frame_clock.paused
+    widget.deleteLater()
+
+
+def test_occlusion_check_is_windows_only(qapp):
+    from PyQt5.QtWidgets import QWidget
+    if frame_clock.sys.platform == 'win32':
+        pytest.skip("Windows上按真实的Z序判断")
+    assert not frame_clock.window_occluded(QWidget())
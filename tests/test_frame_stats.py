@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""性能统计：环形缓冲、百分位数、FPS、JSON导出和图片内存"""
+
+import json
+
+import pytest
+from PyQt5.QtGui import QPixmap
+
+from frame_stats import FrameStats, RingBuffer, percentile, pixmap_bytes, summarize
+from image_loader import Sprite
+
+
+def test_ring_buffer_keeps_latest_in_order():
+    buffer = RingBuffer(3)
+    assert buffer.samples() == [] and len(buffer) == 0
+    for value in (1, 2):
+        buffer.append(value)
+    assert buffer.samples() == [1.0, 2.0]
+    for value in (3, 4, 5):
+        buffer.append(value)
+    assert buffer.samples() == [3.0, 4.0, 5.0]
+    assert len(buffer) == 3
+    buffer.clear()
+    assert buffer.samples() == []
+
+
+def test_nearest_rank_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile([7.0], 0.99) == 7.0
+    assert percentile([], 0.5) == 0.0
+    assert percentile([1, 2, 3], 0.0) == 1
+
+
+def test_summarize_sorts_samples():
+    summary = summarize([4.0, 1.0, 3.0, 2.0])
+    assert summary == {'count': 4, 'mean': 2.5, 'p50': 2.0, 'p95': 4.0, 'p99': 4.0}
+    assert summarize([])['p95'] == 0.0
+
+
+def test_fps_from_intervals():
+    stats = FrameStats(capacity=4)
+    assert stats.fps() == 0.0
+    for interval in (20, 20, 20, 20, 20):
+        stats.record('interval', interval)
+    assert stats.fps() == pytest.approx(50.0)
+
+
+def test_export_json(tmp_path):
+    stats = FrameStats(capacity=8)
+    for ms in (1.0, 2.0, 3.0):
+        stats.record('paint', ms)
+    stats.record('interval', 16.0)
+    path = tmp_path / 'stats.json'
+    stats.export_json(str(path), {'particles': 120})
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data['particles'] == 120
+    assert data['samples']['paint'] == [1.0, 2.0, 3.0]
+    assert data['samples']['simulate'] == []
+    assert data['summary']['paint']['p50'] == 2.0
+    assert data['summary']['interval']['count'] == 1
+    assert data['fps'] == pytest.approx(62.5)
+
+
+def test_pixmap_bytes_counts_each_image_once(qapp):
+    pixmap = QPixmap(10, 10)
+    other = QPixmap(4, 5)
+    size = pixmap.width() * pixmap.height() * pixmap.depth() // 8
+    assert pixmap_bytes(pixmap) == size
+    nested = {'a': [pixmap, Sprite(pixmap)], 'b': (other,), 'c': None}
+    assert pixmap_bytes(nested) == size + 4 * 5 * other.depth() // 8
+    assert pixmap_bytes(QPixmap()) == 0
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""图片加载：后台解码和缩放结果的缓存"""
+
+import os
+import time
+
+import pytest
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QImage, QPixmap
+
+from image_loader import (RAW_IMAGE_HEADER, ImageLoader, decode_image, decode_pool,
+                          logical_size, scaled_cache_path)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """缩放缓存写到临时目录，不碰用户的缓存"""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    return tmp_path / 'cache'
+
+
+def save_image(path, width=80, height=40, color=Qt.red):
+    image = QImage(width, height, QImage.Format_ARGB32)
+    image.fill(QColor(color))
+    assert image.save(str(path))
+    return str(path)
+
+
+def wait_for(qapp, condition, timeout=5.0):
+    """处理事件直到condition成立（后台解码的结果排队回到主线程）"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        decode_pool().waitForDone(10)
+        qapp.processEvents()
+
+
+def test_load_scales_into_box(qapp, tmp_path):
+    loader = ImageLoader(20, 20)
+    loader.add('a', save_image(tmp_path / 'a.png'))
+    assert loader.pixmap('a') is None
+    pixmap = loader.load('a')
+    assert (pixmap.width(), pixmap.height()) == (20, 10)
+    assert loader.pixmap('a') is pixmap
+
+
+def test_request_decodes_in_background(qapp, tmp_path):
+    loader = ImageLoader(40, 40)
+    loader.add('a', save_image(tmp_path / 'a.png'))
+    ready = []
+    loader.image_ready.connect(ready.append)
+    loader.request('a')
+    loader.request('a')  # 正在解码时不重复提交
+    assert loader.pending == {'a'}
+    wait_for(qapp, lambda: ready)
+    assert ready == ['a']
+    assert not loader.pending
+    assert loader.pixmap('a').toImage().pixelColor(5, 5) == QColor(Qt.red)
+
+
+def test_failed_decode_uses_fallback(qapp, tmp_path):
+    broken = tmp_path / 'broken.png'
+    broken.write_bytes(b'not a png')
+    fallback = QPixmap(4, 4)
+    loader = ImageLoader(40, 40, fallback=fallback)
+    loader.add('x', str(broken))
+    assert loader.load('x') is fallback
+
+
+def test_failed_decode_without_fallback_is_not_retried(qapp, tmp_path):
+    broken = tmp_path / 'broken.png'
+    broken.write_bytes(b'not a png')
+    loader = ImageLoader(40, 40)
+    loader.add('x', str(broken))
+    ready = []
+    loader.image_ready.connect(ready.append)
+    loader.request('x')
+    wait_for(qapp, lambda: ready)
+    assert loader.pixmap('x') is None
+    assert 'x' in loader.failed
+    loader.request('x')
+    assert not loader.pending
+
+
+
+def cache_files(cache_dir):
+    return sorted(p.name for p in cache_dir.rglob('*.argb'))
+
+
+def test_decode_writes_and_reuses_cache(qapp, tmp_path, cache_dir):
+    path = save_image(tmp_path / 'a.png')
+    image = decode_image(path, 20, 20)
+    cache_path = scaled_cache_path(path, 20, 20)
+    assert cache_files(cache_dir) == [os.path.basename(cache_path)]
+    assert image.format() == image.Format_ARGB32_Premultiplied
+
+    # 改写缓存里的像素，再次解码应该直接返回缓存内容
+    with open(cache_path, 'r+b') as f:
+        f.seek(RAW_IMAGE_HEADER.size)
+        f.write(b'\x00\xff\x00\xff' * 4)  # 小端BGRA：不透明绿色
+    cached = decode_image(path, 20, 20)
+    assert cached.pixelColor(0, 0) == QColor(Qt.green)
+    assert cached.pixelColor(5, 5) == QColor(Qt.red)
+
+
+def test_source_change_replaces_cache(qapp, tmp_path, cache_dir):
+    path = save_image(tmp_path / 'a.png')
+    decode_image(path, 20, 20)
+    old = cache_files(cache_dir)
+    save_image(tmp_path / 'a.png', color=Qt.blue)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    image = decode_image(path, 20, 20)
+    assert image.pixelColor(5, 5) == QColor(Qt.blue)
+    assert len(cache_files(cache_dir)) == 1
+    assert cache_files(cache_dir) != old
+
+
+def test_high_dpi_keeps_logical_size(qapp, tmp_path, cache_dir):
+    path = save_image(tmp_path / 'a.png')
+    loader = ImageLoader(20, 20, dpr=2.0)
+    loader.add('a', path)
+    pixmap = loader.load('a')
+    assert (pixmap.width(), pixmap.height()) == (40, 20)
+    size = logical_size(pixmap)
+    assert (size.width(), size.height()) == (20, 10)
+    decode_image(path, 20, 20)
+    assert len(cache_files(cache_dir)) == 2  # 不同设备像素比分别缓存
+
+
+def test_corrupt_cache_is_decoded_again(qapp, tmp_path):
+    path = save_image(tmp_path / 'a.png')
+    decode_image(path, 20, 20)
+    cache_path = scaled_cache_path(path, 20, 20)
+    with open(cache_path, 'r+b') as f:
+        f.truncate(RAW_IMAGE_HEADER.size + 8)
+    image = decode_image(path, 20, 20)
+    assert (image.width(), image.height()) == (20, 10)
+    assert image.pixelColor(5, 5) == QColor(Qt.red)
+    assert os.path.getsize(cache_path) == RAW_IMAGE_HEADER.size + 20 * 10 * 4
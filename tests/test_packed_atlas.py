@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""图集：打包、解压到缓存后mmap、切出的精灵与单独的图片一致、裁剪偏移"""
+
+import mmap
+from collections import OrderedDict
+
+import pytest
+from PyQt5.QtCore import QRect, Qt
+from PyQt5.QtGui import QColor, QImage, QPainter
+
+import image_loader
+from build_assets import build_atlas
+from image_loader import PackedAtlas, load_sprite, load_trimmed_sprite
+
+ENTRIES = [("star.png", (20, 20), False), ("tree.png", (50, 50), True)]
+
+
+def save_image(path, size, rect, color):
+    """透明背景上画一个不透明矩形"""
+    image = QImage(size[0], size[1], QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    painter.fillRect(rect, QColor(color))
+    painter.end()
+    assert image.save(str(path))
+
+
+@pytest.fixture
+def res_dir(qapp, tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setattr(image_loader, '_loaded_sprites', OrderedDict())
+    res = tmp_path / 'res'
+    res.mkdir()
+    save_image(res / 'star.png', (40, 40), QRect(10, 10, 20, 20), Qt.yellow)
+    save_image(res / 'tree.png', (100, 100), QRect(20, 40, 40, 60), Qt.darkGreen)
+    return res
+
+
+def image_of(pixmap):
+    return pixmap.toImage().convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+
+def test_build_writes_atlas_and_index(res_dir):
+    assert build_atlas(str(res_dir), 'test', ENTRIES)
+    assert (res_dir / 'atlas_test.argb.z').exists()
+    assert (res_dir / 'atlas_test.json').exists()
+
+
+def test_missing_source_fails_the_build(res_dir):
+    assert not build_atlas(str(res_dir), 'test', ENTRIES + [("missing.png", None, True)])
+    assert not (res_dir / 'atlas_test.argb.z').exists()
+
+
+def test_sprites_match_loose_images(res_dir):
+    build_atlas(str(res_dir), 'test', ENTRIES)
+    atlas = PackedAtlas.open(str(res_dir), 'test')
+    for filename, (width, height), _ in ENTRIES:
+        packed = load_sprite(atlas, str(res_dir), filename, width, height)
+        image_loader._loaded_sprites.clear()
+        loose = load_sprite(None, str(res_dir), filename, width, height)
+        assert image_of(packed) == image_of(loose)
+
+
+def test_second_open_maps_the_cache(res_dir):
+    build_atlas(str(res_dir), 'test', ENTRIES)
+    first = PackedAtlas.open(str(res_dir), 'test')
+    assert not isinstance(first.data, mmap.mmap)  # 第一次解压并写入缓存目录
+    second = PackedAtlas.open(str(res_dir), 'test')
+    assert isinstance(second.data, mmap.mmap)
+    assert second.atlas_image() == first.atlas_image()
+
+
+def test_corrupt_atlas_is_ignored(res_dir, capsys):
+    build_atlas(str(res_dir), 'test', ENTRIES)
+    (res_dir / 'atlas_test.argb.z').write_bytes(b'broken')
+    assert PackedAtlas.open(str(res_dir), 'test') is None
+    assert "图集加载失败" in capsys.readouterr().out
+
+
+def test_trimmed_sprite_keeps_offset(res_dir):
+    build_atlas(str(res_dir), 'test', ENTRIES)
+    atlas = PackedAtlas.open(str(res_dir), 'test')
+    tree = load_trimmed_sprite(atlas, str(res_dir), "tree.png", 50, 50)
+    assert (tree.width(), tree.height()) == (50, 50)
+    assert tree.bounds() == QRect(10, 20, 20, 30)
+    star = load_trimmed_sprite(atlas, str(res_dir), "star.png", 20, 20)
+    assert star.bounds() == QRect(0, 0, 20, 20)  # 星星不裁剪
+
+    # 按偏移绘制的结果与原图一致
+    image_loader._loaded_sprites.clear()
+    loose = image_of(load_sprite(None, str(res_dir), "tree.png", 50, 50))
+    drawn = QImage(50, 50, QImage.Format_ARGB32_Premultiplied)
+    drawn.fill(Qt.transparent)
+    painter = QPainter(drawn)
+    painter.setCompositionMode(QPainter.CompositionMode_Source)
+    tree.draw(painter, 0, 0)
+    painter.end()
+    assert drawn == loose
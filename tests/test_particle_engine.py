@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""向量化粒子引擎：出生和边界、快照环形缓冲的选槽和跨线程交接、工作线程的重启和粒子脏区域"""
+
+import math
+import threading
+import time
+
+import pytest
+from PyQt5.QtCore import QPoint, QRect
+from PyQt5.QtGui import QRegion
+
+np = pytest.importorskip('numpy')
+
+from frame_clock import DAMAGE_TILE
+from particle_engine import (MAX_SPEED_X, MIN_ALPHA, SNAPSHOT_SLOTS, TICK_SECONDS,
+                             ParticleArrays, ParticleSnapshot, VectorParticleSystem,
+                             particle_damage_region)
+
+
+@pytest.fixture
+def system(qapp):
+    system = VectorParticleSystem(initial_top_count=20, sprite_count=3)
+    system.rng = np.random.default_rng(11)
+    yield system
+    system.stop_particles()
+
+
+def test_start_particles_spawns_in_regions(system):
+    system.start_particles(50)
+    p = system.particles
+    assert len(p) == 50
+    assert np.all((p.y[:20] >= 15) & (p.y[:20] <= 30))
+    assert np.all((p.y[20:] >= 30) & (p.y[20:] <= 150))
+    assert np.all((p.x >= 50) & (p.x <= 200))
+    assert set(p.sprite.tolist()) <= {0, 1, 2}
+    assert np.all(p.landed == -1)
+
+
+def test_update_keeps_particles_in_bounds(system):
+    system.start_particles(200)
+    min_x, max_x, max_y = system.bounds
+    for _ in range(1500):
+        system.update_particles(TICK_SECONDS)
+    p = system.particles
+    assert np.all((p.x >= min_x) & (p.x <= max_x) & (p.y <= max_y))
+    assert np.all(np.abs(p.vx) <= MAX_SPEED_X)
+    assert np.all(p.alpha >= MIN_ALPHA)
+    assert np.all(p.age < p.lifetime)
+
+
+def test_set_particle_count_keeps_existing(system):
+    system.start_particles(30)
+    before = system.particles.x.copy()
+    system.set_particle_count(45)
+    assert np.array_equal(system.particles.x[:30], before)
+    system.set_particle_count(10)
+    assert np.array_equal(system.particles.x, before[:10])
+    assert len(system.snapshot) == 10
+
+
+def particles(count, x):
+    p = ParticleArrays(count)
+    p.x[:] = x
+    return p
+
+
+def test_interpolate_hands_off_one_snapshot(system):
+    system.start_particles(25)
+    received = []
+    system.position_updated.connect(received.append)
+    system.update_particles(TICK_SECONDS)
+    system.interpolate(0.5)
+    system.interpolate(1.0)
+    # 每次都发送同一个快照对象，绘制端原地读取，不复制粒子列表
+    assert received == [system.snapshot, system.snapshot]
+    assert system.generation == 2
+    p = system.particles
+    assert np.allclose(system.snapshot.current().x, p.x)
+
+
+def test_interpolate_blends_previous_step(system):
+    system.start_particles(25)
+    system.update_particles(TICK_SECONDS)
+    p = system.particles
+    system.interpolate(0.25)
+    frame = system.snapshot.current()
+    assert np.allclose(frame.x, p.prev_x + (p.x - p.prev_x) * 0.25)
+    assert np.allclose(frame.y, p.prev_y + (p.y - p.prev_y) * 0.25)
+    assert np.array_equal(frame.sprite, p.sprite)
+
+
+def test_publish_skips_latest_and_reading_slots():
+    snapshot = ParticleSnapshot(4)
+    for step in range(10):
+        reading = snapshot.latest
+        snapshot.acquire()
+        snapshot.publish(particles(4, step))
+        assert snapshot.latest != reading
+        # 绘制端占用的一帧没有被覆盖
+        assert snapshot.current() is snapshot.frames[reading]
+
+
+def test_writer_cycles_free_slots_while_reader_holds_one():
+    snapshot = ParticleSnapshot(2)
+    held = snapshot.acquire()
+    before = held.x.copy()
+    slots = set()
+    for step in range(2 * SNAPSHOT_SLOTS):
+        snapshot.publish(particles(2, step + 1))
+        slots.add(snapshot.latest)
+    assert snapshot.reading not in slots
+    assert len(slots) == SNAPSHOT_SLOTS - 1
+    assert np.array_equal(held.x, before)
+    assert snapshot.generation == 2 * SNAPSHOT_SLOTS
+
+
+def test_acquire_pins_newest_frame():
+    snapshot = ParticleSnapshot(3)
+    snapshot.publish(particles(3, 7.0))
+    frame = snapshot.acquire()
+    assert frame is snapshot.frames[snapshot.latest]
+    assert np.all(frame.x == 7.0)
+
+
+def test_reader_never_sees_a_frame_being_written():
+    count, steps = 50000, 300
+    snapshot = ParticleSnapshot(count)
+    source = particles(count, 0.0)
+    done = threading.Event()
+
+    def write():
+        for step in range(1, steps + 1):
+            for name in ('x', 'y', 'size', 'alpha', 'rotation'):
+                getattr(source, name)[:] = step
+            snapshot.publish(source)
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    torn = 0
+    while not done.is_set():
+        frame = snapshot.acquire()
+        first = float(frame.x[0])
+        time.sleep(0)  # 让写入端在读取中途运行
+        if not (frame.x == first).all() or not (frame.size == first).all():
+            torn += 1
+    writer.join()
+    assert torn == 0
+    assert snapshot.generation == steps
+
+
+def test_publish_interpolates_positions():
+    p = particles(2, 10.0)
+    p.prev_x[:] = 6.0
+    snapshot = ParticleSnapshot(2)
+    snapshot.publish(p, alpha=0.25)
+    assert np.allclose(snapshot.acquire().x, 7.0)
+
+
+def test_start_particles_restarts_worker(qapp):
+    system = VectorParticleSystem(threaded=True)
+    try:
+        system.start_particles(40)
+        first = system.worker
+        assert first is not None and first.isRunning()
+        system.start_particles(60)
+        # 旧线程在重新分配之前已经退出，新线程使用新的粒子数组
+        assert first.isFinished()
+        assert system.worker is not first and system.worker.isRunning()
+        assert system.particles.count == len(system.snapshot) == 60
+    finally:
+        system.stop_particles()
+    assert system.worker is None
+
+
+def damage_snapshot(xs, ys):
+    p = ParticleArrays(len(xs))
+    p.x[:] = xs
+    p.y[:] = ys
+    snapshot = ParticleSnapshot(len(xs))
+    snapshot.publish(p)
+    return snapshot
+
+
+def region_tiles(region):
+    """区域覆盖的瓦片（区域由整块瓦片组成）"""
+    tiles = set()
+    for rect in region.rects():
+        assert rect.x() % DAMAGE_TILE == 0 and rect.y() % DAMAGE_TILE == 0
+        for row in range(rect.top() // DAMAGE_TILE, rect.bottom() // DAMAGE_TILE + 1):
+            for col in range(rect.left() // DAMAGE_TILE, rect.right() // DAMAGE_TILE + 1):
+                tiles.add((row, col))
+    return tiles
+
+
+def test_damage_region_covers_every_particle():
+    rng = np.random.default_rng(3)
+    extent = 9
+    xs = rng.uniform(-40, 400, 300)
+    ys = rng.uniform(-40, 300, 300)
+    region = particle_damage_region(damage_snapshot(xs, ys), extent)
+    for x, y in zip(xs, ys):
+        left, top = max(0, math.floor(x - extent)), max(0, math.floor(y - extent))
+        right, bottom = math.floor(x + extent), math.floor(y + extent)
+        if right < 0 or bottom < 0:
+            continue
+        box = QRect(QPoint(left, top), QPoint(right, bottom))
+        assert region.intersected(box) == QRegion(box)
+
+
+def test_damage_region_marks_only_touched_tiles():
+    extent = 5
+    # 一个粒子在瓦片中间，一个跨四块瓦片，一个完全在窗口左上方之外
+    xs = [48.0, 2 * DAMAGE_TILE, -30.0]
+    ys = [48.0, 3 * DAMAGE_TILE, -30.0]
+    tiles = region_tiles(particle_damage_region(damage_snapshot(xs, ys), extent))
+    assert tiles == {(1, 1), (2, 1), (2, 2), (3, 1), (3, 2)}
+
+
+def test_damage_region_matches_dict_particles():
+    rng = np.random.default_rng(5)
+    xs = rng.uniform(-20, 300, 80)
+    ys = rng.uniform(-20, 300, 80)
+    particles = [{'draw_x': x, 'draw_y': y} for x, y in zip(xs, ys)]
+    vector = particle_damage_region(damage_snapshot(xs, ys), 7)
+    assert vector == particle_damage_region(particles, 7)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""自动画质的升降档滞后和共享帧时钟下的帧间隔"""
+
+import pytest
+
+from frame_clock import FrameClock, FrameGovernor
+from quality import (DOWNGRADE_WINDOWS, MIN_QUALITY_SAMPLES, QUALITY_TIERS, TARGET_LOAD,
+                     UPGRADE_LOAD, UPGRADE_WINDOWS, QualityController)
+
+HIGH = len(QUALITY_TIERS) - 1
+
+
+class FakeWidget:
+    def __init__(self):
+        self.applied = []
+
+    def apply_quality(self, tier):
+        self.applied.append(tier.name)
+
+
+@pytest.fixture
+def controller(qapp):
+    widget = FakeWidget()
+    controller = QualityController(widget)
+    yield controller
+    controller.stop()
+
+
+def run_window(controller, load):
+    """用负载为load（占当前档位帧间隔的比例）的样本评估一次"""
+    cost = load * controller.tier.frame_interval
+    for _ in range(MIN_QUALITY_SAMPLES):
+        controller.samples.append(cost)
+    controller.evaluate()
+
+
+def test_downgrade_needs_consecutive_windows(controller):
+    over = TARGET_LOAD * 1.5
+    for _ in range(DOWNGRADE_WINDOWS - 1):
+        run_window(controller, over)
+    run_window(controller, TARGET_LOAD * 0.9)  # 中间有一次没有超出，重新计数
+    for _ in range(DOWNGRADE_WINDOWS - 1):
+        run_window(controller, over)
+    assert controller.level == HIGH
+    run_window(controller, over)
+    assert controller.level == HIGH - 1
+    assert controller.widget.applied == [QUALITY_TIERS[HIGH - 1].name]
+
+
+def test_upgrade_waits_longer_after_flapping(controller):
+    for _ in range(DOWNGRADE_WINDOWS):
+        run_window(controller, TARGET_LOAD * 2)
+    assert controller.level == HIGH - 1
+
+    under = UPGRADE_LOAD / 2
+    for _ in range(UPGRADE_WINDOWS - 1):
+        run_window(controller, under)
+    assert controller.level == HIGH - 1
+    run_window(controller, under)
+    assert controller.level == HIGH
+
+    # 升档后马上撑不住：降回来，下次升档的等待次数加倍
+    for _ in range(DOWNGRADE_WINDOWS):
+        run_window(controller, TARGET_LOAD * 2)
+    assert controller.level == HIGH - 1
+    assert controller.upgrade_windows == UPGRADE_WINDOWS * 2
+    for _ in range(UPGRADE_WINDOWS):
+        run_window(controller, under)
+    assert controller.level == HIGH - 1
+
+
+def test_too_few_samples_are_ignored(controller):
+    controller.samples.append(1000.0)
+    controller.evaluate()
+    assert controller.over_windows == 0
+
+
+def test_load_uses_tier_interval(controller):
+    clock = FrameClock.instance()
+    saved = clock.frame_interval
+    clock.frame_interval = 100  # 降频或其他插件改变了实际帧间隔
+    try:
+        run_window(controller, TARGET_LOAD * 1.5)
+    finally:
+        clock.frame_interval = saved
+    assert controller.over_windows == 1
+
+
+def test_governor_uses_fastest_widget_interval(qapp):
+    governor = FrameGovernor(FrameClock.instance())
+    first, second = object(), object()
+    governor.set_normal_interval(first, 33)
+    governor.set_normal_interval(second, 16)
+    governor.set_normal_interval(first, 25)  # 后设置的插件不会覆盖更高的帧率
+    assert governor.normal_interval == 16
+    governor.forget(second)
+    assert governor.normal_interval == 25
+    governor.forget(first)
+    assert governor.normal_interval == governor.default_interval
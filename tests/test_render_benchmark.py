@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""渲染性能测试：命令行参数、与基准的比较和每个阶段的统计"""
+
+import json
+
+import pytest
+
+import render_benchmark
+from render_benchmark import (DEFAULT_COUNTS, MIN_REGRESSION_MS, WIDGET_SCRIPTS, compare_baseline,
+                              load_widget_class, parse_args, run_case)
+
+
+def result(p95, widget='tree', particles=120, engine='VectorParticleSystem', quality='high'):
+    stats = {'count': 10, 'mean': p95, 'p50': p95, 'p95': p95, 'p99': p95}
+    return {'widget': widget, 'particles': particles, 'engine': engine, 'quality': quality,
+            'frames': 10, 'phases': {'paint': dict(stats)}}
+
+
+def save_baseline(path, *results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'results': list(results)}, f)
+    return str(path)
+
+
+def test_default_arguments():
+    args = parse_args([])
+    assert args.widgets == list(WIDGET_SCRIPTS)
+    assert args.counts == list(DEFAULT_COUNTS)
+    assert args.tolerance == 0.2
+    assert args.baseline is None and not args.damage
+
+
+def test_lists_are_split_and_validated(capsys):
+    args = parse_args(['--widgets', 'tree, santa', '--counts', '120,1000,', '--tolerance', '0.5'])
+    assert args.widgets == ['tree', 'santa']
+    assert args.counts == [120, 1000]
+    assert args.tolerance == 0.5
+    with pytest.raises(SystemExit):
+        parse_args(['--widgets', 'tree,snowman'])
+    assert "snowman" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        parse_args(['--counts', '120,many'])
+
+
+def test_regression_beyond_tolerance(tmp_path):
+    baseline = save_baseline(tmp_path / 'before.json', result(2.0))
+    assert compare_baseline([result(2.3)], baseline, 0.2) == []
+    assert compare_baseline([result(2.5)], baseline, 0.2) == [('tree', 120, 'paint', 2.0, 2.5)]
+    assert compare_baseline([result(2.5)], baseline, 0.3) == []
+
+
+def test_tiny_or_unmatched_changes_are_ignored(tmp_path):
+    baseline = save_baseline(tmp_path / 'before.json', result(0.01))
+    # 翻了几倍但绝对差值小于噪声阈值
+    assert compare_baseline([result(0.01 + MIN_REGRESSION_MS / 2)], baseline, 0.2) == []
+    assert compare_baseline([result(5.0, particles=1000)], baseline, 0.2) == []
+    assert compare_baseline([result(5.0, quality='low')], baseline, 0.2) == []
+
+
+def test_old_baselines_default_to_high_quality(tmp_path):
+    old = result(1.0)
+    del old['quality']
+    baseline = save_baseline(tmp_path / 'before.json', old)
+    assert len(compare_baseline([result(2.0)], baseline, 0.2)) == 1
+
+
+def test_main_exits_nonzero_on_regression(qapp, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(render_benchmark, 'load_widget_class', lambda name: None)
+    monkeypatch.setattr(render_benchmark, 'run_case',
+                        lambda widget_class, name, count, *args: result(3.0, name, count))
+    baseline = save_baseline(tmp_path / 'before.json', result(2.0))
+    output = tmp_path / 'after.json'
+    argv = ['--widgets', 'tree', '--counts', '120', '--baseline', baseline, '--json', str(output)]
+    assert render_benchmark.main(argv) == 1
+    assert "2.000ms -> 3.000ms" in capsys.readouterr().out
+    assert json.loads(output.read_text(encoding='utf-8'))['results'] == [result(3.0)]
+    assert render_benchmark.main(argv + ['--tolerance', '1.0']) == 0
+
+
+def test_run_case_summarizes_each_phase(qapp):
+    pytest.importorskip('numpy')
+    case = run_case(load_widget_class('santa'), 'santa', 30, frames=4, warmup=1,
+                    engine='numpy', damage_only=False, quality='high')
+    assert case['engine'] == 'VectorParticleSystem'
+    phases = case['phases']
+    assert {'simulate', 'paint', 'particles', 'composite'} <= set(phases)
+    for phase in ('simulate', 'paint', 'composite'):
+        assert phases[phase]['count'] == 4
+    for stats in phases.values():
+        assert 0 <= stats['p50'] <= stats['p95'] <= stats['p99']
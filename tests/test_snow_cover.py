@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""积雪高度数组：累加、融化和每列的容量；切换轮廓时清空积雪"""
+
+import pytest
+from PyQt5.QtGui import QRegion
+
+np = pytest.importorskip('numpy')
+
+from snow_cover import COLUMN_WIDTH, DEPOSIT, MAX_DEPTH, MELT_RATE, SnowCover, SnowHeightmap
+
+
+def flat(columns, y=50.0):
+    return SnowHeightmap(np.full(columns, y))
+
+
+def test_capacity_thins_on_slopes():
+    # 左边平地，右边每列下降2*COLUMN_WIDTH，最后一列不积雪
+    base = np.array([40.0, 40.0, 40.0, 44.0, 48.0, np.nan])
+    heightmap = SnowHeightmap(base)
+    assert heightmap.capacity[0] == pytest.approx(MAX_DEPTH)
+    assert heightmap.capacity[4] == pytest.approx(MAX_DEPTH / 3)
+    assert heightmap.capacity[2] == pytest.approx(MAX_DEPTH / 3)
+    assert heightmap.capacity[5] == 0
+
+
+def test_add_spreads_to_neighbours():
+    heightmap = flat(10)
+    heightmap.add(np.array([5 * COLUMN_WIDTH + 0.5]))
+    expected = np.zeros(10)
+    expected[4:7] = np.array([0.25, 0.5, 0.25]) * DEPOSIT
+    assert np.allclose(heightmap.heights, expected)
+
+
+def test_add_ignores_positions_outside():
+    heightmap = flat(4)
+    heightmap.add(np.array([-1.0, 4 * COLUMN_WIDTH, 100.0]))
+    assert not heightmap.heights.any()
+
+
+def test_add_is_limited_by_capacity():
+    base = np.array([40.0, 40.0, 44.0, np.nan])
+    heightmap = SnowHeightmap(base)
+    heightmap.add(np.repeat(np.arange(4) * COLUMN_WIDTH + 1.0, 500))
+    assert np.allclose(heightmap.heights, heightmap.capacity)
+    assert heightmap.heights[3] == 0
+
+
+def test_melt_stops_at_zero():
+    heightmap = flat(3)
+    heightmap.heights[:] = [0.1, 1.0, 5.0]
+    heightmap.melt(2.0)
+    assert np.allclose(heightmap.heights, np.maximum([0.1, 1.0, 5.0] - np.float64(MELT_RATE * 2.0), 0))
+    assert heightmap.heights.min() >= 0
+
+
+def test_changed_after_redraw_step():
+    heightmap = flat(3)
+    assert not heightmap.changed()
+    heightmap.heights[1] = 1.0
+    assert heightmap.changed()
+
+
+class FakeWidget:
+    def width(self):
+        return 40
+
+    def height(self):
+        return 30
+
+    def devicePixelRatioF(self):
+        return 1.0
+
+
+class FakeField:
+    """只有上边缘的碰撞场"""
+
+    def __init__(self, y=10):
+        self.surface = np.full(20, y)
+        self.left = 0
+        self.top = 0
+
+
+def test_switching_collider_clears_all_snow(qapp):
+    cover = SnowCover(FakeWidget())
+    first = FakeField()
+    cover.set_collider(first, 10, 0)
+    cover.floor.heights[:] = 5.0
+    cover.top.heights[:] = 3.0
+    cover.update(0.0, [])
+
+    # 只是移动：积雪保留
+    region = cover.set_collider(first, 12, 0)
+    assert cover.floor.heights.max() == 5.0
+    assert cover.top.heights.max() == 3.0
+    assert region.intersected(cover.floor.rect).isEmpty()
+
+    region = cover.set_collider(FakeField(), 12, 0)
+    assert not cover.floor.heights.any()
+    assert not cover.top.heights.any()
+    assert region.intersected(cover.floor.rect) == QRegion(cover.floor.rect)
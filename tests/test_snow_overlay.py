@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""全屏飘雪：按屏幕面积分配雪花、屏幕变化时重建窗口、开始和停止、使用者登记"""
+
+import pytest
+from PyQt5.QtCore import QObject, QRect, pyqtSignal
+
+pytest.importorskip('numpy')
+
+import snow_overlay
+from snow_overlay import MAX_SNOW_COUNT, SNOW_SPAWN_Y, SnowOverlay
+
+
+class FakeScreen(QObject):
+    """只有几何信息的屏幕"""
+    geometryChanged = pyqtSignal(QRect)
+
+    def __init__(self, width, height):
+        super().__init__()
+        self.rect = QRect(0, 0, width, height)
+
+    def geometry(self):
+        return self.rect
+
+
+class FakeWindow:
+    """记录创建参数的雪花窗口"""
+
+    def __init__(self, screen, count, threaded=False):
+        self.screen = screen
+        self.count = count
+        self.threaded = threaded
+        self.running = False
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+
+@pytest.fixture
+def overlay(qapp):
+    overlay = SnowOverlay()
+    yield overlay
+    overlay.stop()
+    overlay.deleteLater()
+
+
+@pytest.fixture
+def fake_screens(monkeypatch):
+    screens = [FakeScreen(1920, 1080), FakeScreen(960, 540)]
+    monkeypatch.setattr(snow_overlay.QApplication, 'screens', lambda: screens)
+    monkeypatch.setattr(snow_overlay, 'SnowOverlayWindow', FakeWindow)
+    return screens
+
+
+def test_count_is_split_by_screen_area(overlay, fake_screens):
+    assert overlay.start(count=5000, threaded=True)
+    assert [window.count for window in overlay.windows] == [4000, 1000]
+    assert all(window.running and window.threaded for window in overlay.windows)
+    assert overlay.start()  # 已经开始时不重复创建
+    assert len(overlay.windows) == 2
+
+
+def test_count_is_clamped(overlay, fake_screens):
+    overlay.start(count=10 * MAX_SNOW_COUNT)
+    assert overlay.count == MAX_SNOW_COUNT
+    overlay.stop()
+    overlay.start(count=0)
+    assert overlay.count == 1
+    assert [window.count for window in overlay.windows] == [1, 1]
+
+
+def test_geometry_change_recreates_windows(overlay, fake_screens):
+    overlay.start(count=500)
+    old = overlay.windows
+    fake_screens[1].rect = QRect(0, 0, 1920, 1080)
+    fake_screens[1].geometryChanged.emit(fake_screens[1].rect)
+    assert not any(window.running for window in old)
+    assert [window.count for window in overlay.windows] == [250, 250]
+
+
+def test_last_holder_stops_the_snow(overlay, fake_screens):
+    first, second = object(), object()
+    overlay.hold(first)
+    overlay.hold(second)
+    assert overlay.toggle()
+    windows = overlay.windows
+    overlay.release(first)
+    assert overlay.enabled
+    overlay.release(second)
+    assert not overlay.enabled and overlay.windows == []
+    assert not any(window.running for window in windows)
+
+
+def test_window_covers_the_screen(overlay):
+    overlay.start(count=40)
+    window, = overlay.windows
+    assert window.isVisible()
+    screen = snow_overlay.QApplication.primaryScreen().geometry()
+    assert window.width() == screen.width()
+    assert window.height() == screen.height() - 1
+    # 第一批雪花铺满整个屏幕，之后重生的在屏幕上方出生
+    particles = window.particle_system.particles
+    assert len(particles) == 40
+    assert ((particles.x >= 0) & (particles.x <= screen.width())).all()
+    assert ((particles.y >= 0) & (particles.y <= window.height())).all()
+    assert window.particle_system.top_y == SNOW_SPAWN_Y
+    overlay.stop()
+    assert not window.isVisible()
+    assert not window.particle_system.running
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""精灵缓存：星星图集的格子查找、旋转、共享和批量绘制，静态背景图层，镜像图片缓存"""
+
+import pytest
+from PyQt5.QtCore import QRect, Qt
+from PyQt5.QtGui import QColor, QImage, QPainter, QPixmap, QRegion
+
+from sprite_cache import BackgroundLayer, MirroredPixmapCache, StarSpriteAtlas
+
+
+def half_star(color=Qt.red):
+    """左半边不透明的图片，用来判断格子里的朝向"""
+    pixmap = QPixmap(20, 20)
+    pixmap.fill(Qt.transparent)
+    painter = QPainter(pixmap)
+    painter.fillRect(QRect(0, 0, 10, 20), QColor(color))
+    painter.end()
+    return pixmap
+
+
+@pytest.fixture
+def atlas(qapp):
+    return StarSpriteAtlas([half_star()], min_size=6, max_size=12, rotation_steps=24)
+
+
+def test_cell_origin_clamps_size(atlas):
+    cell = atlas.cell_size
+    assert atlas.cell_origin(6, 0) == (0, 0)
+    assert atlas.cell_origin(9.7, 0) == (0, 3 * cell)
+    assert atlas.cell_origin(2, 0) == (0, 0)
+    assert atlas.cell_origin(40, 0) == (0, 6 * cell)
+
+
+def test_cell_origin_quantizes_rotation(atlas):
+    cell = atlas.cell_size
+    assert atlas.cell_origin(6, 15) == (cell, 0)
+    assert atlas.cell_origin(6, 22) == (cell, 0)
+    assert atlas.cell_origin(6, 23) == (2 * cell, 0)
+    assert atlas.cell_origin(6, 359) == (0, 0)
+    assert atlas.cell_origin(6, -15) == (23 * cell, 0)
+    assert atlas.cell_origin(6, 720 + 90) == (6 * cell, 0)
+
+
+def test_sheet_layout(atlas):
+    sheet = atlas.sheet(0)
+    assert sheet.width() == atlas.cell_size * 24
+    assert sheet.height() == atlas.cell_size * 7
+
+
+def opaque_side(image, x, y, cell):
+    """格子中心左右两侧哪一边不透明"""
+    mid = cell // 2
+    left = image.pixelColor(x + mid - 4, y + mid).alpha()
+    right = image.pixelColor(x + mid + 4, y + mid).alpha()
+    return 'left' if left > right else 'right'
+
+
+def test_cells_are_rotated(atlas):
+    image = atlas.sheet(0).toImage()
+    cell = atlas.cell_size
+    x, y = atlas.cell_origin(12, 0)
+    assert opaque_side(image, x, y, cell) == 'left'
+    x, y = atlas.cell_origin(12, 180)
+    assert opaque_side(image, x, y, cell) == 'right'
+
+
+def test_sheets_shared_between_atlases(atlas):
+    star = atlas.star_pixmaps[0]
+    other = StarSpriteAtlas([star], min_size=6, max_size=12, rotation_steps=24)
+    assert other.sheet(0) is atlas.sheet(0)
+    smaller = StarSpriteAtlas([star], min_size=6, max_size=10, rotation_steps=24)
+    assert smaller.sheet(0) is not atlas.sheet(0)
+
+
+class RecordingPainter:
+    """记录drawPixmapFragments调用：(片段数, 图集)"""
+
+    def __init__(self):
+        self.calls = []
+
+    def drawPixmapFragments(self, fragments, pixmap):
+        self.calls.append((len(fragments), pixmap))
+
+
+def sample_particles():
+    return [
+        {'draw_x': 20.5, 'draw_y': 30.2, 'size': 8, 'draw_rotation': 30, 'alpha': 220, 'sprite': 0},
+        {'draw_x': 60.0, 'draw_y': 40.9, 'size': 11.5, 'draw_rotation': 200, 'alpha': 180, 'sprite': 1},
+        {'draw_x': 90.7, 'draw_y': 15.0, 'size': 6, 'draw_rotation': 350, 'alpha': 255, 'sprite': 0},
+        {'draw_x': 300.0, 'draw_y': 300.0, 'size': 9, 'draw_rotation': 0, 'alpha': 200, 'sprite': 1},
+    ]
+
+
+def as_frame(particles):
+    """粒子字典列表转成向量化引擎快照的一帧"""
+    np = pytest.importorskip('numpy')
+    from particle_engine import SNAPSHOT_FIELDS, ParticleArrays
+    frame = ParticleArrays(len(particles), SNAPSHOT_FIELDS)
+    for name, key in (('x', 'draw_x'), ('y', 'draw_y'), ('size', 'size'),
+                      ('rotation', 'draw_rotation'), ('alpha', 'alpha'), ('sprite', 'sprite')):
+        getattr(frame, name)[:] = np.array([p[key] for p in particles])
+    return frame
+
+
+@pytest.fixture
+def two_stars(qapp):
+    return StarSpriteAtlas([half_star(Qt.red), half_star(Qt.blue)])
+
+
+def test_one_draw_call_per_sprite(two_stars):
+    painter = RecordingPainter()
+    two_stars.draw_rows(painter, sample_particles())
+    assert [(count, sheet.cacheKey()) for count, sheet in painter.calls] == [
+        (2, two_stars.sheet(0).cacheKey()), (2, two_stars.sheet(1).cacheKey())]
+
+
+def test_clip_skips_particles_outside(two_stars):
+    painter = RecordingPainter()
+    two_stars.draw_rows(painter, sample_particles(), QRect(0, 0, 100, 100))
+    assert [count for count, _ in painter.calls] == [2, 1]
+    painter = RecordingPainter()
+    two_stars.draw_arrays(painter, as_frame(sample_particles()), QRect(0, 0, 100, 100))
+    assert [count for count, _ in painter.calls] == [2, 1]
+
+
+def render(draw):
+    image = QImage(320, 320, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    draw(painter)
+    painter.end()
+    return image
+
+
+def test_array_and_dict_paths_draw_the_same(two_stars):
+    particles = sample_particles()
+    rows = render(lambda painter: two_stars.draw_rows(painter, particles))
+    arrays = render(lambda painter: two_stars.draw_arrays(painter, as_frame(particles)))
+    assert rows == arrays
+
+
+class LayerWidget:
+    """BackgroundLayer需要的窗口接口"""
+
+    def __init__(self, width=40, height=30, dpr=1.0):
+        self.size = (width, height)
+        self.dpr = dpr
+
+    def width(self):
+        return self.size[0]
+
+    def height(self):
+        return self.size[1]
+
+    def devicePixelRatioF(self):
+        return self.dpr
+
+
+@pytest.fixture
+def layer(qapp):
+    renders = []
+
+    def render(painter):
+        renders.append(1)
+        painter.fillRect(QRect(0, 0, 10, 10), Qt.green)
+
+    layer = BackgroundLayer(LayerWidget(), render)
+    layer.renders = renders
+    return layer
+
+
+def draw_layer(layer, region):
+    image = QImage(40, 30, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    layer.draw(painter, region)
+    painter.end()
+    return image
+
+
+def test_layer_renders_once_until_invalidated(layer):
+    full = QRegion(0, 0, 40, 30)
+    draw_layer(layer, full)
+    draw_layer(layer, QRegion(0, 0, 5, 5))
+    assert len(layer.renders) == 1
+    layer.invalidate()
+    draw_layer(layer, full)
+    assert len(layer.renders) == 2
+
+
+def test_layer_rebuilds_on_size_or_dpr_change(layer):
+    draw_layer(layer, QRegion(0, 0, 40, 30))
+    layer.widget.size = (50, 30)
+    draw_layer(layer, QRegion(0, 0, 40, 30))
+    layer.widget.dpr = 2.0
+    draw_layer(layer, QRegion(0, 0, 40, 30))
+    assert len(layer.renders) == 3
+    assert layer.pixmap.width() == 100 and layer.pixmap.devicePixelRatio() == 2.0
+
+
+def test_layer_only_copies_damaged_rects(layer):
+    image = draw_layer(layer, QRegion(0, 0, 5, 5))
+    assert image.pixelColor(2, 2) == QColor(Qt.green)
+    assert image.pixelColor(7, 7).alpha() == 0
+
+
+def test_layer_offset_moves_without_rebuild(layer):
+    draw_layer(layer, QRegion(0, 0, 40, 30))
+    layer.set_offset(0, 12)
+    image = draw_layer(layer, QRegion(0, 0, 40, 30))
+    assert len(layer.renders) == 1
+    assert image.pixelColor(5, 5).alpha() == 0
+    assert image.pixelColor(5, 17) == QColor(Qt.green)
+
+
+def test_mirror_is_cached_and_flipped(qapp):
+    cache = MirroredPixmapCache()
+    star = half_star()
+    star.setDevicePixelRatio(2.0)
+    mirrored = cache.get(star)
+    assert cache.get(star) is mirrored
+    assert mirrored.devicePixelRatio() == 2.0
+    image = mirrored.toImage()
+    assert image.pixelColor(2, 10).alpha() == 0
+    assert image.pixelColor(17, 10).alpha() == 255
+
+
+def test_mirror_cache_evicts_least_recently_used(qapp):
+    cache = MirroredPixmapCache(capacity=2)
+    first, second, third = half_star(), half_star(), half_star()
+    cached_first = cache.get(first)
+    cache.get(second)
+    cache.get(first)  # first变成最近使用的
+    cache.get(third)
+    assert len(cache) == 2
+    assert cache.get(first) is cached_first
+    cache.discard(first)
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
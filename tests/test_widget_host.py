@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""插件宿主：在一个进程中创建插件、共享图片和帧时钟、排列窗口和逐个关闭"""
+
+import pytest
+from PyQt5.QtWidgets import QApplication
+
+import widget_host
+from frame_clock import FrameClock
+from widget_host import HOST_WIDGETS, WidgetHost
+
+
+@pytest.fixture
+def host(qapp, tmp_path, monkeypatch):
+    """关闭插件时保存的配置写到临时目录，不修改仓库里的config.json"""
+    config_path = tmp_path / 'config.json'
+    for widget_class, _ in HOST_WIDGETS.values():
+        monkeypatch.setattr(widget_class, 'get_config_path', lambda self: str(config_path))
+    quits = []
+    monkeypatch.setattr(widget_host.QApplication, 'quit', lambda: quits.append(True))
+    host = WidgetHost(['tree', 'santa'])
+    host.quits = quits
+    yield host
+    host.quit_app()
+    for _, _, widget in host.widgets:
+        widget.deleteLater()
+
+
+def test_creates_selected_widgets_without_trays(host):
+    assert [(name, title) for name, title, _ in host.widgets] == [('tree', "圣诞树"),
+                                                                  ('santa', "圣诞老人")]
+    for _, _, widget in host.widgets:
+        assert not hasattr(widget, 'tray_icon')
+
+
+def test_widgets_share_clock_and_star_images(host):
+    tree, santa = (widget for _, _, widget in host.widgets)
+    assert tree.frame_clock is santa.frame_clock is FrameClock.instance()
+    assert tree.frame_governor is santa.frame_governor is host.frame_governor
+    assert ([p.cacheKey() for p in tree.star_pixmaps] ==
+            [p.cacheKey() for p in santa.star_pixmaps])
+    assert tree.sprite_atlas.sheet(0) is santa.sprite_atlas.sheet(0)
+
+
+def test_show_lays_out_from_the_right(host):
+    host.show()
+    tree, santa = (widget for _, _, widget in host.widgets)
+    screen = QApplication.primaryScreen().availableGeometry()
+    assert tree.x() + tree.width() == screen.right() - widget_host.SCREEN_MARGIN
+    assert santa.x() + santa.width() == tree.x() - widget_host.WIDGET_SPACING
+    assert tree.y() == santa.y() == screen.top() + widget_host.SCREEN_MARGIN
+
+
+def test_closing_the_last_widget_quits(host, tmp_path):
+    tree, santa = (widget for _, _, widget in host.widgets)
+    assert not (tmp_path / 'config.json').exists()
+    tree.close()
+    assert [name for name, _, _ in host.open_widgets()] == ['santa']
+    assert not host.quits
+    assert (tmp_path / 'config.json').exists()
+    santa.close()
+    assert host.open_widgets() == []
+    assert host.quits == [True]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""风场取样：平铺周期和负坐标的格子划分"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from wind_field import CELL_SIZE, LAYER_TIME, WindField
+
+
+@pytest.fixture(scope='module')
+def field():
+    return WindField(size=8, seed=1)
+
+
+def sample(field, x, y, t):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    out = np.empty(x.size)
+    field.sample(x, y, t, out)
+    return out
+
+
+def test_rejects_size_not_power_of_two():
+    with pytest.raises(ValueError):
+        WindField(size=12)
+
+
+def test_noise_std_matches_sine(field):
+    assert field.noise.std() == pytest.approx(np.sqrt(0.5))
+
+
+def test_periodic_in_space(field):
+    period = field.size * CELL_SIZE
+    x = np.linspace(-300, 300, 97)
+    y = np.linspace(-50, 400, 97)
+    base = sample(field, x, y, 1.3)
+    assert np.array_equal(base, sample(field, x + period, y, 1.3))
+    assert np.array_equal(base, sample(field, x, y - 2 * period, 1.3))
+
+
+def test_periodic_in_time(field):
+    x = np.linspace(0, 200, 50)
+    y = np.linspace(0, 200, 50)
+    period = field.size * LAYER_TIME
+    assert np.allclose(sample(field, x, y, 0.6), sample(field, x, y, 0.6 + period))
+
+
+def test_layers_interpolate_between_time_steps(field):
+    x = np.array([5.0])
+    y = np.array([5.0])
+    first = sample(field, x, y, 0.0)
+    second = sample(field, x, y, LAYER_TIME)
+    middle = sample(field, x, y, LAYER_TIME / 2)
+    assert middle == pytest.approx((first + second) / 2)
+
+
+def test_negative_x_cells_have_full_width(field):
+    # 每格CELL_SIZE像素：-CELL_SIZE <= x < 0 全部落在第-1格，而不是和第0格合并
+    x = np.array([-CELL_SIZE, -0.5, 0.0, CELL_SIZE - 0.5])
+    y = np.zeros(4)
+    values = sample(field, x, y, 0.0)
+    layer = field.noise[0]
+    assert values[0] == values[1] == layer[0, field.size - 1]
+    assert values[2] == values[3] == layer[0, 0]
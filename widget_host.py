@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面插件宿主 - 在一个进程中运行多个插件
+作者：codeliu
+
+圣诞树、Labubu、圣诞老人原本各自打包成一个exe，同时运行三个插件就有
+三个Python解释器、三份Qt运行时、三份星星图片和三套定时器。宿主模式
+在一个进程中把选中的插件都作为窗口打开：
+
+- 共用一个QApplication
+- 共用帧时钟和帧率调节器（每帧只唤醒一次，隐藏/空闲时一起暂停/降频）
+- 共用已解码的星星图片和粒子精灵图集（load_sprite、StarSpriteAtlas）
+- 只显示一个托盘图标，插件自己不再创建托盘
+- 共用config.json，保存时各插件只更新自己的设置
+
+用法：
+    python widget_host.py                  # 运行全部插件
+    python widget_host.py tree santa       # 只运行圣诞树和圣诞老人
+"""
+
+import argparse
+import os
+import sys
+from PyQt5.QtCore import QEvent, QObject
+from PyQt5.QtGui import QIcon
+from PyQt5.QtWidgets import QAction, QApplication, QMenu, QStyle, QSystemTrayIcon
+
+import christmas_man
+import christmas_man_base
+import christmas_tree_app_pyqt5
+from frame_clock import FrameGovernor
+from snow_overlay import SNOW_OVERLAY_AVAILABLE
+
+# 插件名称 -> (窗口类, 显示名称)
+HOST_WIDGETS = {
+    'tree': (christmas_tree_app_pyqt5.ChristmasTreeWidget, "圣诞树"),
+    'labubu': (christmas_man.ChristmasTreeWidget, "Labubu"),
+    'santa': (christmas_man_base.ChristmasTreeWidget, "圣诞老人"),
+}
+WIDGET_SPACING = 10  # 插件之间的间距(px)
+SCREEN_MARGIN = 40  # 距屏幕边缘的距离(px)
+
+
+class WidgetHost(QObject):
+    """插件宿主 - 创建插件窗口并管理唯一的托盘图标"""
+
+    def __init__(self, names, parent=None):
+        super().__init__(parent)
+        self.widgets = []  # (名称, 显示名称, 窗口)
+        self.closed = set()  # 已经关闭（停止动画）的窗口
+        for name in names:
+            widget_class, title = HOST_WIDGETS[name]
+            widget = widget_class(tray=False)
+            widget.installEventFilter(self)
+            self.widgets.append((name, title, widget))
+
+        self.frame_governor = FrameGovernor.instance()
+        self.tray_icon = None
+        self.setup_system_tray()
+
+    def show(self):
+        """从屏幕右上角开始依次排开并显示所有插件，一行放不下时换到下一行"""
+        screen = QApplication.primaryScreen().availableGeometry()
+        right = screen.right() - SCREEN_MARGIN
+        x, y = right, screen.top() + SCREEN_MARGIN
+        row_height = 0
+        for _, _, widget in self.widgets:
+            if x - widget.width() < screen.left() and row_height:
+                x, y = right, y + row_height + WIDGET_SPACING
+                row_height = 0
+            x -= widget.width()
+            widget.move(x, y)
+            widget.show()
+            x -= WIDGET_SPACING
+            row_height = max(row_height, widget.height())
+
+    def setup_system_tray(self):
+        """设置唯一的托盘图标"""
+        if not QSystemTrayIcon.isSystemTrayAvailable():
+            return
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        icon_path = os.path.join(current_dir, "res", "Icon1.ico")
+        if os.path.exists(icon_path):
+            self.tray_icon = QSystemTrayIcon(QIcon(icon_path), self)
+        else:
+            self.tray_icon = QSystemTrayIcon(self)
+            self.tray_icon.setIcon(QApplication.style().standardIcon(QStyle.SP_MessageBoxInformation))
+
+        # 菜单在每次打开时按插件的显示状态重新生成
+        self.tray_menu = QMenu()
+        self.tray_menu.aboutToShow.connect(self.update_tray_menu)
+        self.tray_icon.setContextMenu(self.tray_menu)
+
+        self.frame_governor.state_changed.connect(self.update_tray_tooltip)
+        self.update_tray_tooltip(self.frame_governor.status_text())
+        self.tray_icon.show()
+
+    def update_tray_menu(self):
+        """重新生成托盘菜单：每个插件一个显示开关"""
+        menu = self.tray_menu
+        menu.clear()
+        for _, title, widget in self.open_widgets():
+            action = QAction(f"显示{title}", menu)
+            action.setCheckable(True)
+            action.setChecked(widget.isVisible())
+            action.triggered.connect(lambda checked, w=widget: w.setVisible(checked))
+            menu.addAction(action)
+
+        # 全屏飘雪由第一个插件切换，使用它的雪花数量设置并保存到配置
+        items = self.open_widgets()
+        if items:
+            snow_widget = items[0][2]
+            snow_action = QAction("全屏飘雪", menu)
+            snow_action.setCheckable(True)
+            snow_action.setChecked(snow_widget.snow_overlay.enabled)
+            snow_action.setEnabled(SNOW_OVERLAY_AVAILABLE)
+            snow_action.triggered.connect(snow_widget.toggle_snow_overlay)
+            menu.addAction(snow_action)
+
+        menu.addSeparator()
+
+        show_action = QAction("全部显示", menu)
+        show_action.triggered.connect(lambda: [w.show() for _, _, w in self.open_widgets()])
+        menu.addAction(show_action)
+
+        hide_action = QAction("全部隐藏", menu)
+        hide_action.triggered.connect(lambda: [w.hide() for _, _, w in self.open_widgets()])
+        menu.addAction(hide_action)
+
+        menu.addSeparator()
+
+        quit_action = QAction("退出", menu)
+        quit_action.triggered.connect(self.quit_app)
+        menu.addAction(quit_action)
+
+    def update_tray_tooltip(self, status):
+        """托盘提示显示运行中的插件和帧率状态"""
+        if self.tray_icon is not None:
+            titles = "、".join(title for _, title, _ in self.open_widgets())
+            self.tray_icon.setToolTip(f"桌面插件（{titles}） - {status}")
+
+    def open_widgets(self):
+        """还没有关闭的插件"""
+        return [item for item in self.widgets if item[2] not in self.closed]
+
+    def eventFilter(self, obj, event):
+        """插件通过右键菜单退出时只关闭这一个，全部关闭后退出进程"""
+        if event.type() == QEvent.Close:
+            self.closed.add(obj)
+            if not self.open_widgets():
+                self.quit_app()
+            else:
+                self.update_tray_tooltip(self.frame_governor.status_text())
+        return False
+
+    def quit_app(self):
+        """关闭所有插件（保存配置、停止动画和粒子）并退出"""
+        for _, _, widget in self.open_widgets():
+            widget.close()
+        if self.tray_icon is not None:
+            self.tray_icon.hide()
+        QApplication.quit()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="在一个进程中运行多个桌面插件")
+    parser.add_argument('widgets', nargs='*',
+                        help="要运行的插件：" + "、".join(HOST_WIDGETS) + "，默认全部")
+    args = parser.parse_args()
+    unknown = [name for name in args.widgets if name not in HOST_WIDGETS]
+    if unknown:
+        parser.error(f"未知的插件: {', '.join(unknown)}")
+    names = list(dict.fromkeys(args.widgets)) or list(HOST_WIDGETS)
+
+    app = QApplication(sys.argv)
+    app.setApplicationName("圣诞桌面插件")
+    app.setApplicationVersion("1.0")
+    app.setOrganizationName("codeliu")
+    # 单个插件关闭时不退出，由宿主在全部关闭后退出
+    app.setQuitOnLastWindowClosed(False)
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    icon_path = os.path.join(current_dir, "res", "Icon1.ico")
+    if os.path.exists(icon_path):
+        app.setWindowIcon(QIcon(icon_path))
+
+    host = WidgetHost(names)
+    host.show()
+    sys.exit(app.exec_())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面插件风场 - 预先计算、可以平铺的噪声风场（需要numpy）
+作者：codeliu
+
+原来每个粒子按自己的相位取sin，彼此独立地左右摆动，没有成片的阵风。
+风场是一块 时间 x 高 x 宽 的三维噪声：
+- 白噪声做FFT，乘高斯低通后逆变换，得到平滑、首尾相接（周期）的噪声，
+  所以在空间和时间上都可以无缝平铺，全屏飘雪也能用同一块风场
+- 进程内只生成一次（几十毫秒），之后每步先在两个时间层之间插值出当前
+  的一层，再按所有粒子的位置一次性查表
+
+噪声的均方根与sin一致，风力大小和原来相近；阵风强度和方向可以配置。
+"""
+
+import math
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+FIELD_SIZE = 32  # 风场在x、y、时间上的格子数，必须是2的幂（取样时用位运算取模）
+CELL_SIZE = 16.0  # 每格对应的像素，风场每FIELD_SIZE * CELL_SIZE像素重复一次
+LAYER_TIME = 0.25  # 每个时间层对应的秒数，风场每FIELD_SIZE * LAYER_TIME秒重复一次
+CUTOFF = 3.0  # 低通的截止频率（每个周期内的波数），越小阵风越大片、越缓慢
+
+
+class WindField:
+    """可以平铺的三维噪声风场，sample按位置和时间返回-1~1附近的风力系数"""
+    _shared = None
+
+    @classmethod
+    def shared(cls):
+        """进程内共享的风场"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def __init__(self, size=FIELD_SIZE, cutoff=CUTOFF, seed=None):
+        if size <= 0 or size & (size - 1):
+            raise ValueError(f"风场大小必须是2的幂: {size}")
+        self.size = size
+        self.shift = size.bit_length() - 1
+        rng = np.random.default_rng(seed)
+        white = rng.standard_normal((size, size, size))
+
+        # 高斯低通：频率按每个周期内的波数计算，三个方向相同
+        k = np.fft.fftfreq(size) * size
+        kx = np.fft.rfftfreq(size) * size
+        radius2 = k[:, None, None] ** 2 + k[None, :, None] ** 2 + kx[None, None, :] ** 2
+        spectrum = np.fft.rfftn(white) * np.exp(-radius2 / (cutoff * cutoff))
+        noise = np.fft.irfftn(spectrum, s=white.shape, axes=(0, 1, 2))
+
+        # 均方根与sin相同（1/√2）
+        noise *= math.sqrt(0.5) / noise.std()
+        self.noise = noise
+
+    def sample(self, x, y, t, out, buffers=None):
+        """按窗口坐标x、y（数组）和时间t（秒）取样，结果写入out
+
+        风场在多个插件、多个模拟线程之间共享，取样时不修改风场本身；
+        中间结果写入调用方的buffers（WindBuffers），不传时临时分配。
+        """
+        size = self.size
+        if buffers is None:
+            buffers = WindBuffers(self, out.size)
+        # 当前时间在两个时间层之间线性插值：a + (b - a) * frac
+        position = t / LAYER_TIME
+        index = int(math.floor(position))
+        frac = position - index
+        first = self.noise[index % size]
+        layer = buffers.layer
+        np.subtract(self.noise[(index + 1) % size], first, out=layer)
+        layer *= frac
+        layer += first
+
+        # 风力是加速度，积分后的速度仍然连续，所以按格子直接取值；
+        # 向下取整（astype向零截断，x<0时第0格会变成两倍宽），行列按位取模
+        # （负数同样适用）后合成一维下标，只做一次take。out在take之前
+        # 用来存放取整的中间结果
+        mask = size - 1
+        cols = buffers.cols
+        cells = buffers.cells
+        np.multiply(x, 1 / CELL_SIZE, out=out)
+        np.floor(out, out=out)
+        np.copyto(cols, out, casting='unsafe')
+        cols &= mask
+        np.multiply(y, 1 / CELL_SIZE, out=out)
+        np.floor(out, out=out)
+        np.copyto(cells, out, casting='unsafe')
+        cells &= mask
+        cells <<= self.shift
+        cells |= cols
+        return np.take(layer.reshape(-1), cells, out=out)
+
+
+class WindBuffers:
+    """风场取样用的预分配数组，每个调用方（粒子系统）一份，取样时不再分配内存"""
+
+    def __init__(self, field, count):
+        self.layer = np.empty((field.size, field.size))
+        self.cols = np.empty(count, dtype=np.intp)
+        self.cells = np.empty(count, dtype=np.intp)
@@ -1,14 +1,20 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+import subprocess
+import sys
 
 block_cipher = None  # 无加密（如需加密，需初始化加密器）
 
+# 图集是生成文件，不在仓库中：先运行build_assets.py生成
+subprocess.check_call([sys.executable, os.path.join(SPECPATH, 'build_assets.py'), 'tree'], cwd=SPECPATH)
+
 # 配置资源文件
 added_files = [
     # ('res', 'res'),   第一个参数是源目录，第二个参数是打包后的目录 这个是通用
     ('res/Icon1.ico', 'res'),
-    ('res/Star*.png', 'res'),
-    ('res/img*.png', 'res'),
-    ('res/imgTree.png', 'res')
+    # 星星、圣诞树和灯带已打包成一张图集（下面的build_assets步骤生成）
+    ('res/atlas_tree.argb.z', 'res'),
+    ('res/atlas_tree.json', 'res')
     # 只包含必要的资源，避免通配符匹配过多文件
 ]
 
@@ -33,7 +39,7 @@ a = Analysis(
         'ctypes',        # C语言调用（如果未使用则排除）
         'distutils',     # 安装工具
         'PIL',           # 图像处理（如果你用PyQt5的QPixmap则排除）
-        'numpy',         # 科学计算（未使用）
+        # numpy不能排除：向量化粒子引擎、碰撞、积雪和风场都依赖它
         'pandas',        # 数据分析（未使用）
         'matplotlib',    # 绘图库（未使用）
         'scipy',         # 科学计算（未使用）